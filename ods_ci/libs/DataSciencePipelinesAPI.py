@@ -1,12 +1,224 @@
 import base64
+import contextlib
+import hashlib
 import json
+import math
+import os
+import random
+import shlex
 import subprocess
+import tempfile
+import threading
 import time
+import urllib.parse
 from json import JSONDecodeError
 
 import certifi
 import requests
+from KubernetesRestClient import KubernetesRestClient, KubernetesRestError
+from requests.adapters import HTTPAdapter
 from robotlibcore import keyword
+from urllib3.util.retry import Retry
+
+from ods_ci.utils.scripts.command_cache import COMMAND_CACHE
+
+
+class RouterCABundleCache:
+    """
+    Process-wide cache of the router CA merged with the certifi trusted certificates.
+    The bundle is written once to a content-addressed file and rebuilt only when the
+    resourceVersion of the router-ca secret changes. The resourceVersion itself is
+    re-checked at most every recheck_interval seconds.
+    """
+
+    def __init__(self, recheck_interval: int = 60):
+        self.recheck_interval = recheck_interval
+        self._lock = threading.Lock()
+        self._resource_version = None
+        self._path = None
+        self._checked_at = 0.0
+
+    def get(self, fetch_resource_version, fetch_secret):
+        with self._lock:
+            now = time.monotonic()
+            if self._is_valid() and now - self._checked_at < self.recheck_interval:
+                return self._path
+            resource_version = fetch_resource_version()
+            if not self._is_valid() or (resource_version and resource_version != self._resource_version):
+                secret = fetch_secret()
+                self._path = self._write_bundle(secret["data"]["tls.crt"])
+                self._resource_version = secret["metadata"].get("resourceVersion", resource_version)
+            self._checked_at = now
+            return self._path
+
+    def invalidate(self):
+        with self._lock:
+            self._resource_version = None
+            self._path = None
+            self._checked_at = 0.0
+
+    def _is_valid(self):
+        return self._path is not None and os.path.isfile(self._path)
+
+    @staticmethod
+    def _write_bundle(encoded_cert):
+        decoded_cert = base64.b64decode(encoded_cert).decode("utf-8")
+        # append also the trusted certificates
+        with open(certifi.where()) as trusted_cert:
+            content = decoded_cert + trusted_cert.read()
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        file_name = os.path.join(tempfile.gettempdir(), f"kfp-cert-{digest}.pem")
+        if not os.path.isfile(file_name):
+            # write and rename so concurrent readers never see a partial bundle
+            fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(file_name), prefix="kfp-cert-")
+            with os.fdopen(fd, "w") as cert_file:
+                cert_file.write(content)
+            os.replace(tmp_name, file_name)
+        return file_name
+
+
+ROUTER_CA_BUNDLE = RouterCABundleCache()
+
+
+class TimedRetry(Retry):
+    """Retry that reports the time of each of its backoff sleeps to on_sleep"""
+
+    def __init__(self, *args, on_sleep=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_sleep = on_sleep
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.on_sleep = self.on_sleep
+        return retry
+
+    def sleep(self, response=None):
+        start = time.perf_counter()
+        super().sleep(response)
+        if self.on_sleep is not None:
+            self.on_sleep(time.perf_counter() - start)
+
+
+class PooledHTTPTransport:
+    """
+    Keep-alive HTTP transport shared by every DataSciencePipelinesAPI instance.
+    Requests go through a pooled requests.Session that retries idempotent requests
+    answered with 503 (service not deployed) or 504 (service not ready).
+    It also accumulates the time spent on the network, the number of retries and their backoff time,
+    and the time spent sleeping between polls, so suites can tell one from the other.
+    """
+
+    def __init__(self, pool_size: int = 10, retries: int = 3, backoff_factor: float = 0.5):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.session = requests.Session()
+        retry = TimedRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(503, 504),
+            raise_on_status=False,
+            on_sleep=self._record_retry,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        # backoff seconds of the request in progress in each thread
+        self._local = threading.local()
+        self.reset_stats()
+
+    def request(self, method, url, **kwargs):
+        self._local.backoff_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            self._record(method.upper(), time.perf_counter() - start - self._local.backoff_seconds)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+        with self._lock:
+            self._stats["wait_seconds"] += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["methods"] = {method: dict(values) for method, values in self._stats["methods"].items()}
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "requests": 0,
+                "network_seconds": 0.0,
+                "retries": 0,
+                "retry_backoff_seconds": 0.0,
+                "wait_seconds": 0.0,
+                "methods": {},
+            }
+
+    def close(self):
+        self.session.close()
+
+    def _record_retry(self, backoff):
+        self._local.backoff_seconds = getattr(self._local, "backoff_seconds", 0.0) + backoff
+        with self._lock:
+            self._stats["retries"] += 1
+            self._stats["retry_backoff_seconds"] += backoff
+
+    def _record(self, method, elapsed):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["network_seconds"] += elapsed
+            method_stats = self._stats["methods"].setdefault(
+                method, {"requests": 0, "seconds": 0.0, "max_seconds": 0.0}
+            )
+            method_stats["requests"] += 1
+            method_stats["seconds"] += elapsed
+            method_stats["max_seconds"] = max(method_stats["max_seconds"], elapsed)
+
+
+HTTP_TRANSPORT = PooledHTTPTransport()
+
+
+class AdaptiveProbe:
+    """
+    Calls a probe right away and then again with exponential backoff plus jitter, until it reports
+    ready or the deadline expires. The sleeps are accounted as waiting time by HTTP_TRANSPORT
+    """
+
+    def __init__(
+        self, timeout: float, initial_delay: float = 1, max_delay: float = 45, factor: float = 2, jitter: float = 0.2
+    ):
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max(initial_delay, max_delay)
+        self.factor = factor
+        self.jitter = jitter
+
+    def run(self, probe):
+        """
+        probe() must return (ready, value)
+        Returns (ready, value, attempts, elapsed seconds)
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        delay = self.initial_delay
+        attempts = 0
+        while True:
+            attempts += 1
+            ready, value = probe()
+            now = time.monotonic()
+            if ready or now >= deadline:
+                return ready, value, attempts, now - start
+            jittered_delay = delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            HTTP_TRANSPORT.sleep(min(jittered_delay, self.max_delay, deadline - now))
+            delay = min(delay * self.factor, self.max_delay)
+
+
+# project -> list of seconds it took the DSP route to answer 200, one entry per login_and_wait_dsp_route call
+DSP_TIME_TO_READY = {}
 
 
 class DataSciencePipelinesAPI:
@@ -14,6 +226,8 @@ class DataSciencePipelinesAPI:
     def __init__(self, sleep_time: int = 45):
         self.route = ""
         self.sa_token = None
+        # epoch seconds, None when the expiration of sa_token is unknown
+        self.token_expires_at = None
         self.sleep_time = sleep_time
 
     @keyword
@@ -25,63 +239,106 @@ class DataSciencePipelinesAPI:
         route_name="ds-pipeline-dspa",
         timeout=120,
     ):
-        print("Fetch token")
-        basic_value = f"{user}:{pwd}".encode("ASCII")
-        basic_value = base64.b64encode(basic_value).decode("ASCII")
-        response = requests.get(
-            self.retrieve_auth_url(),
-            headers={"Authorization": f"Basic {basic_value}"},
-            verify=False,
-            allow_redirects=False,
-        )
-        url_with_token = response.headers["Location"]
-        access_token_key = "access_token="
-        idx_token = url_with_token.index(access_token_key) + len(access_token_key)
-        token = url_with_token[idx_token:]
-        idx_token = token.index("&")
-        self.sa_token = token[:idx_token]
+        self.fetch_token(user, pwd)
 
         print("Fetch the dsp route")
-        self.route = ""
-        count = 0
-        while self.route == "" and count < 60:
-            self.route, _ = self.run_command(f"oc get route -n {project} {route_name} --template={{{{.spec.host}}}}")
-            time.sleep(1)
-            count += 1
+        start = time.monotonic()
+
+        def probe_route():
+            host = self.get_route_host(project, route_name)
+            return host != "", host
 
+        _, self.route, _, _ = AdaptiveProbe(timeout=60, max_delay=5).run(probe_route)
         assert self.route != "", "Route must not be empty"
-        print(f"Waiting for Data Science Pipeline route to be ready to avoid firing false alerts: {self.route}")
-        time.sleep(self.sleep_time)
-        status = -1
-        count = 0
-        while status != 200 and count < timeout:
-            response, status = self.do_get(
+
+        print(f"Waiting for Data Science Pipeline route to be ready: {self.route}")
+
+        def probe_runs():
+            _, status = self.do_get(
                 f"https://{self.route}/apis/v2beta1/runs",
                 headers={"Authorization": f"Bearer {self.sa_token}"},
             )
             # 503 -> service not deployed
             # 504 -> service not ready
             # if you need to debug, try to print also the response
-            print(f"({count}): Data Science Pipeline HTTP Status: {status}")
-            if status != 200:
-                time.sleep(self.sleep_time)
-                count += self.sleep_time
+            print(f"({time.monotonic() - start:.1f}s): Data Science Pipeline HTTP Status: {status}")
+            return status == 200, status
+
+        ready, status, attempts, _ = AdaptiveProbe(timeout=float(timeout), max_delay=self.sleep_time).run(probe_runs)
+        if ready:
+            time_to_ready = time.monotonic() - start
+            DSP_TIME_TO_READY.setdefault(project, []).append(time_to_ready)
+            print(f"Data Science Pipeline in {project} ready after {time_to_ready:.1f}s and {attempts} probes")
         return status
 
+    def fetch_token(self, user, pwd):
+        """
+        Gets an OAuth access token for user with the openshift-challenging-client flow.
+        Sets sa_token and token_expires_at and returns the token
+        """
+        print("Fetch token")
+        basic_value = f"{user}:{pwd}".encode("ASCII")
+        basic_value = base64.b64encode(basic_value).decode("ASCII")
+        response = HTTP_TRANSPORT.request(
+            "GET",
+            self.retrieve_auth_url(),
+            headers={"Authorization": f"Basic {basic_value}"},
+            verify=False,
+            allow_redirects=False,
+        )
+        # the token is in the fragment: #access_token=...&expires_in=...&scope=...&token_type=Bearer
+        location = urllib.parse.urlsplit(response.headers["Location"])
+        token_params = urllib.parse.parse_qs(location.fragment or location.query)
+        self.sa_token = token_params["access_token"][0]
+        expires_in = token_params.get("expires_in")
+        self.token_expires_at = time.time() + int(expires_in[0]) if expires_in else None
+        return self.sa_token
+
+    def get_route_host(self, project, route_name="ds-pipeline-dspa"):
+        """Returns the host of the route, or an empty string if the route does not exist"""
+        route = self.get_resource(
+            f"/apis/route.openshift.io/v1/namespaces/{project}/routes/{route_name}",
+            f"oc get route -n {project} {route_name} -o json",
+        )
+        return route["spec"]["host"] if route else ""
+
+    def is_dsp_ready(self):
+        """Probes the DSP API server once with the current route and token"""
+        _, status = self.do_get(
+            f"https://{self.route}/apis/v2beta1/runs",
+            headers={"Authorization": f"Bearer {self.sa_token}"},
+        )
+        return status == 200
+
+    @keyword
+    def get_dsp_time_to_ready(self, project=None):
+        """
+        Returns the seconds it took the DSP route to become ready in each login_and_wait_dsp_route call,
+        as a list for the given project or as a dict project -> list when no project is given
+        """
+        if project is not None:
+            return list(DSP_TIME_TO_READY.get(project, []))
+        return {name: list(times) for name, times in DSP_TIME_TO_READY.items()}
+
     @keyword
-    def remove_pipeline_project(self, project):
+    def remove_pipeline_project(self, project, timeout=600):
+        """
+        Deletes the project and waits until it is gone, the namespace can stay in Terminating status
+        for a while. Fails when the project still exists after timeout seconds
+        """
         print(f"We are removing the project({project}) because we could run the test multiple times")
-        self.run_command(f"oc delete project {project} --wait=true --force=true")
+        project_path = f"/apis/project.openshift.io/v1/projects/{project}"
+        self.delete_resource(project_path, f"oc delete project {project} --wait=true --force=true")
         print("Wait because it could be in Terminating status")
-        count = 0
-        while count < 30:
-            project_status, error = self.run_command(f"oc get project {project} --template={{{{.status.phase}}}}")
-            print(f"Project status: {project_status}")
-            print(f"Error message: {error}")
-            if project_status == "":
-                break
-            time.sleep(1)
-            count += 1
+        deadline = time.monotonic() + float(timeout)
+        while True:
+            project_json = self.get_resource(project_path, f"oc get project {project} -o json")
+            if not project_json:
+                return
+            print(f"Project status: {project_json.get('status', {}).get('phase', '')}")
+            if time.monotonic() >= deadline:
+                raise AssertionError(f"Project {project} still exists after {timeout} seconds")
+            HTTP_TRANSPORT.sleep(1)
 
     @keyword
     def add_role_to_user(self, name, user, project):
@@ -93,13 +350,21 @@ class DataSciencePipelinesAPI:
     @keyword
     def do_http_request(self, url):
         assert self.route != "", "Login First"
-        response = requests.get(
-            f"http://{self.route}/{url}", headers={"Authorization": f"Bearer {self.sa_token}"}, verify=self.get_cert()
+        response = HTTP_TRANSPORT.request(
+            "GET",
+            f"http://{self.route}/{url}",
+            headers={"Authorization": f"Bearer {self.sa_token}"},
+            verify=self.get_cert(),
         )
         assert response.status_code == 200
         return response.url
 
     def count_pods(self, oc_command, pod_criteria, timeout=30):
+        selectors = self.parse_get_pods_command(oc_command)
+        if selectors is not None:
+            pod_count = self.wait_for_pod_count(*selectors, pod_criteria=pod_criteria, timeout=timeout)
+            if pod_count is not None:
+                return pod_count
         oc_command = f"{oc_command} --no-headers"
         pod_count = 0
         count = 0
@@ -109,11 +374,22 @@ class DataSciencePipelinesAPI:
             pod_count = sum(1 for line in bash_str.split("\n") if line.strip())
             if pod_count >= pod_criteria:
                 break
-            time.sleep(1)
+            HTTP_TRANSPORT.sleep(1)
             count += 1
         return pod_count
 
     def count_running_pods(self, oc_command, name_startswith, status_phase, pod_criteria, timeout=30):
+        selectors = self.parse_get_pods_command(oc_command)
+        if selectors is not None:
+            pod_count = self.wait_for_pod_count(
+                *selectors,
+                pod_criteria=pod_criteria,
+                name_startswith=name_startswith,
+                status_phase=status_phase,
+                timeout=timeout,
+            )
+            if pod_count is not None:
+                return pod_count
         pod_count = 0
         count = 0
         while pod_count != pod_criteria and count < timeout:
@@ -132,12 +408,102 @@ class DataSciencePipelinesAPI:
             # we can stop the iteration to save time
             if pod_count >= pod_criteria:
                 break
-            time.sleep(1)
+            HTTP_TRANSPORT.sleep(1)
             count += 1
         return pod_count
 
+    @staticmethod
+    def parse_get_pods_command(oc_command):
+        """
+        Returns (namespace, label_selector, field_selector) of a plain `oc get pods` command,
+        or None when the command uses anything else and has to be executed as it is
+        """
+        args = shlex.split(oc_command)
+        if args[:3] not in (["oc", "get", "pods"], ["oc", "get", "pod"]):
+            return None
+        options = {}
+        args = args[3:]
+        while args:
+            arg = args.pop(0)
+            name, _, value = arg.partition("=")
+            if name in ("-n", "--namespace", "-l", "--selector", "--field-selector", "-o", "--output"):
+                options[name] = value or (args.pop(0) if args else "")
+            elif name != "--no-headers":
+                return None
+        namespace = options.get("-n", options.get("--namespace"))
+        if namespace is None or options.get("-o", options.get("--output", "json")) not in ("json", "name", "wide"):
+            return None
+        return namespace, options.get("-l", options.get("--selector")), options.get("--field-selector")
+
+    def wait_for_pod_count(
+        self,
+        namespace,
+        label_selector=None,
+        field_selector=None,
+        pod_criteria=1,
+        name_startswith="",
+        status_phase=None,
+        timeout=30,
+    ):
+        """
+        Waits until at least pod_criteria pods (optionally filtered by name prefix and phase) exist in namespace.
+        The pods are listed once and then followed with a single watch stream that keeps an in-memory
+        name -> phase index up to date, so the wait ends as soon as the criterion is met.
+        Returns the number of matching pods, or None when the API server can not be watched
+        """
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is None:
+            return None
+        path = f"/api/v1/namespaces/{namespace}/pods"
+        deadline = time.monotonic() + timeout
+        pod_phases = {}
+
+        def update_index(event_type, pod):
+            name = pod["metadata"]["name"]
+            phase = pod.get("status", {}).get("phase")
+            if event_type == "DELETED" or not name.startswith(name_startswith):
+                pod_phases.pop(name, None)
+            elif status_phase is None or phase == status_phase:
+                pod_phases[name] = phase
+            else:
+                pod_phases.pop(name, None)
+
+        try:
+            resource_version = None
+            while True:
+                if resource_version is None:
+                    pods = client.list(path, label_selector, field_selector)
+                    pod_phases.clear()
+                    for pod in pods["items"]:
+                        update_index("ADDED", pod)
+                    resource_version = pods["metadata"]["resourceVersion"]
+                remaining = deadline - time.monotonic()
+                if len(pod_phases) >= pod_criteria or remaining <= 0:
+                    return len(pod_phases)
+                events = client.watch(
+                    path, resource_version, label_selector, field_selector, timeout_seconds=math.ceil(remaining)
+                )
+                with contextlib.closing(events):
+                    for event in events:
+                        if event["type"] == "ERROR":
+                            # the resourceVersion is too old, list again
+                            resource_version = None
+                            break
+                        resource_version = event["object"]["metadata"]["resourceVersion"]
+                        if event["type"] != "BOOKMARK":
+                            update_index(event["type"], event["object"])
+                        if len(pod_phases) >= pod_criteria or time.monotonic() >= deadline:
+                            break
+        except KubernetesRestError as e:
+            print(f"Falling back to polling pods: {e}")
+            return None
+
     def retrieve_auth_url(self):
-        response, _ = self.run_command("oc cluster-info")
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is not None:
+            response = client.server
+        else:
+            response, _ = self.run_command("oc cluster-info", cacheable=True)
         host_begin_index = response.index("://") + 3
         response = response[host_begin_index:]
         host = response[: response.index(":")]
@@ -145,8 +511,7 @@ class DataSciencePipelinesAPI:
         return f"https://oauth-openshift.apps.{host[4:]}/oauth/authorize?response_type=token&client_id=openshift-challenging-client"
 
     def get_default_storage(self):
-        result, _ = self.run_command("oc get storageclass -A -o json")
-        result = json.loads(result)
+        result = self.get_resource("/apis/storage.k8s.io/v1/storageclasses", "oc get storageclass -A -o json")
         for storage_class in result["items"]:
             if "annotations" in storage_class["metadata"]:
                 if storage_class["metadata"]["annotations"]["storageclass.kubernetes.io/is-default-class"] == "true":
@@ -155,49 +520,145 @@ class DataSciencePipelinesAPI:
 
     @keyword
     def get_openshift_server(self):
-        return self.run_command("oc whoami --show-server=true")[0].replace("\n", "")
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is not None:
+            return client.server
+        return self.run_command("oc whoami --show-server=true", cacheable=True)[0].replace("\n", "")
 
     def get_openshift_token(self):
-        return self.run_command("oc whoami --show-token=true")[0].replace("\n", "")
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is not None and client.token:
+            return client.token
+        return self.run_command("oc whoami --show-token=true", cacheable=True)[0].replace("\n", "")
+
+    def run_command(self, command, cacheable=False):
+        """
+        Runs command and returns (stdout, stderr). Only the read-once lookups pass cacheable=True, so that
+        the polling loops never get a stale output from COMMAND_CACHE
+        """
+
+        def fetch():
+            process = subprocess.Popen(command.split(), stdout=subprocess.PIPE)
+            output, error = process.communicate()
+            return process.returncode, (self.byte_to_str(output), error)
+
+        return COMMAND_CACHE.call(command, fetch, cacheable)
+
+    def get_resource(self, path, oc_command):
+        """
+        Gets a resource (or a list of resources) with the in-process API client. When the client is not
+        available or fails, oc_command is executed instead; it must print the resource as json.
+        Returns None when the resource does not exist
+        """
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is not None:
+            try:
+                return client.get(path)
+            except KubernetesRestError as e:
+                print(f"Falling back to oc: {e}")
+        output, _ = self.run_command(oc_command)
+        try:
+            return json.loads(output)
+        except JSONDecodeError:
+            return None
+
+    def list_resources(self, path, oc_command, label_selector=None, field_selector=None):
+        """
+        Lists resources with the in-process API client, falling back to oc_command (which must print json).
+        Returns the list of items
+        """
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is not None:
+            try:
+                return client.list(path, label_selector, field_selector)["items"]
+            except KubernetesRestError as e:
+                print(f"Falling back to oc: {e}")
+        output, _ = self.run_command(oc_command)
+        try:
+            return json.loads(output)["items"]
+        except JSONDecodeError:
+            return []
+
+    def delete_resource(self, path, oc_command):
+        """Deletes a resource with the in-process API client, falling back to oc_command"""
+        client = KubernetesRestClient.from_kubeconfig()
+        if client is not None:
+            try:
+                client.delete(path)
+                return
+            except KubernetesRestError as e:
+                print(f"Falling back to oc: {e}")
+        self.run_command(oc_command)
+
+    @keyword
+    def configure_http_transport(self, pool_size: int = 10, retries: int = 3, backoff_factor: float = 0.5):
+        """
+        Replaces the process-wide pooled HTTP transport used by all DataSciencePipelinesAPI instances
+        :param pool_size: max number of keep-alive connections per host
+        :param retries: max retries of idempotent requests answered with 503/504
+        :param backoff_factor: exponential backoff factor between retries
+        """
+        global HTTP_TRANSPORT  # noqa: PLW0603
+        HTTP_TRANSPORT.close()
+        HTTP_TRANSPORT = PooledHTTPTransport(int(pool_size), int(retries), float(backoff_factor))
 
-    def run_command(self, command):
-        process = subprocess.Popen(command.split(), stdout=subprocess.PIPE)
-        output, error = process.communicate()
-        return self.byte_to_str(output), error
+    @keyword
+    def get_http_timing_stats(self):
+        """
+        Returns the counters of the pooled HTTP transport: number of requests, seconds spent on the
+        network (total and per HTTP method), number of 503/504 retries and seconds of backoff before them,
+        and seconds spent waiting between polls
+        """
+        stats = HTTP_TRANSPORT.stats()
+        print(f"HTTP timing stats: {stats}")
+        return stats
+
+    @keyword
+    def reset_http_timing_stats(self):
+        HTTP_TRANSPORT.reset_stats()
 
     def do_get(self, url, headers=None):
-        response = requests.get(url, headers=headers, verify=self.get_cert())
+        response = HTTP_TRANSPORT.request("GET", url, headers=headers, verify=self.get_cert())
         return self.byte_to_str(response.content), response.status_code
 
     def do_post(self, url, headers, json):
-        response = requests.post(url, headers=headers, json=json, verify=self.get_cert())
+        response = HTTP_TRANSPORT.request("POST", url, headers=headers, json=json, verify=self.get_cert())
         return self.byte_to_str(response.content), response.status_code
 
     def do_upload(self, url, files, headers=None):
-        response = requests.post(url, headers=headers, files=files, verify=self.get_cert())
+        response = HTTP_TRANSPORT.request("POST", url, headers=headers, files=files, verify=self.get_cert())
         return self.byte_to_str(response.content), response.status_code
 
     def do_delete(self, url, headers):
-        response = requests.delete(url, headers=headers, verify=self.get_cert())
+        response = HTTP_TRANSPORT.request("DELETE", url, headers=headers, verify=self.get_cert())
         return self.byte_to_str(response.content), response.status_code
 
     def byte_to_str(self, content):
         return content.decode("utf-8", "ignore")
 
     def get_secret(self, project, name):
-        secret_json, _ = self.run_command(f"oc get secret -n {project} {name} -o json")
-        assert len(secret_json) > 0
-        return json.loads(secret_json)
+        secret_json = self.get_resource(
+            f"/api/v1/namespaces/{project}/secrets/{name}", f"oc get secret -n {project} {name} -o json"
+        )
+        assert secret_json is not None
+        return secret_json
 
     def get_cert(self):
-        cert_json = self.get_secret("openshift-ingress-operator", "router-ca")
-        cert = cert_json["data"]["tls.crt"]
-        decoded_cert = base64.b64decode(cert).decode("utf-8")
-        file_name = "/tmp/kfp-cert"
-        with open(file_name, "w") as cert_file:
-            cert_file.write(decoded_cert)
-            # append also the trusted certificates
-            with open(certifi.where()) as trusted_cert:
-                for line in trusted_cert.readlines():
-                    cert_file.write(line)
-        return file_name
+        """
+        Returns the path of a CA bundle with the router CA and the certifi trusted certificates.
+        The bundle is shared by every instance in the process, see RouterCABundleCache
+        """
+        project, name = "openshift-ingress-operator", "router-ca"
+
+        fetched = {}
+
+        def fetch_secret():
+            # the resourceVersion and the bundle come from the same GET of the secret
+            if "secret" not in fetched:
+                fetched["secret"] = self.get_secret(project, name)
+            return fetched["secret"]
+
+        def fetch_resource_version():
+            return fetch_secret()["metadata"]["resourceVersion"]
+
+        return ROUTER_CA_BUNDLE.get(fetch_resource_version, fetch_secret)
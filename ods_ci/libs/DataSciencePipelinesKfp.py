@@ -1,57 +1,387 @@
+import hashlib
 import importlib
+import importlib.metadata
 import json
 import os
 import sys
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import kfp_server_api
+import yaml
 from DataSciencePipelinesAPI import DataSciencePipelinesAPI
-from kfp import compiler
+from google.protobuf import json_format
 from kfp.client import Client
+from kfp.client.client import KF_PIPELINES_DEFAULT_EXPERIMENT_NAME, KF_PIPELINES_OVERRIDE_EXPERIMENT_NAME
 from robotlibcore import keyword
+from Statistics import percentile
+
+
+class RateLimiter:
+    """Spaces out the start of calls shared by many threads so that at most `rate` calls start per second"""
+
+    def __init__(self, rate: float = 0):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.interval == 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+
+def run_bounded(func, items, max_in_flight: int = 8, rate_limit: float = 0):
+    """
+    Calls func(item) for every item from a thread pool, with at most max_in_flight calls in flight and,
+    when rate_limit > 0, at most rate_limit calls started per second.
+    Exceptions are collected instead of being raised.
+    Returns a list of (item, result, exception or None, seconds) in the same order as items
+    """
+    limiter = RateLimiter(float(rate_limit))
+
+    def call(item):
+        limiter.acquire()
+        start = time.perf_counter()
+        try:
+            return item, func(item), None, time.perf_counter() - start
+        except Exception as e:
+            return item, None, e, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_in_flight))) as pool:
+        return list(pool.map(call, items))
+
+
+def iter_pages(fetch_page, items_attribute):
+    """
+    Yields the items of a paginated KFP list call. fetch_page(page_token) must return a list response
+    with next_page_token and the items in items_attribute. The next page is requested in the background
+    as soon as the current one arrives, so it is fetched while the caller processes the current items
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        next_page = pool.submit(fetch_page, "")
+        while next_page is not None:
+            response = next_page.result()
+            next_page_token = response.next_page_token
+            next_page = pool.submit(fetch_page, next_page_token) if next_page_token else None
+            yield from getattr(response, items_attribute) or []
+
+
+class CompiledPipelineCache:
+    """
+    On-disk cache of compiled pipeline specs. Entries are keyed by the hash of the pipeline source file,
+    the pipeline function name, the kfp and kfp-kubernetes versions and the transforms applied to the
+    compiled spec, so a hit can be submitted without importing nor compiling the pipeline again.
+    Note that only the source file itself is hashed, not the local modules it may import
+    """
+
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir or os.environ.get(
+            "ODS_CI_PIPELINE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ods-ci-pipeline-cache")
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def package_version(name):
+        try:
+            return importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            return "none"
+
+    def key(self, source_path, fn, **options):
+        with open(source_path, "rb") as source:
+            source_hash = hashlib.sha256(source.read()).hexdigest()
+        key_data = {
+            "source": source_hash,
+            "fn": fn,
+            "kfp": self.package_version("kfp"),
+            "kfp-kubernetes": self.package_version("kfp-kubernetes"),
+            "options": options,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached spec documents, or None"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path, "r") as file:
+                documents = json.load(file)
+        except (OSError, ValueError):
+            documents = None
+        with self._lock:
+            if documents is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return documents
+
+    def put(self, key, documents):
+        """Stores the compiled spec documents (pipeline spec and optional platform spec)"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(documents, file)
+        os.replace(tmp_path, os.path.join(self.cache_dir, f"{key}.json"))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cache_dir": self.cache_dir}
+
+
+COMPILED_PIPELINE_CACHE = CompiledPipelineCache()
+
+# name -> function(pipeline_spec, **options) that modifies a compiled pipeline spec dict in place
+PIPELINE_SPEC_TRANSFORMS = {}
+
+
+def pipeline_spec_transform(name):
+    """Registers the decorated function in PIPELINE_SPEC_TRANSFORMS"""
+
+    def register(func):
+        PIPELINE_SPEC_TRANSFORMS[name] = func
+        return func
+
+    return register
+
+
+def apply_pipeline_spec_transforms(pipeline_spec, transforms):
+    """Applies the transforms, a dict name -> options, to the pipeline spec dict in place"""
+    for name, options in transforms.items():
+        PIPELINE_SPEC_TRANSFORMS[name](pipeline_spec, **options)
+    return pipeline_spec
+
+
+def _executor_containers(pipeline_spec):
+    executors = pipeline_spec.get("deploymentSpec", {}).get("executors", {})
+    return [executor["container"] for executor in executors.values() if "container" in executor]
+
+
+@pipeline_spec_transform("pip_index_url")
+def rewrite_pip_index_url(pipeline_spec, pip_index_url, pip_trusted_host):
+    """Makes the pip install commands of the components use pip_index_url"""
+    pip_install = "python3 -m pip install"
+    for container in _executor_containers(pipeline_spec):
+        for field in ("command", "args"):
+            if field in container:
+                container[field] = [
+                    part.replace(
+                        pip_install, f"{pip_install} --index-url {pip_index_url} --trusted-host {pip_trusted_host}"
+                    )
+                    for part in container[field]
+                ]
+
+
+@pipeline_spec_transform("image_mirror")
+def rewrite_image_mirror(pipeline_spec, mirrors):
+    """Replaces the image prefixes of the components, mirrors is a dict source prefix -> mirror prefix"""
+    for container in _executor_containers(pipeline_spec):
+        for source, mirror in mirrors.items():
+            if container.get("image", "").startswith(source):
+                container["image"] = mirror + container["image"][len(source) :]
+                break
+
+
+class PipelineModuleCache:
+    """
+    Process-wide cache of the pipeline source modules, keyed by path and modification time, so that
+    the kfp decorators of a pipeline sample run only once per process instead of at every import
+    """
+
+    def __init__(self):
+        self._modules = {}
+        self._path_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path, loader):
+        """Returns the module loaded from path, calling loader(path) only if path is new or has changed"""
+        path = os.path.realpath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        # concurrent loads of the same file wait for the first one instead of executing it twice
+        with path_lock:
+            cached = self._modules.get(path)
+            if cached is not None and cached[0] == mtime:
+                with self._lock:
+                    self.hits += 1
+                return cached[1]
+            module = loader(path)
+            with self._lock:
+                self.misses += 1
+                self._modules[path] = (mtime, module)
+            return module
+
+    def clear(self):
+        with self._lock:
+            self._modules.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "modules": len(self._modules)}
+
+
+PIPELINE_MODULE_CACHE = PipelineModuleCache()
+
+# kfp builds the @dsl.pipeline graphs in a global context, pipeline modules can not be executed concurrently
+_PIPELINE_DEFINITION_LOCK = threading.Lock()
+
+
+# kfp releases whose private generated run API submit_pipeline_spec may call directly, kfp.Client only creates
+# runs from files. With any other release the runs are created with the public create_run_from_pipeline_package
+RUN_API_KFP_VERSIONS = ("2.13.",)
+
+
+def private_run_api(client):
+    """Returns the generated run API of client when the installed kfp is one of RUN_API_KFP_VERSIONS, else None"""
+    try:
+        version = importlib.metadata.version("kfp")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    if not version.startswith(RUN_API_KFP_VERSIONS):
+        return None
+    run_api = getattr(client, "_run_api", None)
+    return run_api if hasattr(run_api, "run_service_create_run") else None
+
+
+def default_experiment_name():
+    """Returns the experiment of the runs created without one, resolved as kfp.Client does"""
+    experiment_name = os.environ.get(KF_PIPELINES_DEFAULT_EXPERIMENT_NAME)
+    return os.environ.get(KF_PIPELINES_OVERRIDE_EXPERIMENT_NAME, experiment_name) or "Default"
+
+
+class KfpClientRegistry:
+    """
+    Process-wide registry of authenticated KFP clients, keyed by (route host, user, project), so that
+    library instances and suites that use the same DSPA reuse the client instead of logging in again.
+    Tokens that expire within refresh_margin seconds are refreshed before handing out the client
+    """
+
+    def __init__(self, refresh_margin: int = 300):
+        self.refresh_margin = refresh_margin
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (client, api) or None"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, client, api):
+        with self._lock:
+            self._entries[key] = (client, api)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def needs_refresh(self, api):
+        return api.token_expires_at is not None and time.time() > api.token_expires_at - self.refresh_margin
+
+
+KFP_CLIENT_REGISTRY = KfpClientRegistry()
 
 
 class DataSciencePipelinesKfp:
+    TERMINAL_RUN_STATES = ("SUCCEEDED", "FAILED", "SKIPPED", "CANCELED")
+
     # init should not have a call to external system, otherwise dry-run will fail
     def __init__(self):
         self.client = None
         self.api = None
+        # KFP_CLIENT_REGISTRY key of the client
+        self.client_key = None
 
-    def get_client(self, user, pwd, project, route_name="ds-pipeline-dspa"):
-        if self.client is None:
-            self.api = DataSciencePipelinesAPI(sleep_time=1)
-            self.api.login_and_wait_dsp_route(user, pwd, project, route_name)
-            self.client = Client(
-                host=f"https://{self.api.route}/",
-                existing_token=self.api.sa_token,
-                ssl_ca_cert=self.api.get_cert(),
-            )
+    def get_client(self, user, pwd, project, route_name="ds-pipeline-dspa", force_login=False):
+        if self.client is None or force_login:
+            api = DataSciencePipelinesAPI(sleep_time=1)
+            key = (api.get_route_host(project, route_name), user, project)
+            registered = None if force_login else KFP_CLIENT_REGISTRY.get(key)
+            if registered is not None and registered[1].is_dsp_ready():
+                print(f"Reusing the KFP client of {user} for {key[0]}")
+                self.client, self.api = registered
+            else:
+                KFP_CLIENT_REGISTRY.invalidate(key)
+                api.login_and_wait_dsp_route(user, pwd, project, route_name)
+                self.client = self._new_client(api)
+                self.api = api
+                key = (api.route, user, project)
+                KFP_CLIENT_REGISTRY.put(key, self.client, self.api)
+            self.client_key = key
+        elif self.client_key is not None:
+            # the client may have been replaced by another instance that refreshed the token
+            self.client, self.api = KFP_CLIENT_REGISTRY.get(self.client_key) or (self.client, self.api)
+        if KFP_CLIENT_REGISTRY.needs_refresh(self.api):
+            self.refresh_token(user, pwd)
         return self.client, self.api
 
+    @staticmethod
+    def _new_client(api):
+        return Client(host=f"https://{api.route}/", existing_token=api.sa_token, ssl_ca_cert=api.get_cert())
+
+    def refresh_token(self, user, pwd):
+        """
+        Gets a new token and a client using it, which replaces the previous one in KFP_CLIENT_REGISTRY
+        (kfp.Client has no public way to change the token of an existing client)
+        """
+        print(f"Refreshing the token of {user}")
+        self.api.fetch_token(user, pwd)
+        self.client = self._new_client(self.api)
+        if self.client_key is not None:
+            KFP_CLIENT_REGISTRY.put(self.client_key, self.client, self.api)
+
+    @keyword
+    def reset_kfp_client_registry(self):
+        """Forgets all the KFP clients shared across library instances, the next get_client will log in again"""
+        KFP_CLIENT_REGISTRY.invalidate()
+
     @keyword
     def setup_client(self, user, pwd, project, force_reset=False):
         """
-        Initializes the KFP SKD client when needed or when force_reset=True
+        Initializes the KFP SKD client when needed, or logs in again when force_reset=True.
+        A client already authenticated by another instance for the same route, user and project is reused
+        unless force_reset=True, which also replaces it for the other instances
         """
-        if force_reset:
-            self.client = None
-        self.get_client(user, pwd, project)
+        self.get_client(user, pwd, project, force_login=force_reset)
 
     def get_bucket_name(self, api, project):
-        bucket_name, _ = api.run_command(f"oc get dspa -n {project} dspa -o json")
-        objectStorage = json.loads(bucket_name)["spec"]["objectStorage"]
+        dspa = api.get_resource(
+            f"/apis/datasciencepipelinesapplications.opendatahub.io/v1/namespaces/{project}"
+            "/datasciencepipelinesapplications/dspa",
+            f"oc get dspa -n {project} dspa -o json",
+        )
+        objectStorage = dspa["spec"]["objectStorage"]
         if "minio" in objectStorage:
             return objectStorage["minio"]["bucket"]
         else:
             return objectStorage["externalStorage"]["bucket"]
 
     def import_souce_code(self, path):
+        """Imports the pipeline source file, reusing the module already loaded when the file has not changed"""
+        return PIPELINE_MODULE_CACHE.load(path, self._load_source_module)
+
+    @staticmethod
+    def _load_source_module(path):
         module_name = os.path.basename(path).replace("-", "_")
         spec = importlib.util.spec_from_loader(module_name, importlib.machinery.SourceFileLoader(module_name, path))
         module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        # reading and compiling the source can run in parallel, executing it can not
+        code = spec.loader.get_code(module_name)
+        with _PIPELINE_DEFINITION_LOCK:
+            exec(code, module.__dict__)  # noqa: S102
         sys.modules[module_name] = module
         return module
 
@@ -149,21 +479,23 @@ class DataSciencePipelinesKfp:
             return None
 
     @keyword
-    def get_all_pipeline_versions(self, pipeline_id: str):
+    def get_all_pipeline_versions(self, pipeline_id: str, page_size: int = 100):
         """
         Returns a list of all pipeline versions of a pipeline. When needed, this function goes through pagination
         in order to get all the pipeline versions
         """
-        all_versions = []
-        next_page_token = ""
-        while next_page_token is not None:
-            response = self.list_pipeline_versions(
-                pipeline_id=pipeline_id, page_token=next_page_token, page_size=10, sort_by="created_at desc"
-            )
-            next_page_token = response.next_page_token
-            if response.pipeline_versions is not None:
-                all_versions.extend(response.pipeline_versions)
-        return all_versions
+        return list(self.iter_all_pipeline_versions(pipeline_id, page_size))
+
+    def iter_all_pipeline_versions(self, pipeline_id: str, page_size: int = 100):
+        """
+        Yields all pipeline versions of a pipeline, newest first, prefetching the next page in the background
+        """
+        return iter_pages(
+            lambda page_token: self.list_pipeline_versions(
+                pipeline_id=pipeline_id, page_token=page_token, page_size=page_size, sort_by="created_at desc"
+            ),
+            "pipeline_versions",
+        )
 
     @keyword
     def list_pipeline_versions(
@@ -208,9 +540,42 @@ class DataSciencePipelinesKfp:
         """Deletes all pipeline versions for a pipeline
         :param pipeline_id: ID of the pipeline
         """
-        all_versions = self.get_all_pipeline_versions(pipeline_id=pipeline_id)
-        for pipeline_version in all_versions:
-            self.delete_pipeline_version(pipeline_version.pipeline_id, pipeline_version.pipeline_version_id)
+        summary = self.bulk_delete_all_pipeline_versions(pipeline_id)
+        assert summary["failed"] == 0, f"Some pipeline versions could not be deleted: {summary['errors']}"
+
+    @keyword
+    def bulk_delete_all_pipeline_versions(self, pipeline_id: str, max_in_flight: int = 8, rate_limit: float = 0):
+        """Deletes all pipeline versions for a pipeline concurrently
+        :param pipeline_id: ID of the pipeline
+        :param max_in_flight: max number of concurrent delete requests
+        :param rate_limit: max number of delete requests started per second, 0 means no limit
+        :return: summary dict, see bulk_delete
+        """
+        all_versions = self.iter_all_pipeline_versions(pipeline_id=pipeline_id)
+        return self.bulk_delete(
+            "pipeline versions",
+            [version.pipeline_version_id for version in all_versions],
+            lambda version_id: self.client.delete_pipeline_version(pipeline_id, version_id),
+            max_in_flight,
+            rate_limit,
+        )
+
+    def bulk_delete(self, kind, ids, delete_func, max_in_flight=8, rate_limit=0):
+        """
+        Calls delete_func(id) for all the ids concurrently
+        Returns a summary dict: deleted (count), failed (count), errors (list of {id, error}) and elapsed (seconds)
+        """
+        start = time.perf_counter()
+        results = run_bounded(delete_func, ids, max_in_flight, rate_limit)
+        errors = [{"id": item, "error": str(error)} for item, _, error, _ in results if error is not None]
+        summary = {
+            "deleted": len(results) - len(errors),
+            "failed": len(errors),
+            "errors": errors,
+            "elapsed": time.perf_counter() - start,
+        }
+        print(f"Deleted {summary['deleted']} {kind} ({summary['failed']} failed) in {summary['elapsed']:.2f}s")
+        return summary
 
     @keyword
     def run_pipeline(
@@ -257,13 +622,9 @@ class DataSciencePipelinesKfp:
         print(f"pipeline_params({type(pipeline_params)}): {pipeline_params}")
         print(f"downloading: {pipeline_url}")
         test_pipeline_run_yaml, _ = self.api.do_get(pipeline_url)
-        pipeline_file = "/tmp/test_pipeline_run_yaml.yaml"
-        with open(pipeline_file, "w", encoding="utf-8") as f:
-            f.write(test_pipeline_run_yaml)
-        print(f"{pipeline_url} content stored at {pipeline_file}")
+        documents = [document for document in yaml.safe_load_all(test_pipeline_run_yaml) if document]
         print("create a run from pipeline")
-        response = self.client.create_run_from_pipeline_package(pipeline_file=pipeline_file, arguments=pipeline_params)
-        return response.run_id
+        return self.submit_pipeline_spec(documents, pipeline_params)
 
     @keyword
     def import_run_pipeline_from_file(self, pipeline_file, pipeline_params):
@@ -276,6 +637,68 @@ class DataSciencePipelinesKfp:
         response = self.client.create_run_from_pipeline_package(pipeline_file=pipeline_file, arguments=pipeline_params)
         return response.run_id
 
+    @keyword
+    def submit_runs_concurrently(
+        self,
+        pipeline_file: str,
+        count: int = 10,
+        concurrency: int = 4,
+        arrival_rate: float = 0,
+        pipeline_params: dict[str, Any] | None = None,
+        experiment_id: str | None = None,
+        run_name_prefix: str = "scale-test",
+    ):
+        """Submits count runs of a compiled pipeline package to measure how the DSP API server behaves under load
+
+        :param pipeline_file: path of the compiled pipeline package
+        :param count: number of runs to submit
+        :param concurrency: max number of submissions in flight
+        :param arrival_rate: max number of submissions started per second, 0 means as fast as possible
+        :param pipeline_params: arguments of every run
+        :param experiment_id: experiment where to create the runs, Default experiment if not provided
+        :param run_name_prefix: runs are named <run_name_prefix>-<index>
+        :return: dict with submitted (count), failed (count), errors (list of messages), run_ids,
+            latency (p50, p95, p99, max and mean seconds of the successful submissions),
+            elapsed (seconds) and throughput (successful submissions per second)
+        """
+        if experiment_id is None:
+            experiment_id = self.get_default_experiment_id()
+
+        def submit(index):
+            response = self.client.create_run_from_pipeline_package(
+                pipeline_file=pipeline_file,
+                arguments=pipeline_params or {},
+                run_name=f"{run_name_prefix}-{index}",
+                experiment_id=experiment_id,
+            )
+            return response.run_id
+
+        start = time.perf_counter()
+        results = run_bounded(submit, range(int(count)), concurrency, arrival_rate)
+        elapsed = time.perf_counter() - start
+        latencies = [seconds for _, _, error, seconds in results if error is None]
+        errors = [f"{run_name_prefix}-{index}: {error}" for index, _, error, _ in results if error is not None]
+        summary = {
+            "submitted": len(latencies),
+            "failed": len(errors),
+            "errors": errors,
+            "run_ids": [run_id for _, run_id, error, _ in results if error is None],
+            "latency": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": max(latencies, default=None),
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+            },
+            "elapsed": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed > 0 else 0,
+        }
+        print(
+            f"Submitted {summary['submitted']} runs ({summary['failed']} failed) in {elapsed:.2f}s, "
+            f"latency: {summary['latency']}"
+        )
+        return summary
+
     @keyword
     def wait_for_run_completion(self, run_id, timeout=160, sleep_duration=5):
         """Waits for a run to complete"""
@@ -304,6 +727,71 @@ class DataSciencePipelinesKfp:
             count += 1
         return run_status  # pyright: ignore [reportPossiblyUnboundVariable]
 
+    @keyword
+    def wait_for_runs_completion(
+        self,
+        run_ids: list[str],
+        timeout: int = 160,
+        sleep_duration: int = 5,
+        namespace: str | None = None,
+        experiment_id: str | None = None,
+    ):
+        """
+        Waits for several runs at the same time, fetching all the pending runs with a single filtered
+        list_runs call per tick, so the total wait is the one of the slowest run.
+        :param run_ids: IDs of the runs to wait for
+        :param timeout: max seconds to wait for all the runs
+        :param sleep_duration: seconds between ticks
+        :param namespace: namespace of the runs, for multi-user deployments
+        :param experiment_id: experiment of the runs, optional
+        :return: dict run_id -> {"state": last known state, "duration": seconds from creation to completion
+            or None if the run did not finish before the timeout}
+        """
+        results = {run_id: {"state": None, "duration": None} for run_id in run_ids}
+        pending = set(run_ids)
+        deadline = time.monotonic() + timeout
+        while pending:
+            for run in self.list_runs_by_id(sorted(pending), namespace, experiment_id):
+                state = run.state
+                results[run.run_id]["state"] = state
+                if state in self.TERMINAL_RUN_STATES:
+                    pending.discard(run.run_id)
+                    if run.created_at is not None and run.finished_at is not None:
+                        results[run.run_id]["duration"] = (run.finished_at - run.created_at).total_seconds()
+                    print(f"Run {run.run_id} finished with state {state}")
+            if not pending or time.monotonic() + sleep_duration > deadline:
+                break
+            time.sleep(sleep_duration)
+        if pending:
+            print(f"Runs not finished after {timeout}s: {sorted(pending)}")
+        return results
+
+    def list_runs_by_id(self, run_ids, namespace=None, experiment_id=None):
+        """
+        Returns the runs with the given ids with one filtered list_runs call per page of 100 runs.
+        Falls back to one get_run call per run if the API server rejects the filter
+        """
+        run_filter = json.dumps(
+            {"predicates": [{"operation": "IN", "key": "run_id", "stringValues": {"values": list(run_ids)}}]}
+        )
+        try:
+            runs = list(
+                iter_pages(
+                    lambda page_token: self.list_runs(
+                        page_token=page_token,
+                        page_size=min(len(run_ids), 100),
+                        experiment_id=experiment_id,
+                        namespace=namespace,
+                        filter=run_filter,
+                    ),
+                    "runs",
+                )
+            )
+        except kfp_server_api.ApiException as e:
+            print(f"Filtering runs by id failed, getting them one by one: {e.reason}")
+            return [self.client.get_run(run_id) for run_id in run_ids]
+        return [run for run in runs if run.run_id in run_ids]
+
     @keyword
     def get_last_run_by_pipeline_name(self, pipeline_name: str | None = None, namespace: str | None = None):
         """
@@ -368,12 +856,30 @@ class DataSciencePipelinesKfp:
         return response
 
     @keyword
-    def get_all_runs(self, namespace: str, experiment_id: str | None = None, pipeline_version_id: str | None = None):
+    def get_all_runs(
+        self,
+        namespace: str,
+        experiment_id: str | None = None,
+        pipeline_version_id: str | None = None,
+        page_size: int = 100,
+    ):
         """
         Returns a list of all pipeline runs in an experiment, filtering by pipeline_version_id when provided.
         When needed, this function goes through pagination in order to get all the pipeline run
         """
+        return list(self.iter_all_runs(namespace, experiment_id, pipeline_version_id, page_size))
 
+    def iter_all_runs(
+        self,
+        namespace: str,
+        experiment_id: str | None = None,
+        pipeline_version_id: str | None = None,
+        page_size: int = 100,
+    ):
+        """
+        Yields all pipeline runs in an experiment, newest first, filtering by pipeline_version_id when provided.
+        The next page is prefetched in the background while the caller processes the current one
+        """
         if experiment_id is None:
             experiment_id = self.get_default_experiment_id()
 
@@ -392,22 +898,17 @@ class DataSciencePipelinesKfp:
         else:
             my_filter = ""
 
-        all_runs = []
-        next_page_token = ""
-        while next_page_token is not None:
-            response = self.list_runs(
-                page_token=next_page_token,
-                page_size=10,
+        return iter_pages(
+            lambda page_token: self.list_runs(
+                page_token=page_token,
+                page_size=page_size,
                 sort_by="created_at desc",
                 experiment_id=experiment_id,
                 namespace=namespace,
                 filter=my_filter,
-            )
-            next_page_token = response.next_page_token
-            if response.runs is not None:
-                all_runs.extend(response.runs)
-
-        return all_runs
+            ),
+            "runs",
+        )
 
     @keyword
     def delete_all_runs_in_experiment(
@@ -425,28 +926,82 @@ class DataSciencePipelinesKfp:
             f"experiment_id={experiment_id}, pipeline_version_id={pipeline_version_id}"
         )
         print(message)
-        all_runs = self.get_all_runs(
+        summary = self.bulk_delete_all_runs_in_experiment(namespace, experiment_id, pipeline_version_id)
+        assert summary["failed"] == 0, f"Some runs could not be deleted: {summary['errors']}"
+
+    @keyword
+    def bulk_delete_all_runs_in_experiment(
+        self,
+        namespace: str,
+        experiment_id: str | None = None,
+        pipeline_version_id: str | None = None,
+        max_in_flight: int = 8,
+        rate_limit: float = 0,
+    ):
+        """
+        Delete concurrently all pipeline runs in a namespace and experiment, optionally filtering by pipeline_version_id
+        :param namespace: Namespace where to delete the runs
+        :param experiment_id: Experiment ID where to find the runs. If not provided, delete from Default experiment
+        :param pipeline_version_id:  If provided, delete only runs for this pipeline_version_id
+        :param max_in_flight: max number of concurrent delete requests
+        :param rate_limit: max number of delete requests started per second, 0 means no limit
+        :return: summary dict, see bulk_delete
+        """
+        all_runs = self.iter_all_runs(
             namespace=namespace, experiment_id=experiment_id, pipeline_version_id=pipeline_version_id
         )
-        for pipeline_run in all_runs:
-            self.delete_run(pipeline_run.run_id)
+        return self.bulk_delete_runs([run.run_id for run in all_runs], max_in_flight, rate_limit)
 
     @keyword
     def delete_all_runs_for_pipeline(self, namespace: str, pipeline_id: str, experiment_id: str | None = None):
         """Delete all pipeline runs for all versions for a given pipeline and experiment. If experiment_id is not
         provided, Default experiment will be used"""
-        all_versions = self.get_all_pipeline_versions(pipeline_id=pipeline_id)
-        for pipeline_version in all_versions:
-            self.delete_all_runs_in_experiment(
-                namespace=namespace,
-                experiment_id=experiment_id,
-                pipeline_version_id=pipeline_version.pipeline_version_id,
-            )
+        summary = self.bulk_delete_all_runs_for_pipeline(namespace, pipeline_id, experiment_id)
+        assert summary["failed"] == 0, f"Some runs could not be deleted: {summary['errors']}"
+
+    @keyword
+    def bulk_delete_all_runs_for_pipeline(
+        self,
+        namespace: str,
+        pipeline_id: str,
+        experiment_id: str | None = None,
+        max_in_flight: int = 8,
+        rate_limit: float = 0,
+    ):
+        """Delete concurrently all pipeline runs for all versions for a given pipeline and experiment.
+        The runs of the experiment are listed once and filtered by the versions of the pipeline.
+        If experiment_id is not provided, Default experiment will be used
+        :return: summary dict, see bulk_delete
+        """
+        version_ids = {version.pipeline_version_id for version in self.iter_all_pipeline_versions(pipeline_id)}
+        all_runs = self.iter_all_runs(namespace=namespace, experiment_id=experiment_id)
+        run_ids = [run.run_id for run in all_runs if self.get_run_pipeline_version_id(run) in version_ids]
+        return self.bulk_delete_runs(run_ids, max_in_flight, rate_limit)
+
+    @keyword
+    def bulk_delete_runs(self, run_ids: list[str], max_in_flight: int = 8, rate_limit: float = 0):
+        """Deletes runs concurrently
+        :param run_ids: IDs of the runs to delete
+        :param max_in_flight: max number of concurrent delete requests
+        :param rate_limit: max number of delete requests started per second, 0 means no limit
+        :return: summary dict, see bulk_delete
+        """
+        return self.bulk_delete("runs", run_ids, self._delete_run, max_in_flight, rate_limit)
+
+    @staticmethod
+    def get_run_pipeline_version_id(run):
+        reference = getattr(run, "pipeline_version_reference", None)
+        if reference is not None and reference.pipeline_version_id:
+            return reference.pipeline_version_id
+        return getattr(run, "pipeline_version_id", None)
 
     @keyword
     def delete_run(self, run_id):
         """Deletes a run"""
         print(f"Deleting run {run_id}")
+        self._delete_run(run_id)
+
+    def _delete_run(self, run_id):
         response = self.client.delete_run(run_id)
         # means success
         assert len(response) == 0
@@ -464,10 +1019,16 @@ class DataSciencePipelinesKfp:
         route_name="ds-pipeline-dspa",
         pip_index_url=None,
         pip_trusted_host=None,
+        image_mirrors=None,
     ):
-        """Creates a pipeline run from a python function"""
+        """Creates a pipeline run from a python function
+
+        The pipeline is compiled in memory (or taken from COMPILED_PIPELINE_CACHE) and submitted without
+        temporary files. pip_index_url/pip_trusted_host and image_mirrors (dict source prefix -> mirror prefix)
+        are applied as transforms on the compiled spec
+        """
         print(f"pipeline_params: {pipeline_params}")
-        client, api = self.get_client(user, pwd, project, route_name)
+        _, api = self.get_client(user, pwd, project, route_name)
         mlpipeline_minio_artifact_secret = api.get_secret(project, "ds-pipeline-s3-dspa")
         bucket_name = self.get_bucket_name(api, project)
         # the current path is from where you are running the script
@@ -475,8 +1036,7 @@ class DataSciencePipelinesKfp:
         # the current_path will be ods-ci
         if current_path is None:
             current_path = os.getcwd()
-        my_source = self.import_souce_code(f"{current_path}/tests/Resources/Files/pipeline-samples/v2/{source_code}")
-        pipeline_func = getattr(my_source, fn)
+        source_path = f"{current_path}/tests/Resources/Files/pipeline-samples/v2/{source_code}"
         # pipeline_params
         # there are some special keys to retrieve argument values dynamically
         # in pipeline v2, we must match the parameters names
@@ -490,29 +1050,108 @@ class DataSciencePipelinesKfp:
             pipeline_params["openshift_token"] = self.api.get_openshift_token()
         print(f"pipeline_params modified with dynamic values: {sorted(pipeline_params.keys())}")
 
-        # create_run_from_pipeline_func will compile the code
-        # if you need to see the yaml, for debugging purpose, call: TektonCompiler().compile(pipeline, f'{fn}.yaml')
-        with tempfile.TemporaryDirectory() as tmpdir:
-            pipeline_package_path = os.path.join(tmpdir, "pipeline.yaml")
-            compiler.Compiler().compile(
-                pipeline_func=pipeline_func,
-                package_path=pipeline_package_path,
-            )
+        transforms = {}
+        if pip_index_url is not None:
+            assert pip_trusted_host is not None
+            transforms["pip_index_url"] = {"pip_index_url": pip_index_url, "pip_trusted_host": pip_trusted_host}
+        if image_mirrors:
+            transforms["image_mirror"] = {"mirrors": dict(image_mirrors)}
+        cache_key = COMPILED_PIPELINE_CACHE.key(source_path, fn, transforms=transforms)
+        documents = COMPILED_PIPELINE_CACHE.get(cache_key)
+        if documents is None:
+            documents = self.compile_pipeline(source_path, fn, transforms)
+            COMPILED_PIPELINE_CACHE.put(cache_key, documents)
+            print(f"Compiled pipeline {fn} from {source_code} (cache miss)")
+        else:
+            print(f"Reusing compiled pipeline {fn} from {source_code} (cache hit)")
+        print(f"Compiled pipeline cache: {COMPILED_PIPELINE_CACHE.stats()}")
 
-            if pip_index_url is not None:
-                assert pip_trusted_host is not None
-                with open(pipeline_package_path, "r") as file:
-                    file_content = file.read()
-                file_content = file_content.replace(
-                    "python3 -m pip install",
-                    f"python3 -m pip install --index-url {pip_index_url} --trusted-host {pip_trusted_host}",
-                )
-                with open(pipeline_package_path, "w") as file:
-                    file.write(file_content)
+        return self.submit_pipeline_spec(documents, pipeline_params)
 
-            result = client.create_run_from_pipeline_package(
-                pipeline_file=pipeline_package_path, arguments=pipeline_params
-            )
+    def compile_pipeline(self, source_path, fn, transforms=None):
+        """
+        Compiles the pipeline function fn from source_path in memory and applies the transforms
+        (dict name -> options, see PIPELINE_SPEC_TRANSFORMS) to the pipeline spec.
+        Returns the list of spec documents: the pipeline spec and, when used, the platform spec
+        """
+        my_source = self.import_souce_code(source_path)
+        pipeline_func = getattr(my_source, fn)
+        # same documents as compiler.Compiler().compile(pipeline_func, f"{fn}.yaml"), use it to see the yaml
+        documents = [json_format.MessageToDict(pipeline_func.pipeline_spec)]
+        if len(pipeline_func.platform_spec.platforms) > 0:
+            documents.append(json_format.MessageToDict(pipeline_func.platform_spec))
+        apply_pipeline_spec_transforms(documents[0], transforms or {})
+        return documents
+
+    def submit_pipeline_spec(self, documents, pipeline_params, run_name=None, experiment_id=None):
+        """
+        Creates a run from compiled spec documents (pipeline spec and optional platform specs), without
+        writing them to disk when the kfp release allows it (see RUN_API_KFP_VERSIONS).
+        The run is named after run_name, by default the name of the pipeline in the spec. Returns the run_id
+        """
+        if experiment_id is None:
+            experiment_id = self.client.create_experiment(name=default_experiment_name()).experiment_id
+        run_name = run_name or documents[0].get("pipelineInfo", {}).get("name", "pipeline")
+        display_name = f"{run_name} {time.strftime('%Y-%m-%d %H-%M-%S')}"
+        run_api = private_run_api(self.client)
+        if run_api is None:
+            with tempfile.NamedTemporaryFile("w", suffix=".yaml") as package:
+                yaml.safe_dump_all(documents, package, sort_keys=False)
+                package.flush()
+                run_id = self.client.create_run_from_pipeline_package(
+                    package.name, arguments=pipeline_params, run_name=display_name, experiment_id=experiment_id
+                ).run_id
+            print(f"Created run {run_id} ({display_name}) in experiment {experiment_id}")
+            return run_id
+        pipeline_spec = documents[0]
+        if len(documents) > 1:
+            platform_spec = {}
+            for document in documents[1:]:
+                platform_spec.update(document)
+            pipeline_spec = {"pipeline_spec": documents[0], "platform_spec": platform_spec}
+        run_body = kfp_server_api.V2beta1Run(
+            experiment_id=experiment_id,
+            display_name=display_name,
+            pipeline_spec=pipeline_spec,
+            runtime_config=kfp_server_api.V2beta1RuntimeConfig(parameters=pipeline_params),
+        )
+        # kfp.Client only creates runs from files, the generated run API takes the spec as a dict
+        response = run_api.run_service_create_run(body=run_body)
         # easy to debug and double check failures
-        print(result)
-        return result.run_id
+        print(f"Created run {response.run_id} ({response.display_name}) in experiment {experiment_id}")
+        return response.run_id
+
+    @keyword
+    def preload_pipeline_samples(self, current_path=None, max_in_flight=8):
+        """
+        Imports all the pipeline samples under tests/Resources/Files/pipeline-samples/v2, to be called at
+        suite setup so that creating runs does not pay the kfp decoration cost. The files are read and
+        compiled in parallel, the kfp decorators are executed one module at a time.
+        Samples that fail to import are reported but do not fail the keyword.
+        Returns the number of samples loaded
+        """
+        if current_path is None:
+            current_path = os.getcwd()
+        samples_dir = f"{current_path}/tests/Resources/Files/pipeline-samples/v2"
+        paths = sorted(
+            os.path.join(root, file_name)
+            for root, _, file_names in os.walk(samples_dir)
+            for file_name in file_names
+            if file_name.endswith(".py")
+        )
+        start = time.perf_counter()
+        results = run_bounded(self.import_souce_code, paths, max_in_flight=max_in_flight)
+        failed = [(path, error) for path, _, error, _ in results if error is not None]
+        for path, error in failed:
+            print(f"Could not preload {path}: {error!r}")
+        loaded = len(paths) - len(failed)
+        print(
+            f"Preloaded {loaded}/{len(paths)} pipeline samples in {time.perf_counter() - start:.2f}s, "
+            f"module cache: {PIPELINE_MODULE_CACHE.stats()}"
+        )
+        return loaded
+
+    @keyword
+    def get_compiled_pipeline_cache_stats(self):
+        """Returns the hits and misses of the compiled pipeline cache used by create_run_from_pipeline_func"""
+        return COMPILED_PIPELINE_CACHE.stats()
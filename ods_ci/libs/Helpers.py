@@ -1,17 +1,353 @@
 import ast
 import decimal
+import json
+import math
 import numbers
-import random
 import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import requests
 from fuzzywuzzy import fuzz
+from InferenceEndpoints import resolve_inference_ca_bundle
+from PrometheusMetrics import parse_prometheus_text
+from ResourceInventory import normalize_resource_name
 from robot.libraries.BuiltIn import BuiltIn
 from robotlibcore import keyword
 from semver import VersionInfo
-
-from ods_ci.utils.scripts.ocm.ocm import OpenshiftClusterManager
+from Statistics import percentiles
+
+from ods_ci.utils.scripts.ocm.ocm import CLUSTER_METADATA_CACHE, OpenshiftClusterManager
+from ods_ci.utils.scripts.oidc import OIDC_TOKENS
+
+MODEL_NAME = re.compile(r"^[\S]+(__isvc-)?[\w\d]+$")
+
+
+def parse_inference_payload(payload):
+    """Parses an inference request/response given as JSON or as a python literal, other types are returned as is"""
+    if not isinstance(payload, str | bytes):
+        return payload
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return ast.literal_eval(payload if isinstance(payload, str) else payload.decode("utf-8"))
+
+
+def _numeric_array(value):
+    """Returns value as a float64 ndarray if it is a (nested) list of numbers only, otherwise None"""
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        # ragged nested lists
+        return None
+    if array.dtype.kind not in "biuf":
+        return None
+    return array.astype(np.float64, copy=False)
+
+
+def _is_sequence(value):
+    return isinstance(value, list | np.ndarray)
+
+
+def compare_inference_results(expected, received, threshold=0.00001, max_failures=100):
+    """
+    Compares two parsed inference payloads. Numbers must be equal within +/- threshold, model names
+    are compared without their ID suffix and any other value must be equal.
+    Numeric lists and ndarrays (tensors) are compared in one vectorized pass.
+    Returns a dict with "failures" (at most max_failures of them, as [expected, received, difference]
+    for numbers), "compared" and "mismatches" (number of values) and "max_abs_diff"/"mean_abs_diff"
+    """
+    threshold = float(threshold)
+    # number of decimal places of the threshold, used to format the differences
+    decimals = abs(decimal.Decimal(str(threshold)).as_tuple().exponent)
+    report = {"failures": [], "compared": 0, "mismatches": 0, "max_abs_diff": 0.0, "sum_abs_diff": 0.0}
+
+    def add_failure(failure):
+        report["mismatches"] += 1
+        if len(report["failures"]) < max_failures:
+            report["failures"].append(failure)
+
+    def compare_numbers(expected, received):
+        diff = abs(expected - received)
+        report["compared"] += 1
+        report["sum_abs_diff"] += diff
+        report["max_abs_diff"] = max(report["max_abs_diff"], diff)
+        if not diff <= threshold:
+            add_failure([expected, received, f"{expected - received:.{decimals}f}"])
+
+    def compare_arrays(expected, received):
+        if expected.shape != received.shape:
+            add_failure([f"shape {expected.shape}", f"shape {received.shape}"])
+            return
+        diff = np.abs(expected - received)
+        # NaN differences are mismatches, as in the scalar comparison
+        mismatches = ~(diff <= threshold)
+        report["compared"] += diff.size
+        if diff.size:
+            report["sum_abs_diff"] += float(np.nansum(diff))
+            report["max_abs_diff"] = max(report["max_abs_diff"], float(np.nanmax(diff)))
+        count = int(np.count_nonzero(mismatches))
+        for index in np.flatnonzero(mismatches)[: max(0, max_failures - len(report["failures"]))]:
+            exp, rec = expected.flat[index].item(), received.flat[index].item()
+            report["failures"].append([exp, rec, f"{exp - rec:.{decimals}f}"])
+        report["mismatches"] += count
+
+    def compare(expected, received):
+        if isinstance(expected, dict):
+            # if current element is a dict, compare the keys and then each value
+            if not isinstance(received, dict) or expected.keys() != received.keys():
+                add_failure([expected.keys(), getattr(received, "keys", lambda: received)()])
+                if not isinstance(received, dict):
+                    return
+            for key in expected:
+                if key in received:
+                    compare(expected[key], received[key])
+        elif _is_sequence(expected):
+            if _is_sequence(received):
+                expected_array, received_array = _numeric_array(expected), _numeric_array(received)
+                if expected_array is not None and received_array is not None:
+                    compare_arrays(expected_array, received_array)
+                    return
+            # otherwise compare each value 1 by 1
+            if not _is_sequence(received) or len(expected) != len(received):
+                add_failure([expected, received])
+                return
+            for expected_item, received_item in zip(expected, received, strict=True):
+                compare(expected_item, received_item)
+        elif isinstance(expected, numbers.Number) and isinstance(received, numbers.Number):
+            compare_numbers(expected, received)
+        elif isinstance(expected, str) and isinstance(received, str):
+            # if element is model name, don't care about ID
+            if MODEL_NAME.match(expected) is not None and MODEL_NAME.match(received) is not None:
+                if expected.split("__")[0] != received.split("__")[0]:
+                    add_failure([expected, received])
+            elif expected != received:
+                add_failure([expected, received])
+        elif expected != received:
+            add_failure([expected, received])
+
+    compare(expected, received)
+    report["mean_abs_diff"] = report.pop("sum_abs_diff") / report["compared"] if report["compared"] else 0.0
+    return report
+
+
+# KServe v2 datatype -> little-endian numpy dtype of the binary data extension, BYTES are length-prefixed
+KSERVE_V2_DATATYPES = {
+    "BOOL": "|b1",
+    "UINT8": "|u1",
+    "UINT16": "<u2",
+    "UINT32": "<u4",
+    "UINT64": "<u8",
+    "INT8": "|i1",
+    "INT16": "<i2",
+    "INT32": "<i4",
+    "INT64": "<i8",
+    "FP16": "<f2",
+    "FP32": "<f4",
+    "FP64": "<f8",
+}
+INFERENCE_HEADER_CONTENT_LENGTH = "Inference-Header-Content-Length"
+
+
+def _kserve_v2_tensor_buffer(data, datatype):
+    if datatype == "BYTES":
+        elements = [value if isinstance(value, bytes) else str(value).encode("utf-8") for value in np.ravel(data)]
+        return b"".join(struct.pack("<I", len(element)) + element for element in elements)
+    # no copy when the array already has the wire dtype and is contiguous
+    array = np.ascontiguousarray(data, dtype=KSERVE_V2_DATATYPES[datatype])
+    return memoryview(array).cast("B")
+
+
+def build_kserve_v2_binary_request(inputs, outputs=None, model_name=None, binary_outputs=True):
+    """
+    Builds a KServe v2 inference request with the binary data extension: a JSON header followed by the raw
+    little-endian tensor buffers. inputs is a list of {"name", "shape", "datatype", "data"} tensors, data being
+    an ndarray or a (nested) list, as in the JSON requests. outputs is the list of the requested output names,
+    returned as binary data when binary_outputs is True. Returns (body, headers)
+    """
+    header = {"inputs": []}
+    if model_name is not None:
+        header["model_name"] = model_name
+    buffers = []
+    for tensor in inputs:
+        buffer = _kserve_v2_tensor_buffer(tensor["data"], tensor["datatype"])
+        parameters = {**tensor.get("parameters", {}), "binary_data_size": buffer.nbytes}
+        header["inputs"].append(
+            {
+                "name": tensor["name"],
+                "shape": list(tensor.get("shape", np.shape(tensor["data"]))),
+                "datatype": tensor["datatype"],
+                "parameters": parameters,
+            }
+        )
+        buffers.append(buffer)
+    if outputs:
+        header["outputs"] = [{"name": name, "parameters": {"binary_data": bool(binary_outputs)}} for name in outputs]
+    elif binary_outputs:
+        header["parameters"] = {"binary_data_output": True}
+    json_header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    headers = {
+        "Content-Type": "application/octet-stream",
+        INFERENCE_HEADER_CONTENT_LENGTH: str(len(json_header)),
+    }
+    # the buffers are only copied once, into the request body
+    return b"".join([json_header, *buffers]), headers
+
+
+def kserve_v2_json_to_binary_request(request, binary_outputs=True):
+    """Converts a KServe v2 JSON request (str or dict, e.g. modelmesh-mnist-input.json) to the binary format"""
+    request = parse_inference_payload(request)
+    outputs = [output["name"] for output in request.get("outputs", [])]
+    return build_kserve_v2_binary_request(request["inputs"], outputs, request.get("model_name"), binary_outputs)
+
+
+def parse_kserve_v2_binary_response(body, header_length=None):
+    """
+    Parses a KServe v2 response, with or without binary data. header_length is the value of the
+    Inference-Header-Content-Length header, None when the whole body is JSON.
+    Returns (JSON header, {output name: ndarray}), the arrays of binary outputs are views on body
+    """
+    body = memoryview(body)
+    header_length = len(body) if header_length is None else int(header_length)
+    header = json.loads(body[:header_length].tobytes())
+    tensors = {}
+    offset = header_length
+    for output in header.get("outputs", []):
+        datatype, shape = output["datatype"], output["shape"]
+        size = output.get("parameters", {}).get("binary_data_size")
+        if size is None:
+            data = np.asarray(output["data"], dtype=object if datatype == "BYTES" else KSERVE_V2_DATATYPES[datatype])
+            tensors[output["name"]] = data.reshape(shape)
+            continue
+        buffer = body[offset : offset + size]
+        offset += size
+        if datatype == "BYTES":
+            elements, position = [], 0
+            while position < size:
+                (length,) = struct.unpack_from("<I", buffer, position)
+                elements.append(buffer[position + 4 : position + 4 + length].tobytes())
+                position += 4 + length
+            tensors[output["name"]] = np.array(elements, dtype=object).reshape(shape)
+        else:
+            tensors[output["name"]] = np.frombuffer(buffer, dtype=KSERVE_V2_DATATYPES[datatype]).reshape(shape)
+    return header, tensors
+
+
+# random images generated by Send Random Inference Request, about 3MB each with the default shape
+MAX_UNIQUE_PAYLOADS = 16
+
+
+def build_random_inference_payloads(
+    name="image",
+    value_range=(0, 255),
+    shape=None,
+    count=1,
+    model_name="vehicle-detection-0202",
+):
+    """
+    Returns count serialized (bytes) inference requests with a random FP32 input tensor of the given shape
+    (dict of dimension name -> size, the first one is the batch size which is not part of the data)
+    """
+    shape = shape or {"B": 1, "C": 3, "H": 512, "W": 512}
+    dimensions = list(shape.values())
+    size = math.prod(dimensions[1:])
+    rng = np.random.default_rng()
+    payloads = []
+    for _ in range(int(count)):
+        data = rng.integers(value_range[0], value_range[1], size=size).tolist()
+        request = {
+            "model_name": model_name,
+            "inputs": [{"name": str(name), "shape": dimensions, "datatype": "FP32", "data": data}],
+        }
+        payloads.append(json.dumps(request, separators=(",", ":")).encode("utf-8"))
+    return payloads
+
+
+def run_inference_load(
+    endpoint,
+    payloads,
+    concurrency=8,
+    requests_count=None,
+    duration=None,
+    rps=0,
+    headers=None,
+    verify=True,
+    timeout=60,
+    raise_errors=False,
+):
+    """
+    Posts the pre-serialized payloads (round robin) to endpoint from concurrency threads, until
+    requests_count requests have been sent or duration seconds have elapsed. When rps > 0 the requests
+    are started on a fixed schedule of rps requests per second instead of as fast as possible.
+    Returns a dict with the number of requests, the throughput, the latency percentiles in ms,
+    the status code histogram (exceptions are counted by class name, or raised with raise_errors) and the
+    last response
+    """
+    if requests_count is None and duration is None:
+        raise ValueError("requests_count or duration is required")
+    local = threading.local()
+    lock = threading.Lock()
+    next_index = 0
+    latencies = []
+    status_codes = {}
+    last_response = [None, None]
+
+    def session():
+        if not hasattr(local, "session"):
+            # one keep-alive connection per thread
+            local.session = requests.Session()
+            local.session.verify = verify
+            local.session.headers.update(headers or {})
+        return local.session
+
+    def worker():
+        nonlocal next_index
+        while True:
+            with lock:
+                index = next_index
+                next_index += 1
+            if requests_count is not None and index >= requests_count:
+                return
+            scheduled = start + index / rps if rps else time.perf_counter()
+            if duration is not None and scheduled - start >= duration:
+                return
+            time.sleep(max(0.0, scheduled - time.perf_counter()))
+            sent = time.perf_counter()
+            try:
+                response = session().post(endpoint, data=payloads[index % len(payloads)], timeout=timeout)
+                status, text = response.status_code, response.text
+            except requests.RequestException as e:
+                if raise_errors:
+                    raise
+                status, text = type(e).__name__, str(e)
+            latency = (time.perf_counter() - sent) * 1000
+            with lock:
+                latencies.append(latency)
+                status_codes[status] = status_codes.get(status, 0) + 1
+                last_response[:] = [status, text]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as pool:
+        for future in [pool.submit(worker) for _ in range(max(1, int(concurrency)))]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "duration": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            **percentiles(latencies),
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "max": max(latencies, default=None),
+        },
+        "status_codes": status_codes,
+        "last_status_code": last_response[0],
+        "last_response": last_response[1],
+    }
 
 
 class Helpers:
@@ -69,11 +405,24 @@ class Helpers:
     @keyword
     def get_cluster_name(self, cluster_identifier):
         ocm_client = OpenshiftClusterManager()
-        # to manipulate ocm_describe on line 45
+        # cluster_name can be the name, the id or the external id of the cluster
         ocm_client.cluster_name = cluster_identifier
-        cluster_name = ocm_client.ocm_describe(jq_filter="--json | jq -r '.name'")
-        cluster_name = cluster_name.strip("\n")
-        return cluster_name
+        return ocm_client.get_cluster_field("name")
+
+    @keyword
+    def get_cluster_field(self, cluster_name, path):
+        """
+        Returns the field at the dotted path (e.g. version.raw_id) of the OCM cluster description.
+        The description is cached process-wide for CLUSTER_METADATA_CACHE.ttl seconds
+        """
+        ocm_client = OpenshiftClusterManager()
+        ocm_client.cluster_name = cluster_name
+        return ocm_client.get_cluster_field(path)
+
+    @keyword
+    def invalidate_cluster_metadata_cache(self):
+        """Forgets the cached OCM cluster descriptions and addon states, e.g. after changing a cluster outside ODS-CI"""
+        CLUSTER_METADATA_CACHE.invalidate()
 
     @keyword
     def is_rhods_addon_installed(self, cluster_name):
@@ -157,55 +506,13 @@ class Helpers:
 
     @keyword
     def inference_comparison(self, expected, received, threshold=0.00001):
+        """
+        Compares the expected and received inference responses (JSON or python literal strings),
+        numbers must be equal within +/- threshold. Returns (True/False, failures)
+        """
         try:
-            model_name = re.compile(r"^[\S]+(__isvc-)?[\w\d]+$")
-
-            # Cast from string to python type
-            expected = ast.literal_eval(expected)
-            received = ast.literal_eval(received)
-
-            failures = []
-
-            def _inference_object_comparison(expected, received, threshold):
-                if isinstance(expected, dict):
-                    # if current element is a dict, compare the keys and then each value
-                    if not expected.keys() == received.keys():
-                        failures.append([expected.keys(), received.keys()])
-                    for k in expected.keys():
-                        _inference_object_comparison(expected[k], received[k], threshold)
-                elif isinstance(expected, list):
-                    # if current element is a list, compare each value 1 by 1
-                    for id, _ in enumerate(expected):
-                        _inference_object_comparison(expected[id], received[id], threshold)
-                elif isinstance(expected, numbers.Number):
-                    # if current element is a number, compare each value with a rounding threshold
-                    if not expected - received <= threshold:
-                        # Get number of decimal places in the threshold number
-                        d = abs(decimal.Decimal(str(threshold)).as_tuple().exponent)
-                        # format the difference between expected and received with the same number of decimal
-                        # places as the current threshold
-                        failures.append(
-                            [
-                                expected,
-                                received,
-                                "{0:.{1}f}".format(expected - received, d),
-                            ]
-                        )
-                else:
-                    # if element is model name, don't care about ID
-                    result_ex = model_name.match(expected)
-                    result_rec = model_name.match(received)
-                    if result_ex is not None and result_rec is not None:
-                        if expected.split("__")[0] != received.split("__")[0]:
-                            failures.append([expected, received])
-                    # else compare values are equal
-                    elif not expected == received:
-                        failures.append([expected, received])
-
-            _inference_object_comparison(expected, received, threshold)
-            if len(failures) > 0:
-                return False, failures
-            return True, failures
+            report = self.inference_comparison_report(expected, received, threshold)
+            return report["mismatches"] == 0, report["failures"]
         except Exception as e:
             return False, [
                 ["exception thrown during comparison"],
@@ -215,6 +522,21 @@ class Helpers:
                 ["exception", e],
             ]
 
+    @keyword
+    def inference_comparison_report(self, expected, received, threshold=0.00001, max_failures=100):
+        """
+        Same comparison as Inference Comparison, returns the dict of compare_inference_results with
+        the number of compared and mismatching values and the max/mean absolute differences
+        """
+        report = compare_inference_results(
+            parse_inference_payload(expected), parse_inference_payload(received), threshold, int(max_failures)
+        )
+        print(
+            f"Compared {report['compared']} values: {report['mismatches']} mismatches, "
+            f"max abs diff {report['max_abs_diff']:.3g}, mean abs diff {report['mean_abs_diff']:.3g}"
+        )
+        return report
+
     @keyword
     def send_random_inference_request(
         self,
@@ -224,45 +546,106 @@ class Helpers:
         shape={"B": 1, "C": 3, "H": 512, "W": 512},
         no_requests=100,
     ):
-        for _ in range(no_requests):
-            data_img = [
-                random.randrange(value_range[0], value_range[1]) for _ in range(shape["C"] * shape["H"] * shape["W"])
-            ]
+        """
+        Sends no_requests sequential requests with a random image and returns the last (status code, text).
+        Up to MAX_UNIQUE_PAYLOADS different images are sent, connection errors are raised
+        """
+        payloads = build_random_inference_payloads(name, value_range, shape, min(int(no_requests), MAX_UNIQUE_PAYLOADS))
+        result = run_inference_load(
+            endpoint,
+            payloads,
+            concurrency=1,
+            requests_count=int(no_requests),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            verify=resolve_inference_ca_bundle(),
+            raise_errors=True,
+        )
+        return result["last_status_code"], result["last_response"]
 
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-            }
+    @keyword
+    def run_inference_load_test(
+        self,
+        endpoint,
+        name="image",
+        value_range=[0, 255],
+        shape={"B": 1, "C": 3, "H": 512, "W": 512},
+        concurrency=8,
+        no_requests=None,
+        duration=None,
+        rps=0,
+        unique_payloads=1,
+        model_name="vehicle-detection-0202",
+    ):
+        """
+        Sends random image inference requests to endpoint from concurrency threads, either no_requests
+        requests or for duration seconds, at rps requests per second when rps > 0.
+        unique_payloads random requests are generated and serialized up front and sent round robin.
+        Returns the dict of run_inference_load (throughput, latency percentiles, status codes histogram)
+        """
+        payloads = build_random_inference_payloads(name, value_range, shape, int(unique_payloads), model_name)
+        result = run_inference_load(
+            endpoint,
+            payloads,
+            concurrency=int(concurrency),
+            requests_count=int(no_requests) if no_requests is not None else None,
+            duration=float(duration) if duration is not None else None,
+            rps=float(rps),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            verify=resolve_inference_ca_bundle(),
+        )
+        print(
+            f"{result['requests']} requests in {result['duration']:.2f}s ({result['throughput']:.1f} req/s), "
+            f"latency ms: {result['latency_ms']}, status codes: {result['status_codes']}"
+        )
+        return result
 
-            data = (
-                '{ "model_name": "vehicle-detection-0202", "inputs": [{ "name": "'
-                + str(name)
-                + '", "shape": '
-                + str(list(shape.values()))
-                + ', "datatype": "FP32", "data": '
-                + str(data_img)
-                + " }]}"
-            )
+    @keyword
+    def send_kserve_v2_binary_inference_request(self, endpoint, request, outputs=None, token=None, timeout=60):
+        """
+        Sends the KServe v2 request (JSON string, dict or path of a JSON file) to endpoint using the binary
+        data extension and returns (status code, JSON header, {output name: ndarray}).
+        outputs overrides the output names requested in the request
+        """
+        if isinstance(request, str) and not request.lstrip().startswith("{"):
+            request = Path(request).read_text()
+        request = parse_inference_payload(request)
+        if outputs is not None:
+            request = {**request, "outputs": [{"name": name} for name in outputs]}
+        body, headers = kserve_v2_json_to_binary_request(request)
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+        response = requests.post(
+            endpoint, data=body, headers=headers, verify=resolve_inference_ca_bundle(), timeout=timeout
+        )
+        if response.status_code != 200:
+            return response.status_code, response.text, {}
+        header, tensors = parse_kserve_v2_binary_response(
+            response.content, response.headers.get(INFERENCE_HEADER_CONTENT_LENGTH)
+        )
+        return response.status_code, header, tensors
 
-            # This file only exists when running on self-managed clusters
-            ca_bundle = Path("openshift_ca.crt")
-            knative_ca_bundle = Path("openshift_ca_istio_knative.crt")
-            if ca_bundle.is_file():
-                response = requests.post(
-                    endpoint,
-                    headers=headers,
-                    data=data,
-                    verify="openshift_ca.crt",
-                )
-            elif knative_ca_bundle.is_file():
-                response = requests.post(
-                    endpoint,
-                    headers=headers,
-                    data=data,
-                    verify="openshift_ca_istio_knative.crt",
-                )
-            else:
-                response = requests.post(endpoint, headers=headers, data=data)
-        return response.status_code, response.text  # pyright: ignore [reportPossiblyUnboundVariable]
+    @keyword
+    def kserve_v2_binary_inference_comparison(self, expected, tensors, threshold=0.00001):
+        """
+        Compares the output tensors returned by Send Kserve V2 Binary Inference Request with the outputs of the
+        expected KServe v2 JSON response. Returns (True/False, failures) as Inference Comparison, an expected
+        response that can not be parsed is reported as a failure
+        """
+        try:
+            expected = parse_inference_payload(expected)
+            # the JSON data can be flat or nested, compare the flattened tensors
+            expected_tensors = {output["name"]: np.ravel(output["data"]) for output in expected["outputs"]}
+        except (KeyError, TypeError, ValueError, SyntaxError) as e:
+            return False, [["invalid expected response"], ["exception", e]]
+        received_tensors = {}
+        for name, tensor in tensors.items():
+            received_tensors[name] = np.ravel(tensor)
+            if received_tensors[name].dtype == object:
+                received_tensors[name] = [
+                    value.decode("utf-8") if isinstance(value, bytes) else value for value in received_tensors[name]
+                ]
+        report = compare_inference_results(expected_tensors, received_tensors, threshold)
+        return report["mismatches"] == 0, report["failures"]
 
     @keyword
     def process_resource_list(self, filename_in, filename_out=None):
@@ -276,14 +659,13 @@ class Helpers:
         (i.e. token) if they appear at the end of the string, however assuming the reference
         resource list as well as the runtime list are both processed this way, this should
         not cause an issue.
+        The same rules are used by the ResourceInventory library (see GENERATED_NAME_SUFFIX).
         """
-        regex = re.compile(r"-\b(?:[a-z]+\d|\d+[a-z])[a-z0-9]*\b|-\b[a-z0-9]{5}$\b")
         out = []
         with open(filename_in, "r") as f:
             for line in f:
                 spaces = line.count(" ")
-                resource_name = line.split()[1]
-                resource_name = regex.sub(repl="", string=resource_name)
+                resource_name = normalize_resource_name(line.split()[1])
                 out.append(line.split()[0] + " " * spaces + resource_name + "\n")
         if filename_out is None:
             filename_out = filename_in.split(".")[0] + "_processed.txt"
@@ -327,11 +709,12 @@ class Helpers:
         Fetch exposed metrics and their current values from a deployed vllm endpoint
         """
         r = requests.get(endpoint, verify=False)
-        regex = re.compile(r"^vllm:")
         out = []
-        for line in r.text.split("\n"):
-            if regex.match(line):
-                if 'le="+Inf"' in line:
+        for family in parse_prometheus_text(r.text):
+            for sample in family.samples:
+                if not sample.name.startswith("vllm:"):
+                    continue
+                if sample.labels.get("le") == "+Inf":
                     # TODO: this parameter breaks the query via API although it works fine in the openshift metrics UI
                     # need to figure out a way to fix it.
                     # le="+Inf" is converted to le=%22+Inf%22, which makes it return an empty response
@@ -339,33 +722,18 @@ class Helpers:
                     # doing the replace here doesn't work because of \", which breaks the URL entirely somehow
                     # line = line.replace('le="+Inf"', 'le%3D\"%2BInf')
                     continue
-                out.append(line.split(" "))
+                out.append(sample.line.split(" "))
         return out
 
     @keyword
     def get_oidc_token(self, issuer, username, password, token_endpoint="", client_id="oc-cli", scope="openid"):
-        url = token_endpoint if token_endpoint else f"{issuer}/protocol/openid-connect/token"
-        headers = {"Content-Type": "application/x-www-form-urlencoded", "User-Agent": "python-requests"}
-
-        data = {
-            "username": username,
-            "password": password,
-            "grant_type": "password",
-            "client_id": client_id,
-            "scope": scope,
-        }
-
-        response = requests.post(
-            url=url,
-            headers=headers,
-            data=data,
-            allow_redirects=True,
-            timeout=30,
-            verify=True,
-        )
-        response.raise_for_status()
-        json_response = response.json()
-
-        if "id_token" not in json_response:
-            raise AssertionError(f"No id_token in response: {json_response}")
-        return json_response["id_token"]
+        """
+        Returns the id token of the user, from the process-wide OIDC token cache while it is valid
+        """
+        try:
+            tokens = OIDC_TOKENS.get_tokens(
+                issuer, username, password, token_endpoint=token_endpoint, client_id=client_id, scope=scope
+            )
+        except ValueError as e:
+            raise AssertionError(str(e)) from e
+        return tokens["id_token"]
@@ -0,0 +1,183 @@
+import atexit
+import base64
+import json
+import os
+import tempfile
+import threading
+from typing import ClassVar
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+
+class KubernetesRestError(Exception):
+    """Raised when the API server can not be reached or answers with an unexpected status"""
+
+
+class KubernetesRestClient:
+    """
+    Minimal in-process client for the Kubernetes/OpenShift REST API.
+    It reads the current context of the kubeconfig once and keeps a pooled session to the
+    API server, so the polling loops of the libraries do not spawn an `oc` process per call.
+    Only token and client certificate credentials are supported, for any other
+    kubeconfig (e.g. exec or auth-provider users) from_kubeconfig() returns None
+    and the callers are expected to fall back to `oc`.
+    """
+
+    _clients: ClassVar[dict] = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, server, token=None, verify=True, cert=None, pool_size=10, timeout=30):
+        self.server = server.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = verify
+        self.session.cert = cert
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    @classmethod
+    def from_kubeconfig(cls, kubeconfig=None):
+        """
+        Returns a client for the current context of the kubeconfig, reusing the one already built
+        for the same file as long as the file has not changed (e.g. after a new `oc login`)
+        """
+        path = kubeconfig or cls._kubeconfig_path()
+        if path is None:
+            return None
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with cls._clients_lock:
+            key = (path, mtime)
+            if key not in cls._clients:
+                cls._clients = {key: cls._build_from_file(path)}
+            return cls._clients[key]
+
+    @staticmethod
+    def _kubeconfig_path():
+        """Returns the kubeconfig file oc uses, or None when KUBECONFIG merges several files"""
+        paths = [path for path in os.environ.get("KUBECONFIG", "").split(os.pathsep) if path]
+        if len(paths) > 1:
+            return None
+        return paths[0] if paths else os.path.expanduser("~/.kube/config")
+
+    @classmethod
+    def _build_from_file(cls, path):
+        try:
+            with open(path, "r") as fh:
+                config = yaml.safe_load(fh) or {}
+            context_name = config["current-context"]
+            context = next(c["context"] for c in config["contexts"] if c["name"] == context_name)
+            cluster = next(c["cluster"] for c in config["clusters"] if c["name"] == context["cluster"])
+            user = next(u["user"] for u in config.get("users", []) if u["name"] == context["user"]) or {}
+            token = user.get("token")
+            if token is None and "tokenFile" in user:
+                with open(user["tokenFile"], "r") as fh:
+                    token = fh.read().strip()
+        except (OSError, KeyError, TypeError, StopIteration, yaml.YAMLError):
+            return None
+
+        cert = None
+        if "client-certificate-data" in user and "client-key-data" in user:
+            cert = (
+                cls._data_to_file(user["client-certificate-data"]),
+                cls._data_to_file(user["client-key-data"]),
+            )
+        elif "client-certificate" in user and "client-key" in user:
+            cert = (user["client-certificate"], user["client-key"])
+        if token is None and cert is None:
+            return None
+
+        if cluster.get("insecure-skip-tls-verify"):
+            verify = False
+        elif "certificate-authority-data" in cluster:
+            verify = cls._data_to_file(cluster["certificate-authority-data"])
+        else:
+            verify = cluster.get("certificate-authority", True)
+        return cls(cluster["server"], token=token, verify=verify, cert=cert)
+
+    @staticmethod
+    def _data_to_file(data):
+        fd, file_name = tempfile.mkstemp(prefix="kube-rest-")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(base64.b64decode(data))
+        atexit.register(os.remove, file_name)
+        return file_name
+
+    def request(self, method, path, params=None):
+        """Returns (status_code, parsed json body or None)"""
+        try:
+            response = self.session.request(method, f"{self.server}{path}", params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise KubernetesRestError(f"{method} {path} failed: {e}") from e
+        if response.status_code in (401, 403):
+            raise KubernetesRestError(f"{method} {path} not authorized: {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def get(self, path):
+        """Returns the resource as a dict, or None when it does not exist"""
+        status, body = self.request("GET", path)
+        if status == 404:
+            return None
+        if status != 200:
+            raise KubernetesRestError(f"GET {path} returned {status}: {body}")
+        return body
+
+    def list(self, path, label_selector=None, field_selector=None):
+        """Returns the list response as a dict (the resources are in "items")"""
+        params = {}
+        if label_selector:
+            params["labelSelector"] = label_selector
+        if field_selector:
+            params["fieldSelector"] = field_selector
+        status, body = self.request("GET", path, params=params)
+        if status != 200:
+            raise KubernetesRestError(f"LIST {path} returned {status}: {body}")
+        return body
+
+    def delete(self, path):
+        """Returns True when the deletion was accepted, False when the resource does not exist"""
+        status, body = self.request("DELETE", path)
+        if status == 404:
+            return False
+        if status not in (200, 202):
+            raise KubernetesRestError(f"DELETE {path} returned {status}: {body}")
+        return True
+
+    def watch(self, path, resource_version, label_selector=None, field_selector=None, timeout_seconds=30):
+        """
+        Yields the watch events ({"type": ..., "object": ...}) of the resources under path, starting after
+        resource_version. The stream is closed by the API server after timeout_seconds
+        """
+        params = {
+            "watch": "true",
+            "resourceVersion": resource_version,
+            "allowWatchBookmarks": "true",
+            "timeoutSeconds": int(timeout_seconds),
+        }
+        if label_selector:
+            params["labelSelector"] = label_selector
+        if field_selector:
+            params["fieldSelector"] = field_selector
+        try:
+            with self.session.get(
+                f"{self.server}{path}", params=params, stream=True, timeout=(self.timeout, timeout_seconds + 5)
+            ) as response:
+                if response.status_code != 200:
+                    raise KubernetesRestError(f"WATCH {path} returned {response.status_code}")
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except requests.RequestException as e:
+            raise KubernetesRestError(f"WATCH {path} failed: {e}") from e
@@ -0,0 +1,207 @@
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from InferenceEndpoints import resolve_inference_ca_bundle
+from robotlibcore import keyword
+from Statistics import percentiles
+
+SSE_DONE = "[DONE]"
+
+
+def iter_sse_events(chunks):
+    """
+    Parses a Server-Sent Events stream incrementally from an iterable of byte chunks, which do not need
+    to be aligned with the events, and yields the data of each event as a string
+
+    >>> list(iter_sse_events([b'data: {"a"', b": 1}\\n\\nda", b"ta: [DONE]\\r\\n\\r\\n"]))
+    ['{"a": 1}', '[DONE]']
+    """
+    buffer = b""
+    for chunk in chunks:
+        # normalized on the whole buffer, a \r\n can be split across two chunks
+        buffer = (buffer + chunk).replace(b"\r\n", b"\n")
+        while b"\n\n" in buffer:
+            event, buffer = buffer.split(b"\n\n", 1)
+            data = [line[5:].removeprefix(b" ") for line in event.split(b"\n") if line.startswith(b"data:")]
+            if data:
+                yield b"\n".join(data).decode("utf-8")
+
+
+def _delta_text(event, chat):
+    choices = event.get("choices") or [{}]
+    if chat:
+        return (choices[0].get("delta") or {}).get("content") or ""
+    return choices[0].get("text") or ""
+
+
+def stream_completion(session, url, body, chat=False, timeout=300):
+    """
+    Sends one streaming completion request and measures it on the client side.
+    Every chunk with text counts as one token, unless the server reports the usage at the end of the stream.
+    Returns a dict with the status, ttft, inter_token_latencies and e2e_latency in seconds, the number of
+    prompt/output tokens and the generated text
+    """
+    result = {"status": None, "error": None, "ttft": None, "inter_token_latencies": [], "e2e_latency": None}
+    chunks_at, text, usage = [], [], None
+    start = time.perf_counter()
+    try:
+        with session.post(url, json=body, stream=True, timeout=timeout) as response:
+            result["status"] = response.status_code
+            if response.status_code != 200:
+                result["error"] = response.text
+                return result
+            for data in iter_sse_events(response.iter_content(chunk_size=None)):
+                if data == SSE_DONE:
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                delta = _delta_text(event, chat)
+                if delta:
+                    chunks_at.append(time.perf_counter())
+                    text.append(delta)
+    except (requests.RequestException, ValueError) as e:
+        result["error"] = repr(e)
+        return result
+    end = time.perf_counter()
+    output_tokens = (usage or {}).get("completion_tokens") or len(chunks_at)
+    result.update(
+        e2e_latency=end - start,
+        output_tokens=output_tokens,
+        prompt_tokens=(usage or {}).get("prompt_tokens"),
+        text="".join(text),
+    )
+    if chunks_at:
+        result["ttft"] = chunks_at[0] - start
+        if output_tokens > len(chunks_at) > 1:
+            # several tokens per chunk, spread the decode time evenly over the tokens
+            decode_time = chunks_at[-1] - chunks_at[0]
+            result["inter_token_latencies"] = [decode_time / (output_tokens - 1)] * (output_tokens - 1)
+        else:
+            result["inter_token_latencies"] = [later - earlier for earlier, later in itertools.pairwise(chunks_at)]
+    return result
+
+
+def run_streaming_benchmark(url, bodies, concurrency=8, requests_count=None, chat=False, headers=None, verify=True):
+    """
+    Sends requests_count (default len(bodies)) streaming requests, the bodies round robin, from concurrency
+    threads. Returns (summary, per request results). The summary uses the keys of the vLLM metrics summary of
+    the PrometheusMetrics library (ttft_p95, inter_token_latency_p95, e2e_latency_p95,
+    generation_tokens_per_second...) so the client and server side measures can be compared
+    """
+    requests_count = len(bodies) if requests_count is None else int(requests_count)
+    local = threading.local()
+    indexes = iter(range(requests_count))
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        local.session = requests.Session()
+        local.session.verify = verify
+        local.session.headers.update(headers or {})
+        while True:
+            with lock:
+                index = next(indexes, None)
+            if index is None:
+                local.session.close()
+                return
+            result = stream_completion(local.session, url, bodies[index % len(bodies)], chat)
+            with lock:
+                results.append(result)
+
+    start = time.perf_counter()
+    workers = max(1, int(concurrency))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(worker) for _ in range(workers)]:
+            future.result()
+    duration = time.perf_counter() - start
+    return summarize_results(results, duration), results
+
+
+def summarize_results(results, duration):
+    succeeded = [result for result in results if result["error"] is None]
+    ttfts = [result["ttft"] for result in succeeded if result["ttft"] is not None]
+    itls = [itl for result in succeeded for itl in result["inter_token_latencies"]]
+    e2e = [result["e2e_latency"] for result in succeeded]
+    output_tokens = sum(result["output_tokens"] for result in succeeded)
+    per_request_tokens_per_second = [
+        result["output_tokens"] / result["e2e_latency"] for result in succeeded if result["e2e_latency"]
+    ]
+    summary = {
+        "requests": len(results),
+        "failed_requests": len(results) - len(succeeded),
+        "duration": duration,
+        "requests_per_second": len(succeeded) / duration if duration else None,
+        "output_tokens": output_tokens,
+        "generation_tokens_per_second": output_tokens / duration if duration else None,
+        "request_tokens_per_second_mean": (
+            sum(per_request_tokens_per_second) / len(per_request_tokens_per_second)
+            if per_request_tokens_per_second
+            else None
+        ),
+    }
+    for prefix, values in (("ttft", ttfts), ("inter_token_latency", itls), ("e2e_latency", e2e)):
+        for pct, value in percentiles(values, (50, 95, 99)).items():
+            summary[f"{prefix}_{pct}"] = value
+        summary[f"{prefix}_mean"] = sum(values) / len(values) if values else None
+    return summary
+
+
+class LLMStreamingBenchmark:
+    """Keywords to benchmark OpenAI-compatible completion endpoints (e.g. vLLM) with streaming requests"""
+
+    @keyword
+    def run_openai_streaming_benchmark(
+        self,
+        endpoint,
+        model_name,
+        prompts,
+        concurrency=8,
+        no_requests=None,
+        max_tokens=128,
+        chat=False,
+        token=None,
+        verify=None,
+    ):
+        """
+        Sends no_requests (default one per prompt) streaming requests to the v1/completions endpoint, or
+        v1/chat/completions when chat is True, of the inference endpoint from concurrency threads.
+        prompts is a prompt or a list of prompts, sent round robin.
+        Returns the summary of run_streaming_benchmark: time to first token, inter-token latency and end to end
+        latency percentiles in seconds, output tokens per second in aggregate and per request
+        """
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        chat = str(chat).lower() == "true"
+        url = f"{endpoint.rstrip('/')}/v1/{'chat/completions' if chat else 'completions'}"
+        bodies = []
+        for prompt in prompts:
+            body = {
+                "model": model_name,
+                "max_tokens": int(max_tokens),
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            }
+            if chat:
+                body["messages"] = [{"role": "user", "content": prompt}]
+            else:
+                body["prompt"] = prompt
+            bodies.append(body)
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        summary, results = run_streaming_benchmark(
+            url,
+            bodies,
+            concurrency=int(concurrency),
+            requests_count=int(no_requests) if no_requests is not None else None,
+            chat=chat,
+            headers=headers,
+            verify=resolve_inference_ca_bundle() if verify is None else verify,
+        )
+        for result in results:
+            if result["error"] is not None:
+                print(f"Request failed with status {result['status']}: {result['error']}")
+        print(f"Streaming benchmark of {url}: {summary}")
+        return summary
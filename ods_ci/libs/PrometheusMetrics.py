@@ -0,0 +1,369 @@
+import math
+import re
+import threading
+import time
+from typing import NamedTuple
+
+import requests
+from robotlibcore import keyword
+
+LABEL = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"\s*,?')
+LABEL_ESCAPES = {"\\\\": "\\", '\\"': '"', "\\n": "\n"}
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count", "_created")
+SUMMARY_SUFFIXES = ("_sum", "_count", "_created")
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: dict
+    value: float
+    timestamp: float | None = None
+    # the exposition line the sample was parsed from
+    line: str | None = None
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str
+    help: str
+    samples: list
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _unescape(value):
+    return re.sub(r"\\[\\\"n]", lambda match: LABEL_ESCAPES[match.group(0)], value)
+
+
+def parse_sample(line):
+    """
+    Parses one sample line of the Prometheus text exposition format
+
+    >>> sample = parse_sample('vllm:num_requests_running{model_name="granite"} 3')
+    >>> sample.name, sample.labels, sample.value, sample.timestamp
+    ('vllm:num_requests_running', {'model_name': 'granite'}, 3.0, None)
+    """
+    labels = {}
+    brace = line.find("{")
+    if brace == -1:
+        name, _, rest = line.partition(" ")
+    else:
+        name = line[:brace]
+        position = brace + 1
+        while True:
+            match = LABEL.match(line, position)
+            if match is None:
+                break
+            labels[match.group(1)] = _unescape(match.group(2))
+            position = match.end()
+        end = line.index("}", position)
+        rest = line[end + 1 :]
+    fields = rest.split()
+    timestamp = float(fields[1]) / 1000 if len(fields) > 1 else None
+    return Sample(name.strip(), labels, float(fields[0]), timestamp, line)
+
+
+def parse_prometheus_text(lines):
+    """
+    Parses the Prometheus text exposition format from an iterable of lines (e.g. response.iter_lines())
+    or a string, and yields the metric families in the order they are exposed.
+    The _bucket, _sum and _count samples of histograms and summaries are part of their family.
+    Sample lines that can not be parsed are logged and skipped
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    family = None
+    for raw_line in lines:
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            parts = line.split(None, 3)
+            if len(parts) < 3 or parts[1] not in ("TYPE", "HELP"):
+                continue
+            if family is None or family.name != parts[2]:
+                if family is not None:
+                    yield family
+                family = MetricFamily(parts[2], "untyped", "", [])
+            text = parts[3] if len(parts) > 3 else ""
+            family = family._replace(**{"type" if parts[1] == "TYPE" else "help": text})
+            continue
+        try:
+            sample = parse_sample(line)
+        except (ValueError, IndexError):
+            print(f"Skipping unparsable metrics line: {line}")
+            continue
+        if family is None or not _belongs_to(sample.name, family):
+            if family is not None:
+                yield family
+            family = MetricFamily(sample.name, "untyped", "", [])
+        family.samples.append(sample)
+    if family is not None:
+        yield family
+
+
+def _belongs_to(sample_name, family):
+    if sample_name == family.name:
+        return True
+    suffixes = {"histogram": HISTOGRAM_SUFFIXES, "summary": SUMMARY_SUFFIXES}.get(family.type, ())
+    return any(sample_name == family.name + suffix for suffix in suffixes)
+
+
+def histogram_quantile(quantile, buckets):
+    """
+    Returns the quantile (0 to 1) of a histogram given as {upper bound: cumulative count}, interpolating
+    linearly inside the bucket as Prometheus' histogram_quantile() does. Returns None without observations
+
+    >>> histogram_quantile(0.5, {1.0: 10, 3.0: 30, 5.0: 40, math.inf: 40})
+    2.0
+    """
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = quantile * buckets[bounds[-1]]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if math.isinf(bound):
+                # the quantile is in the +Inf bucket, the best estimate is the highest finite bound
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return bounds[-1]
+
+
+def format_sample(sample):
+    """
+    Formats the sample as an exposition line without timestamp
+
+    >>> format_sample(Sample("vllm:num_requests_running", {"model_name": "granite"}, 3.0))
+    'vllm:num_requests_running{model_name="granite"} 3.0'
+    """
+    labels = ",".join(f'{key}="{_escape(value)}"' for key, value in sample.labels.items())
+    return f"{sample.name}{{{labels}}} {sample.value}" if labels else f"{sample.name} {sample.value}"
+
+
+def _series_key(sample):
+    return sample.name, tuple(sorted(sample.labels.items()))
+
+
+def _matches(labels, selector):
+    return all(labels.get(key) == value for key, value in (selector or {}).items())
+
+
+class MetricsSampler:
+    """
+    Scrapes a metrics endpoint every interval seconds from a background thread and keeps the samples,
+    to compute counter rates and histogram quantiles over the sampled window
+    """
+
+    def __init__(self, endpoint, interval=5.0, verify=False, headers=None, timeout=10):
+        self.endpoint = endpoint
+        self.interval = float(interval)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update(headers or {})
+        self.snapshots = []
+        self.errors = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scrape(self):
+        """Scrapes the endpoint once and stores the snapshot {(name, labels): value}"""
+        scraped_at = time.monotonic()
+        try:
+            with self.session.get(self.endpoint, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                snapshot = {
+                    _series_key(sample): sample.value
+                    for family in parse_prometheus_text(response.iter_lines())
+                    for sample in family.samples
+                }
+        except (requests.RequestException, ValueError, IndexError) as e:
+            with self._lock:
+                self.errors.append(repr(e))
+            return
+        with self._lock:
+            self.snapshots.append((scraped_at, snapshot))
+
+    def start(self):
+        self.scrape()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.scrape()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        # the last scrape closes the window
+        self.scrape()
+        self.session.close()
+
+    def _window(self):
+        with self._lock:
+            if len(self.snapshots) < 2:
+                return None
+            return self.snapshots[0], self.snapshots[-1]
+
+    def _delta(self, name, labels=None):
+        """Returns (seconds, {series labels: increase}) of the series of name between the first and last scrape"""
+        window = self._window()
+        if window is None:
+            return None, {}
+        (first_time, first), (last_time, last) = window
+        deltas = {}
+        for (series_name, series_labels), value in last.items():
+            if series_name == name and _matches(dict(series_labels), labels):
+                previous = first.get((series_name, series_labels), 0.0)
+                # a counter that went down has been reset, its value is the increase since the reset
+                deltas[series_labels] = value - previous if value >= previous else value
+        return last_time - first_time, deltas
+
+    def rate(self, name, labels=None):
+        """Per-second increase of the counter name (summed over the series matching labels), or None"""
+        seconds, deltas = self._delta(name, labels)
+        if not seconds or not deltas:
+            return None
+        return sum(deltas.values()) / seconds
+
+    def quantile(self, name, quantile, labels=None):
+        """Quantile of the observations of the histogram name made during the sampled window, or None"""
+        _, deltas = self._delta(f"{name}_bucket", labels)
+        buckets = {}
+        for series_labels, delta in deltas.items():
+            bound = float(dict(series_labels)["le"])
+            buckets[bound] = buckets.get(bound, 0.0) + delta
+        return histogram_quantile(quantile, buckets)
+
+    def mean(self, name, labels=None):
+        """Mean of the observations of the histogram or summary name made during the sampled window, or None"""
+        _, sums = self._delta(f"{name}_sum", labels)
+        _, counts = self._delta(f"{name}_count", labels)
+        count = sum(counts.values())
+        return sum(sums.values()) / count if count else None
+
+    def gauge(self, name, labels=None):
+        """Returns {"min", "max", "mean", "last"} of the sampled values of the gauge name, or None"""
+        with self._lock:
+            values = [
+                sum(
+                    value
+                    for (series_name, series_labels), value in snapshot.items()
+                    if series_name == name and _matches(dict(series_labels), labels)
+                )
+                for _, snapshot in self.snapshots
+            ]
+        if not values:
+            return None
+        return {"min": min(values), "max": max(values), "mean": sum(values) / len(values), "last": values[-1]}
+
+
+# vLLM metrics summarized by Stop Metrics Sampler: summary key -> (kind, metric name, quantile)
+VLLM_PERFORMANCE_METRICS = {
+    "generation_tokens_per_second": ("rate", "vllm:generation_tokens_total", None),
+    "prompt_tokens_per_second": ("rate", "vllm:prompt_tokens_total", None),
+    "requests_per_second": ("rate", "vllm:request_success_total", None),
+    "ttft_p50": ("quantile", "vllm:time_to_first_token_seconds", 0.5),
+    "ttft_p95": ("quantile", "vllm:time_to_first_token_seconds", 0.95),
+    "inter_token_latency_p95": ("quantile", "vllm:time_per_output_token_seconds", 0.95),
+    "e2e_latency_p50": ("quantile", "vllm:e2e_request_latency_seconds", 0.5),
+    "e2e_latency_p95": ("quantile", "vllm:e2e_request_latency_seconds", 0.95),
+    "queue_time_p95": ("quantile", "vllm:request_queue_time_seconds", 0.95),
+    "queue_time_mean": ("mean", "vllm:request_queue_time_seconds", None),
+    "running_requests_max": ("gauge_max", "vllm:num_requests_running", None),
+    "waiting_requests_max": ("gauge_max", "vllm:num_requests_waiting", None),
+}
+
+# name -> MetricsSampler, shared by the library instances of all the tests of the process
+SAMPLERS = {}
+
+
+def summarize(sampler, metrics, labels=None):
+    """Returns {summary key: value or None} for metrics, a dict like VLLM_PERFORMANCE_METRICS"""
+    summary = {}
+    for key, (kind, name, quantile) in metrics.items():
+        if kind == "rate":
+            summary[key] = sampler.rate(name, labels)
+        elif kind == "quantile":
+            summary[key] = sampler.quantile(name, quantile, labels)
+        elif kind == "mean":
+            summary[key] = sampler.mean(name, labels)
+        else:
+            gauge = sampler.gauge(name, labels)
+            summary[key] = gauge["max"] if gauge else None
+    return summary
+
+
+class PrometheusMetrics:
+    """Keywords to parse Prometheus metrics and to sample them during a test, e.g. vLLM performance SLOs"""
+
+    @keyword
+    def parse_prometheus_metrics(self, text):
+        """Returns {family name: {"type", "help", "samples": [(name, labels, value), ...]}} of the exposition text"""
+        return {
+            family.name: {
+                "type": family.type,
+                "help": family.help,
+                "samples": [(sample.name, sample.labels, sample.value) for sample in family.samples],
+            }
+            for family in parse_prometheus_text(text)
+        }
+
+    @keyword
+    def start_metrics_sampler(self, endpoint, interval=5, name="default", verify=False, token=None):
+        """
+        Starts scraping the metrics endpoint every interval seconds in the background.
+        Stop it with Stop Metrics Sampler to get the rates and quantiles over the sampled window
+        """
+        if name in SAMPLERS:
+            SAMPLERS.pop(name).stop()
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        SAMPLERS[name] = MetricsSampler(endpoint, interval, verify, headers).start()
+
+    @keyword
+    def stop_metrics_sampler(self, name="default", labels=None):
+        """
+        Stops the sampler and returns the vLLM performance summary (see VLLM_PERFORMANCE_METRICS) of the
+        sampled window, for the series matching the labels dict. Unavailable values are None
+        """
+        sampler = SAMPLERS.pop(name)
+        sampler.stop()
+        summary = summarize(sampler, VLLM_PERFORMANCE_METRICS, labels)
+        summary["scrapes"] = len(sampler.snapshots)
+        summary["scrape_errors"] = len(sampler.errors)
+        print(f"Metrics sampler {name} summary: {summary}")
+        return summary
+
+    @keyword
+    def performance_slos_should_be_met(self, summary, **slos):
+        """
+        Fails if a value of the summary is above its maximum, e.g. ttft_p95=0.5 e2e_latency_p95=10,
+        or below its minimum for the keys prefixed with min_, e.g. min_generation_tokens_per_second=100.
+        A missing value is a failure
+        """
+        violations = []
+        for slo, limit in slos.items():
+            key = slo.removeprefix("min_")
+            value = summary.get(key)
+            limit = float(limit)
+            if value is None:
+                violations.append(f"{key} is not available")
+            elif slo.startswith("min_") and value < limit:
+                violations.append(f"{key} = {value:.4g} < {limit:.4g}")
+            elif not slo.startswith("min_") and value > limit:
+                violations.append(f"{key} = {value:.4g} > {limit:.4g}")
+        if violations:
+            raise AssertionError(f"Performance SLOs not met: {', '.join(violations)}")
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from KubernetesRestClient import KubernetesRestClient, KubernetesRestError
+from robotlibcore import keyword
+
+# Generated suffixes of resource names, see Helpers.process_resource_list
+GENERATED_NAME_SUFFIX = re.compile(r"-\b(?:[a-z]+\d|\d+[a-z])[a-z0-9]*\b|-\b[a-z0-9]{5}$\b")
+
+# kind -> (API prefix, plural, namespaced) of the resources included in the inventory by default
+DEFAULT_INVENTORY_KINDS = {
+    "Deployment": ("/apis/apps/v1", "deployments", True),
+    "StatefulSet": ("/apis/apps/v1", "statefulsets", True),
+    "DaemonSet": ("/apis/apps/v1", "daemonsets", True),
+    "Pod": ("/api/v1", "pods", True),
+    "Service": ("/api/v1", "services", True),
+    "ConfigMap": ("/api/v1", "configmaps", True),
+    "ServiceAccount": ("/api/v1", "serviceaccounts", True),
+    "Role": ("/apis/rbac.authorization.k8s.io/v1", "roles", True),
+    "RoleBinding": ("/apis/rbac.authorization.k8s.io/v1", "rolebindings", True),
+    "Route": ("/apis/route.openshift.io/v1", "routes", True),
+    "NetworkPolicy": ("/apis/networking.k8s.io/v1", "networkpolicies", True),
+    "ClusterRole": ("/apis/rbac.authorization.k8s.io/v1", "clusterroles", False),
+    "CustomResourceDefinition": ("/apis/apiextensions.k8s.io/v1", "customresourcedefinitions", False),
+}
+
+# kinds compared by name and count only, the spec of a pod changes with its scheduling (e.g. nodeName)
+IDENTITY_ONLY_KINDS = {"Pod"}
+
+# kind -> fields hashed by default for the kinds without a spec, the other kinds are hashed by their spec
+INVENTORY_FIELDS = {
+    "ConfigMap": ("data", "binaryData"),
+    # the secrets of a service account are generated, only its token mounting policy is compared
+    "ServiceAccount": ("automountServiceAccountToken",),
+    "Role": ("rules",),
+    "ClusterRole": ("rules", "aggregationRule"),
+    "RoleBinding": ("roleRef", "subjects"),
+}
+DEFAULT_FIELDS = ("spec",)
+
+
+def normalize_resource_name(name):
+    """
+    Removes the pseudorandom suffixes of a resource name
+
+    >>> normalize_resource_name("rhods-dashboard-7d9f8c6b5-x2k9p")
+    'rhods-dashboard'
+    """
+    return GENERATED_NAME_SUFFIX.sub(repl="", string=name)
+
+
+def content_hash(resource, fields):
+    """Returns a short digest of the fields of the resource, or "" when fields is empty"""
+    if not fields:
+        return ""
+    content = json.dumps([resource.get(field) for field in fields], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def build_index(resources, fields=None):
+    """
+    Builds the inventory index of (kind, resource dict) pairs: {"Kind/namespace/normalized name": [count, hash]}.
+    Resources with the same normalized name (e.g. the pods of a deployment) share an entry, counted,
+    with the hash of the sorted hashes of their content: the given fields, by default the ones of their kind in
+    INVENTORY_FIELDS or their spec
+    """
+    members = {}
+    for kind, resource in resources:
+        metadata = resource.get("metadata", {})
+        identity = f"{kind}/{metadata.get('namespace', '')}/{normalize_resource_name(metadata.get('name', ''))}"
+        if kind in IDENTITY_ONLY_KINDS:
+            hashed_fields = ()
+        else:
+            hashed_fields = fields if fields is not None else INVENTORY_FIELDS.get(kind, DEFAULT_FIELDS)
+        members.setdefault(identity, []).append(content_hash(resource, hashed_fields))
+    index = {}
+    for identity, hashes in members.items():
+        combined = hashes[0] if len(hashes) == 1 else content_hash({"hashes": sorted(hashes)}, ("hashes",))
+        index[identity] = [len(hashes), combined]
+    return index
+
+
+def diff_indexes(before, after):
+    """Returns {"added", "removed", "changed"}, the sorted identities that differ between the two indexes"""
+    before_keys, after_keys = before.keys(), after.keys()
+    return {
+        "added": sorted(after_keys - before_keys),
+        "removed": sorted(before_keys - after_keys),
+        "changed": sorted(identity for identity in before_keys & after_keys if before[identity] != after[identity]),
+    }
+
+
+def _oc_list(plural, prefix, namespace):
+    group = prefix.removeprefix("/apis/").rsplit("/", 1)[0] if prefix.startswith("/apis/") else ""
+    resource = f"{plural}.{group}" if group else plural
+    command = ["oc", "get", resource, "-o", "json"]
+    command += ["-n", namespace] if namespace else ["--all-namespaces"]
+    completed = subprocess.run(command, capture_output=True, text=True, check=False)
+    if completed.returncode != 0:
+        raise KubernetesRestError(f"{' '.join(command)} failed: {completed.stderr.strip()}")
+    return json.loads(completed.stdout)["items"]
+
+
+def list_kind(client, prefix, plural, namespace=None):
+    """
+    Lists the resources of one kind in namespace, or in all the namespaces, with one call.
+    Returns (items, the error of the REST call when the items were listed with oc instead, else None)
+    """
+    path = f"{prefix}/namespaces/{namespace}/{plural}" if namespace else f"{prefix}/{plural}"
+    fallback = None
+    if client is not None:
+        try:
+            return client.list(path)["items"], None
+        except KubernetesRestError as e:
+            fallback = str(e)
+    return _oc_list(plural, prefix, namespace), fallback
+
+
+def take_snapshot(client, kinds=None, namespaces=None, fields=None, max_in_flight=8):
+    """
+    Lists all the kinds (dict like DEFAULT_INVENTORY_KINDS) concurrently, one call per kind and namespace
+    (or one per kind when namespaces is empty), and returns the snapshot with its index.
+    Kinds that can not be listed, e.g. not installed, are reported in "errors", the ones listed with oc
+    because the REST call failed in "fallbacks"
+    """
+    kinds = kinds or DEFAULT_INVENTORY_KINDS
+    calls = [
+        (kind, prefix, plural, namespace)
+        for kind, (prefix, plural, namespaced) in kinds.items()
+        for namespace in (namespaces if namespaces and namespaced else [None])
+    ]
+
+    def fetch(call):
+        _, prefix, plural, namespace = call
+        try:
+            return call, *list_kind(client, prefix, plural, namespace), None
+        except (KubernetesRestError, ValueError) as e:
+            return call, [], None, str(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, int(max_in_flight))) as pool:
+        results = list(pool.map(fetch, calls))
+    resources = [(call[0], resource) for call, items, _, _ in results for resource in items]
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "kinds": sorted(kinds),
+        "namespaces": sorted(namespaces or []),
+        "fields": list(fields) if fields is not None else None,
+        "errors": {f"{call[0]}/{call[3] or ''}": error for call, _, _, error in results if error},
+        "fallbacks": {f"{call[0]}/{call[3] or ''}": fallback for call, _, fallback, _ in results if fallback},
+        "resources": len(resources),
+        "seconds": time.perf_counter() - start,
+        "index": build_index(resources, fields),
+    }
+
+
+def _load_snapshot(snapshot):
+    if isinstance(snapshot, dict):
+        return snapshot
+    with open(snapshot, "r") as file:
+        return json.load(file)
+
+
+class ResourceInventory:
+    """Keywords to snapshot the resources of the cluster and to compare the snapshots, e.g. before/after upgrade"""
+
+    @keyword
+    def take_resource_inventory_snapshot(self, namespaces=None, kinds=None, output_file=None, fields=None):
+        """
+        Takes a snapshot of the resources of the kinds (names of DEFAULT_INVENTORY_KINDS, default all of them)
+        in the namespaces (default all). Generated name suffixes are removed as in Process Resource List, and
+        each resource is stored as a short hash of its fields (default the ones of its kind in INVENTORY_FIELDS,
+        e.g. the data of a ConfigMap, or its spec).
+        The snapshot is written to output_file as JSON when given, and returned
+        """
+        if isinstance(namespaces, str):
+            namespaces = [namespaces]
+        if isinstance(kinds, str):
+            kinds = [kinds]
+        if isinstance(fields, str):
+            fields = [fields]
+        selected = {kind: DEFAULT_INVENTORY_KINDS[kind] for kind in kinds} if kinds else None
+        snapshot = take_snapshot(
+            KubernetesRestClient.from_kubeconfig(), selected, namespaces, tuple(fields) if fields is not None else None
+        )
+        print(
+            f"Inventory of {snapshot['resources']} resources ({len(snapshot['index'])} entries) "
+            f"taken in {snapshot['seconds']:.2f}s, errors: {snapshot['errors']}"
+        )
+        if snapshot["fallbacks"]:
+            print(f"Listed with oc: {snapshot['fallbacks']}")
+        if output_file is not None:
+            with open(output_file, "w") as file:
+                json.dump(snapshot, file, separators=(",", ":"))
+        return snapshot
+
+    @keyword
+    def compare_resource_inventory_snapshots(self, before, after):
+        """
+        Compares two snapshots (dicts or JSON files written by Take Resource Inventory Snapshot) and returns
+        {"added", "removed", "changed"} lists of "Kind/namespace/name" entries
+        """
+        diff = diff_indexes(_load_snapshot(before)["index"], _load_snapshot(after)["index"])
+        print(f"Inventory diff: {', '.join(f'{len(value)} {key}' for key, value in diff.items())}")
+        return diff
+
+    @keyword
+    def resource_inventory_snapshots_should_be_equal(self, before, after, ignore=None):
+        """
+        Fails if the snapshots differ, ignoring the entries that match one of the ignore regular expressions
+        """
+        patterns = [re.compile(pattern) for pattern in ignore or []]
+        diff = self.compare_resource_inventory_snapshots(before, after)
+        differences = {
+            key: [identity for identity in identities if not any(p.search(identity) for p in patterns)]
+            for key, identities in diff.items()
+        }
+        if any(differences.values()):
+            raise AssertionError(f"Resource inventories differ: {differences}")
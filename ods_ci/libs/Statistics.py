@@ -0,0 +1,26 @@
+import math
+
+
+def percentile(values, pct):
+    """
+    Returns the pct percentile (nearest-rank) of values, or None if values is empty
+
+    >>> percentile([3, 1, 4, 1, 5, 9, 2, 6], 50)
+    3
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def percentiles(values, pcts=(50, 90, 95, 99)):
+    """
+    Returns {"p<pct>": value} with the nearest-rank percentiles of values, None when values is empty
+
+    >>> percentiles(range(1, 101), (50, 99))
+    {'p50': 50, 'p99': 99}
+    """
+    ordered = sorted(values)
+    return {f"p{pct}": percentile(ordered, pct) for pct in pcts}
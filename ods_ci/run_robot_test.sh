@@ -312,6 +312,24 @@ if command -v yq &> /dev/null
                                   --auth-provider-arg=id-token="$(echo "$tokens" | jq -r .id_token)"
                           oc auth whoami
                           retVal=$?
+                        elif [ -n "${ODS_CI_KUBE_SESSIONS_DIR}" ]; then
+                          # one login per cluster and user shared by the parallel runs, in its own kubeconfig
+                          # (same session naming as ods_ci/utils/scripts/login_broker.py)
+                          mkdir -p "${ODS_CI_KUBE_SESSIONS_DIR}"
+                          session_key=$(printf '%s\n%s' "${oc_host}" "${oc_user}" | sha256sum | cut -c1-16)
+                          export KUBECONFIG="${ODS_CI_KUBE_SESSIONS_DIR}/${session_key}.kubeconfig"
+                          exec {session_lock}>"${KUBECONFIG}.lock"
+                          flock "${session_lock}"
+                          if [ -s "${KUBECONFIG}" ] && oc whoami &> /dev/null; then
+                            echo "Reusing the oc login session of ${oc_user} in ${KUBECONFIG}"
+                            retVal=0
+                          else
+                            echo "Performing oc login using username and password into ${KUBECONFIG}"
+                            oc login "${oc_host}" --username "${oc_user}" --password "${oc_pass}" --insecure-skip-tls-verify=true
+                            retVal=$?
+                            chmod 600 "${KUBECONFIG}" 2> /dev/null
+                          fi
+                          exec {session_lock}>&-
                         else
                           echo "Performing oc login using username and password"
                           oc login "${oc_host}" --username "${oc_user}" --password "${oc_pass}" --insecure-skip-tls-verify=true
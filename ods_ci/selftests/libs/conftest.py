@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Robot Framework puts the directory of a library on sys.path when importing it,
+# and the pipelines libraries rely on that to import each other by module name
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "libs"))
@@ -0,0 +1,235 @@
+"""In-process stand-in for the Data Science Pipelines API server, used to benchmark the pipelines libraries."""
+
+import datetime
+import itertools
+import json
+import re
+import socket
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = "/apis/v2beta1"
+
+# kfp sends the filter operations as numbers, the libraries as names
+FILTER_OPERATIONS = {1: "EQUALS", 2: "NOT_EQUALS", 8: "IN", 9: "IS_SUBSTRING"}
+
+
+class DSPStubServer:
+    """Serves the runs, pipelines, pipeline versions and experiments endpoints of /apis/v2beta1 from memory.
+
+    Every request is delayed by `latency` seconds and list responses never contain more than `max_page_size`
+    items, whatever the client asks for. The server runs in a background thread:
+
+    >>> with DSPStubServer() as server:
+    ...     run_ids = server.add_runs(3)
+    ...     len(server.list_items("runs", {}, {})["runs"])
+    3
+    """
+
+    def __init__(self, latency: float = 0.0, max_page_size: int = 100):
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.request_counts = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._store = {"runs": {}, "pipelines": {}, "pipeline_versions": {}, "experiments": {}}
+        self.default_experiment_id = self.add_experiment("Default")
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _new_item(self, kind, id_key, **fields):
+        with self._lock:
+            item_id = f"{kind[:-1]}-{next(self._ids)}"
+            # distinct timestamps keep the "created_at desc" order stable
+            created_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC) + datetime.timedelta(
+                seconds=len(self._store[kind])
+            )
+            item = {id_key: item_id, "created_at": created_at.isoformat().replace("+00:00", "Z"), **fields}
+            self._store[kind][item_id] = item
+        return item
+
+    def add_experiment(self, display_name):
+        return self._new_item("experiments", "experiment_id", display_name=display_name)["experiment_id"]
+
+    def add_pipeline(self, display_name, versions=1):
+        """Returns (pipeline_id, [pipeline_version_id, ...])"""
+        pipeline_id = self._new_item("pipelines", "pipeline_id", display_name=display_name)["pipeline_id"]
+        version_ids = [
+            self._new_item(
+                "pipeline_versions", "pipeline_version_id", pipeline_id=pipeline_id, display_name=f"{display_name}-{i}"
+            )["pipeline_version_id"]
+            for i in range(versions)
+        ]
+        return pipeline_id, version_ids
+
+    def add_runs(self, count, experiment_id=None, pipeline_id=None, pipeline_version_id=None, state="SUCCEEDED"):
+        """Returns the ids of the new runs"""
+        return [
+            self._new_item(
+                "runs",
+                "run_id",
+                display_name=f"run-{i}",
+                experiment_id=experiment_id or self.default_experiment_id,
+                pipeline_version_reference={"pipeline_id": pipeline_id, "pipeline_version_id": pipeline_version_id},
+                state=state,
+                finished_at="2024-01-02T00:00:00Z",
+            )["run_id"]
+            for i in range(count)
+        ]
+
+    def count(self, kind):
+        with self._lock:
+            return len(self._store[kind])
+
+    def reset_request_counts(self):
+        with self._lock:
+            self.request_counts = {}
+
+    @staticmethod
+    def _field(item, key):
+        if key in item:
+            return item[key]
+        return (item.get("pipeline_version_reference") or {}).get(key)
+
+    def _matches(self, item, predicates):
+        for predicate in predicates:
+            operation = predicate.get("operation")
+            operation = FILTER_OPERATIONS.get(operation, operation)
+            value = self._field(item, predicate["key"])
+            if operation == "EQUALS" and value != predicate.get("stringValue", predicate.get("string_value")):
+                return False
+            if operation == "IN":
+                values = predicate.get("stringValues", predicate.get("string_values", {})).get("values", [])
+                if value not in values:
+                    return False
+        return True
+
+    def list_items(self, kind, params, scope):
+        """Returns the list response for kind, filtered by the scope fields and the `filter` query parameter"""
+        predicates = json.loads(params["filter"]).get("predicates", []) if params.get("filter") else []
+        with self._lock:
+            items = [
+                item
+                for item in self._store[kind].values()
+                if all(item.get(key) == value for key, value in scope.items()) and self._matches(item, predicates)
+            ]
+        sort_by = params.get("sort_by", "")
+        if sort_by:
+            field, _, order = sort_by.partition(" ")
+            items.sort(key=lambda item: item.get(field) or "", reverse=order == "desc")
+        offset = int(params.get("page_token") or 0)
+        page_size = min(int(params.get("page_size") or 10), self.max_page_size)
+        page = items[offset : offset + page_size]
+        response = {kind: page, "total_size": len(items)}
+        if offset + page_size < len(items):
+            response["next_page_token"] = str(offset + page_size)
+        return response
+
+    def handle(self, method, path, params, body):
+        """Returns (status, response body)"""
+        time.sleep(self.latency)
+        segments = path[len(API_PREFIX) :].strip("/").split("/")
+        endpoint = re.sub(r"-\d+", "-*", "/".join(segments))
+        with self._lock:
+            key = f"{method} {endpoint}"
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+        if segments == ["healthz"]:
+            return 200, {"multi_user": False}
+        kind = segments[0]
+        if kind == "pipelines" and len(segments) >= 3 and segments[2] == "versions":
+            scope = {"pipeline_id": segments[1]}
+            kind, segments = "pipeline_versions", ["pipeline_versions", *segments[3:]]
+        else:
+            scope = {}
+            if params.get("experiment_id") and kind == "runs" and method == "GET":
+                scope["experiment_id"] = params["experiment_id"]
+        if kind not in self._store:
+            return 404, {"error": f"unknown path {path}"}
+        if len(segments) == 1:
+            return self._handle_collection(method, kind, params, body, scope)
+        return self._handle_item(method, kind, segments[1])
+
+    def _handle_collection(self, method, kind, params, body, scope):
+        if method == "GET":
+            return 200, self.list_items(kind, params, scope)
+        id_key = {"runs": "run_id", "experiments": "experiment_id"}.get(kind)
+        if method != "POST" or id_key is None:
+            return 405, {"error": "not supported"}
+        body = dict(body or {})
+        body.pop(id_key, None)
+        if kind == "runs":
+            body.setdefault("experiment_id", self.default_experiment_id)
+            body["state"] = "PENDING"
+        return 200, self._new_item(kind, id_key, **body)
+
+    def _handle_item(self, method, kind, item_id):
+        with self._lock:
+            if item_id not in self._store[kind]:
+                return 404, {"error": f"{item_id} not found"}
+            if method == "DELETE":
+                del self._store[kind][item_id]
+                return 200, {}
+            return 200, self._store[kind][item_id]
+
+
+def _handler_for(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # headers and body are written separately, avoid the delayed ACK stall of keep-alive connections
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _dispatch(self, method):
+            url = urllib.parse.urlsplit(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            status, response = server.handle(method, url.path, params, body)
+            payload = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):  # noqa: N802
+            self._dispatch("GET")
+
+        def do_POST(self):  # noqa: N802
+            self._dispatch("POST")
+
+        def do_DELETE(self):  # noqa: N802
+            self._dispatch("DELETE")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
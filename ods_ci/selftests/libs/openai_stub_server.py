@@ -0,0 +1,104 @@
+"""In-process stand-in for an OpenAI-compatible completions server, used to test the LLM streaming benchmark."""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class OpenAIStubServer:
+    """Streams `tokens` tokens for /v1/completions and /v1/chat/completions requests as Server-Sent Events.
+
+    The first token is sent after `ttft` seconds and the next ones every `itl` seconds, one token per event.
+    `max_tokens` of the request caps the number of tokens:
+
+    >>> import requests
+    >>> with OpenAIStubServer(tokens=3) as server:
+    ...     body = {"model": "m", "prompt": "hi", "max_tokens": 2, "stream": True}
+    ...     response = requests.post(f"{server.url}/v1/completions", json=body)
+    ...     [line for line in response.text.splitlines() if line][-1]
+    'data: [DONE]'
+    """
+
+    def __init__(self, tokens: int = 10, ttft: float = 0.0, itl: float = 0.0):
+        self.tokens = tokens
+        self.ttft = ttft
+        self.itl = itl
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def events(self, path, body):
+        """Yields the data of the events of the streamed response"""
+        with self._lock:
+            self.requests += 1
+        chat = path.endswith("/chat/completions")
+        tokens = min(self.tokens, body.get("max_tokens") or self.tokens)
+        time.sleep(self.ttft)
+        for i in range(tokens):
+            if i:
+                time.sleep(self.itl)
+            choice = {"index": 0, "delta": {"content": f"t{i} "}} if chat else {"index": 0, "text": f"t{i} "}
+            yield json.dumps({"model": body.get("model"), "choices": [choice]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield json.dumps({"choices": [], "usage": {"prompt_tokens": 4, "completion_tokens": tokens}})
+        yield "[DONE]"
+
+
+def _handler_for(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # every event is written on its own, do not wait to coalesce them
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):  # noqa: N802
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if self.path not in ("/v1/completions", "/v1/chat/completions") or not body.get("stream"):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for data in server.events(self.path, body):
+                self._write_chunk(f"data: {data}\n\n".encode())
+            self._write_chunk(b"")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,228 @@
+import base64
+import threading
+import time
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import DataSciencePipelinesAPI as dsp_api
+import pytest
+from DataSciencePipelinesAPI import AdaptiveProbe, DataSciencePipelinesAPI, PooledHTTPTransport, RouterCABundleCache
+from KubernetesRestClient import KubernetesRestClient
+
+from ods_ci.utils.scripts.command_cache import CommandCache
+
+KUBECONFIG = """\
+apiVersion: v1
+current-context: main
+contexts: [{name: main, context: {cluster: test-cluster, user: admin}}]
+clusters: [{name: test-cluster, cluster: {server: "https://api.cluster:6443", insecure-skip-tls-verify: true}}]
+users: [{name: admin, user: {tokenFile: %s}}]
+"""
+
+
+@pytest.fixture
+def no_sleep():
+    with unittest.mock.patch.object(dsp_api.HTTP_TRANSPORT, "sleep") as sleep:
+        yield sleep
+
+
+class _UnavailableTwiceHandler(BaseHTTPRequestHandler):
+    """Answers 503 to the first two requests of the server, 200 afterwards"""
+
+    def do_GET(self):  # noqa: N802
+        self.server.requests += 1
+        self.send_response(503 if self.server.requests <= 2 else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPooledHTTPTransport:
+    def test_retry_backoff_is_not_network_time(self):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), _UnavailableTwiceHandler)
+        httpd.requests = 0
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        transport = PooledHTTPTransport(retries=3, backoff_factor=0.25)
+        try:
+            start = time.perf_counter()
+            response = transport.request("get", f"http://127.0.0.1:{httpd.server_address[1]}/")
+            elapsed = time.perf_counter() - start
+        finally:
+            transport.close()
+            httpd.shutdown()
+            httpd.server_close()
+        assert response.status_code == 200
+        stats = transport.stats()
+        assert stats["requests"] == 1
+        assert stats["retries"] == 2
+        # urllib3 does not wait before the first retry, then backoff_factor * 2
+        assert stats["retry_backoff_seconds"] >= 0.5
+        assert stats["network_seconds"] <= elapsed - stats["retry_backoff_seconds"] + 0.01
+
+
+class TestKubernetesRestClientFromKubeconfig:
+    def write_kubeconfig(self, tmp_path, token_file):
+        kubeconfig = tmp_path / "kubeconfig"
+        kubeconfig.write_text(KUBECONFIG % token_file)
+        return str(kubeconfig)
+
+    def test_token_file(self, tmp_path):
+        (tmp_path / "token").write_text("sha256~token\n")
+        client = KubernetesRestClient.from_kubeconfig(self.write_kubeconfig(tmp_path, tmp_path / "token"))
+        assert client.token == "sha256~token"
+
+    def test_missing_token_file_falls_back_to_oc(self, tmp_path):
+        assert KubernetesRestClient.from_kubeconfig(self.write_kubeconfig(tmp_path, tmp_path / "missing")) is None
+
+    def test_merged_kubeconfigs_fall_back_to_oc(self, tmp_path, monkeypatch):
+        (tmp_path / "token").write_text("sha256~token\n")
+        kubeconfig = self.write_kubeconfig(tmp_path, tmp_path / "token")
+        monkeypatch.setenv("KUBECONFIG", f"{kubeconfig}:{tmp_path / 'other'}")
+        assert KubernetesRestClient.from_kubeconfig() is None
+        monkeypatch.setenv("KUBECONFIG", kubeconfig)
+        assert KubernetesRestClient.from_kubeconfig().token == "sha256~token"
+
+
+class TestRemovePipelineProject:
+    def test_waits_until_the_project_is_gone(self, no_sleep):
+        library = DataSciencePipelinesAPI()
+        terminating = {"status": {"phase": "Terminating"}}
+        with (
+            unittest.mock.patch.object(library, "delete_resource"),
+            unittest.mock.patch.object(library, "get_resource", side_effect=[terminating] * 45 + [None]) as get,
+        ):
+            library.remove_pipeline_project("dsp-test")
+        assert get.call_count == 46
+
+    def test_fails_when_the_project_is_still_terminating(self, no_sleep):
+        library = DataSciencePipelinesAPI()
+        with (
+            unittest.mock.patch.object(library, "delete_resource"),
+            unittest.mock.patch.object(library, "get_resource", return_value={"status": {"phase": "Terminating"}}),
+            pytest.raises(AssertionError, match="still exists after 0 seconds"),
+        ):
+            library.remove_pipeline_project("dsp-test", timeout=0)
+
+
+class TestGetCert:
+    def test_secret_is_fetched_once_per_miss(self):
+        library = DataSciencePipelinesAPI()
+        secret = {"metadata": {"resourceVersion": "42"}, "data": {"tls.crt": base64.b64encode(b"CERT\n").decode()}}
+        with (
+            unittest.mock.patch.object(dsp_api, "ROUTER_CA_BUNDLE", RouterCABundleCache()),
+            unittest.mock.patch.object(library, "get_secret", return_value=secret) as get_secret,
+        ):
+            with open(library.get_cert()) as bundle:
+                assert bundle.read().startswith("CERT\n")
+        assert get_secret.call_count == 1
+
+
+def pod(name, phase="Running", resource_version="1"):
+    return {"metadata": {"name": name, "resourceVersion": resource_version}, "status": {"phase": phase}}
+
+
+class FakePodsClient:
+    """Lists the initial pods, then streams the watch events of each watch call"""
+
+    def __init__(self, pods, watches):
+        self.pods = pods
+        self.watches = list(watches)
+        self.lists = 0
+
+    def list(self, path, label_selector=None, field_selector=None):
+        self.lists += 1
+        return {"metadata": {"resourceVersion": "1"}, "items": self.pods}
+
+    def watch(self, path, resource_version, label_selector=None, field_selector=None, timeout_seconds=30):
+        yield from self.watches.pop(0) if self.watches else []
+
+
+class TestWaitForPodCount:
+    @pytest.mark.parametrize(
+        ("command", "expected"),
+        [
+            ("oc get pods -n dsp -l app=ds-pipeline --no-headers", ("dsp", "app=ds-pipeline", None)),
+            ("oc get pod --namespace=dsp --field-selector=status.phase=Running", ("dsp", None, "status.phase=Running")),
+            ("oc get pods -n dsp -o jsonpath={.items}", None),
+            ("oc get pods -l app=x", None),
+            ("oc get pods -n dsp | grep Running", None),
+        ],
+    )
+    def test_parse_get_pods_command(self, command, expected):
+        assert DataSciencePipelinesAPI.parse_get_pods_command(command) == expected
+
+    def wait(self, client, **kwargs):
+        with unittest.mock.patch.object(KubernetesRestClient, "from_kubeconfig", return_value=client):
+            return DataSciencePipelinesAPI().wait_for_pod_count("dsp", **kwargs)
+
+    def test_criterion_met_by_the_list(self):
+        client = FakePodsClient([pod("a"), pod("b")], [])
+        assert self.wait(client, pod_criteria=2) == 2
+
+    def test_watch_events_update_the_index(self):
+        client = FakePodsClient(
+            [pod("ds-pipeline-a", "Pending")],
+            [
+                [
+                    {"type": "MODIFIED", "object": pod("ds-pipeline-a", "Running", "2")},
+                    {"type": "ADDED", "object": pod("other-c", "Running", "3")},
+                    {"type": "BOOKMARK", "object": {"metadata": {"resourceVersion": "4"}}},
+                    {"type": "ADDED", "object": pod("ds-pipeline-b", "Running", "5")},
+                ]
+            ],
+        )
+        count = self.wait(client, pod_criteria=2, name_startswith="ds-pipeline", status_phase="Running", timeout=5)
+        assert count == 2
+        assert client.lists == 1
+
+    def test_expired_resource_version_lists_again(self):
+        client = FakePodsClient(
+            [pod("a")],
+            [[{"type": "ERROR", "object": {"code": 410}}], [{"type": "DELETED", "object": pod("a", "Running", "2")}]],
+        )
+        assert self.wait(client, pod_criteria=2, timeout=0.5) == 0
+        assert client.lists == 2
+
+    def test_no_client(self):
+        assert self.wait(None) is None
+
+
+class TestCountPodsWithOc:
+    def test_polling_sees_new_pods_with_the_command_cache_enabled(self, no_sleep):
+        library = DataSciencePipelinesAPI()
+        outputs = [b"", b"pod-a Running\n", b"pod-a Running\npod-b Running\n"]
+        process = unittest.mock.Mock(returncode=0)
+        process.communicate.side_effect = [(output, None) for output in outputs]
+        with (
+            unittest.mock.patch.object(dsp_api, "COMMAND_CACHE", CommandCache(enabled=True)),
+            unittest.mock.patch.object(library, "parse_get_pods_command", return_value=None),
+            unittest.mock.patch.object(dsp_api.subprocess, "Popen", return_value=process) as popen,
+        ):
+            assert library.count_pods("oc get pods -n dsp-test", 2) == 2
+        assert popen.call_count == 3
+
+
+class TestAdaptiveProbe:
+    def test_backoff_until_ready(self, no_sleep):
+        answers = iter([(False, 503), (False, 503), (False, 503), (True, 200)])
+        ready, value, attempts, _ = AdaptiveProbe(timeout=60, initial_delay=1, max_delay=3).run(lambda: next(answers))
+        assert (ready, value, attempts) == (True, 200, 4)
+        delays = [call.args[0] for call in no_sleep.call_args_list]
+        # 1, 2, then capped to 3 seconds, each with +-20% jitter
+        assert 0.8 <= delays[0] <= 1.2
+        assert 1.6 <= delays[1] <= 2.4
+        assert delays[2] <= 3
+
+    def test_ready_right_away(self, no_sleep):
+        assert AdaptiveProbe(timeout=60).run(lambda: (True, "route"))[:3] == (True, "route", 1)
+        no_sleep.assert_not_called()
+
+    def test_deadline(self, no_sleep):
+        no_sleep.side_effect = time.sleep
+        ready, value, attempts, elapsed = AdaptiveProbe(timeout=0.3, initial_delay=0.1).run(lambda: (False, 503))
+        assert (ready, value) == (False, 503)
+        assert attempts >= 2
+        # the last sleep is shortened to the deadline
+        assert 0.3 <= elapsed < 0.3 + 0.1
@@ -0,0 +1,167 @@
+"""Benchmarks of the pipelines libraries against the in-process DSP stub server.
+
+The measured values are printed and attached to the junit report with `record_property`,
+the assertions only guard the properties that make the wrappers fast (request counts, concurrency).
+"""
+
+import os
+import time
+import unittest.mock
+
+import pytest
+from DataSciencePipelinesAPI import DataSciencePipelinesAPI
+from DataSciencePipelinesKfp import DataSciencePipelinesKfp
+from kfp.client import Client
+
+from ods_ci.selftests.libs.dsp_stub_server import DSPStubServer
+
+LATENCY = 0.01
+
+
+@pytest.fixture
+def stub_server():
+    with DSPStubServer(latency=LATENCY) as server:
+        yield server
+
+
+@pytest.fixture
+def kfp_library(stub_server):
+    library = DataSciencePipelinesKfp()
+    library.client = Client(host=stub_server.url)
+    stub_server.reset_request_counts()
+    return library
+
+
+def record(record_property, name, value):
+    print(f"{name}: {value:.2f}")
+    record_property(name, round(value, 2))
+
+
+class TestDataSciencePipelinesKfpBenchmark:
+    def test_list_runs_calls_per_second(self, stub_server, kfp_library, record_property):
+        stub_server.add_runs(50)
+        calls = 50
+        start = time.perf_counter()
+        for _ in range(calls):
+            response = kfp_library.list_runs(page_size=10, experiment_id=stub_server.default_experiment_id)
+            assert len(response.runs) == 10
+        record(record_property, "list_runs_calls_per_second", calls / (time.perf_counter() - start))
+
+    def test_get_all_runs_pagination_throughput(self, stub_server, kfp_library, record_property):
+        stub_server.add_runs(500)
+        start = time.perf_counter()
+        all_runs = kfp_library.get_all_runs(
+            namespace=None, experiment_id=stub_server.default_experiment_id, page_size=50
+        )
+        elapsed = time.perf_counter() - start
+        assert len(all_runs) == 500
+        assert len({run.run_id for run in all_runs}) == 500
+        assert stub_server.request_counts["GET runs"] == 10
+        record(record_property, "get_all_runs_runs_per_second", len(all_runs) / elapsed)
+
+    def test_bulk_delete_runs_throughput(self, stub_server, kfp_library, record_property):
+        run_ids = stub_server.add_runs(200)
+        summary = kfp_library.bulk_delete_runs(run_ids, max_in_flight=8)
+        assert summary["deleted"] == 200
+        assert summary["failed"] == 0
+        assert stub_server.count("runs") == 0
+        # deleting one run at a time costs at least len(run_ids) * LATENCY
+        assert summary["elapsed"] < len(run_ids) * LATENCY
+        record(record_property, "bulk_delete_runs_per_second", summary["deleted"] / summary["elapsed"])
+
+    def test_bulk_delete_reports_failures(self, stub_server, kfp_library):
+        run_ids = [*stub_server.add_runs(5), "run-does-not-exist"]
+        summary = kfp_library.bulk_delete_runs(run_ids, max_in_flight=4)
+        assert summary["deleted"] == 5
+        assert summary["failed"] == 1
+        assert summary["errors"][0]["id"] == "run-does-not-exist"
+
+    def test_delete_all_runs_for_pipeline_lists_runs_once(self, stub_server, kfp_library):
+        pipeline_id, version_ids = stub_server.add_pipeline("benchmark", versions=5)
+        for version_id in version_ids:
+            stub_server.add_runs(10, pipeline_id=pipeline_id, pipeline_version_id=version_id)
+        other_runs = stub_server.add_runs(7)
+        stub_server.reset_request_counts()
+
+        kfp_library.delete_all_runs_for_pipeline(
+            namespace=None, pipeline_id=pipeline_id, experiment_id=stub_server.default_experiment_id
+        )
+        assert stub_server.count("runs") == len(other_runs)
+        assert stub_server.request_counts["GET runs"] == 1
+        assert stub_server.request_counts["DELETE runs/run-*"] == 50
+
+    def test_wait_for_runs_completion_uses_one_list_call(self, stub_server, kfp_library):
+        run_ids = stub_server.add_runs(20)
+        results = kfp_library.wait_for_runs_completion(run_ids, timeout=10, sleep_duration=1)
+        assert {result["state"] for result in results.values()} == {"SUCCEEDED"}
+        assert stub_server.request_counts == {"GET runs": 1}
+
+
+class TestDataSciencePipelinesAPIBenchmark:
+    def test_do_get_calls_per_second(self, stub_server, record_property):
+        api = DataSciencePipelinesAPI()
+        calls = 100
+        with unittest.mock.patch.object(DataSciencePipelinesAPI, "get_cert", return_value=False):
+            start = time.perf_counter()
+            for _ in range(calls):
+                _, status = api.do_get(f"{stub_server.url}/apis/v2beta1/runs")
+                assert status == 200
+            elapsed = time.perf_counter() - start
+        record(record_property, "do_get_calls_per_second", calls / elapsed)
+        record(record_property, "do_get_overhead_ms", (elapsed / calls - LATENCY) * 1000)
+
+
+class TestInMemoryPipelineSubmission:
+    SAMPLES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "tests", "Resources", "Files", "pipeline-samples")
+
+    def test_compile_applies_transforms_and_submits_from_memory(self, stub_server, kfp_library):
+        source_path = os.path.join(self.SAMPLES_DIR, "v2", "cache-disabled", "pip_index_url", "take_nap.py")
+        transforms = {
+            "pip_index_url": {"pip_index_url": "http://pypi.local/simple", "pip_trusted_host": "pypi.local"},
+            "image_mirror": {"mirrors": {"registry.redhat.io/": "mirror.local/"}},
+        }
+        documents = kfp_library.compile_pipeline(source_path, "take_nap_pipeline", transforms)
+        assert len(documents) == 2
+        containers = [executor["container"] for executor in documents[0]["deploymentSpec"]["executors"].values()]
+        assert {container["image"].split("/")[0] for container in containers} == {"mirror.local"}
+        assert all(
+            "--index-url http://pypi.local/simple --trusted-host pypi.local" in "".join(container["command"])
+            for container in containers
+        )
+
+        run_id = kfp_library.submit_pipeline_spec(documents, {"naptime_secs": 1}, "take_nap_pipeline")
+        assert stub_server.request_counts["POST runs"] == 1
+        submitted = stub_server.list_items("runs", {"page_size": 100}, {})["runs"]
+        run = next(run for run in submitted if run["run_id"] == run_id)
+        assert run["pipeline_spec"]["pipeline_spec"] == documents[0]
+        assert run["pipeline_spec"]["platform_spec"] == documents[1]
+        assert run["runtime_config"]["parameters"] == {"naptime_secs": 1}
+
+
+class TestPipelineModuleCache:
+    def test_import_souce_code_reuses_module_until_file_changes(self, tmp_path):
+        source = tmp_path / "sample-pipeline.py"
+        source.write_text("VALUE = 1\n")
+        library = DataSciencePipelinesKfp()
+        module = library.import_souce_code(str(source))
+        assert library.import_souce_code(str(source)) is module
+
+        source.write_text("VALUE = 2\n")
+        os.utime(source, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        reloaded = library.import_souce_code(str(source))
+        assert reloaded is not module
+        assert reloaded.VALUE == 2
+
+    def test_preload_pipeline_samples(self, record_property):
+        library = DataSciencePipelinesKfp()
+        current_path = os.path.join(os.path.dirname(__file__), "..", "..")
+        start = time.perf_counter()
+        loaded = library.preload_pipeline_samples(current_path)
+        record(record_property, "preload_pipeline_samples_seconds", time.perf_counter() - start)
+        assert loaded > 0
+        sample = os.path.join(
+            TestInMemoryPipelineSubmission.SAMPLES_DIR, "v2", "cache-disabled", "pip_index_url", "take_nap.py"
+        )
+        start = time.perf_counter()
+        library.import_souce_code(sample)
+        record(record_property, "cached_import_ms", (time.perf_counter() - start) * 1000)
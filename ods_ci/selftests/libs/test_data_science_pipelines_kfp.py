@@ -0,0 +1,253 @@
+import threading
+import time
+import types
+import unittest.mock
+
+import DataSciencePipelinesKfp as dsp_kfp
+import pytest
+from DataSciencePipelinesKfp import CompiledPipelineCache, DataSciencePipelinesKfp
+
+SAMPLES_DIR = "tests/Resources/Files/pipeline-samples/v2"
+
+
+class FakeApi:
+    def get_secret(self, project, name):
+        return {"data": {"accesskey": "a"}}
+
+
+@pytest.fixture
+def pipeline_cache(tmp_path):
+    cache = CompiledPipelineCache(str(tmp_path / "cache"))
+    with unittest.mock.patch.object(dsp_kfp, "COMPILED_PIPELINE_CACHE", cache):
+        yield cache
+
+
+class TestCompiledPipelineCache:
+    @pytest.fixture
+    def library(self):
+        library = DataSciencePipelinesKfp()
+        with (
+            unittest.mock.patch.object(library, "get_client", return_value=(None, FakeApi())),
+            unittest.mock.patch.object(library, "get_bucket_name", return_value="bucket"),
+            unittest.mock.patch.object(library, "compile_pipeline", return_value=[{"root": {}}]) as compile_pipeline,
+            unittest.mock.patch.object(library, "submit_pipeline_spec", return_value="run-id") as submit,
+        ):
+            library.compile_pipeline_mock = compile_pipeline
+            library.submit_mock = submit
+            yield library
+
+    def create_run(self, library, tmp_path, **kwargs):
+        return library.create_run_from_pipeline_func(
+            "user", "pwd", "project", "flip_coin.py", "flipcoin_pipeline", current_path=str(tmp_path), **kwargs
+        )
+
+    def test_hit_skips_the_compilation_and_source_changes_invalidate(self, library, pipeline_cache, tmp_path):
+        source = tmp_path / SAMPLES_DIR / "flip_coin.py"
+        source.parent.mkdir(parents=True)
+        source.write_text("# v1\n")
+        assert self.create_run(library, tmp_path) == "run-id"
+        assert self.create_run(library, tmp_path) == "run-id"
+        assert library.compile_pipeline_mock.call_count == 1
+        assert pipeline_cache.stats()["hits"] == 1
+        assert library.submit_mock.call_args.args[0] == [{"root": {}}]
+
+        source.write_text("# v2\n")
+        self.create_run(library, tmp_path)
+        assert library.compile_pipeline_mock.call_count == 2
+
+    def test_transforms_are_part_of_the_key(self, library, pipeline_cache, tmp_path):
+        source = tmp_path / SAMPLES_DIR / "flip_coin.py"
+        source.parent.mkdir(parents=True)
+        source.write_text("# v1\n")
+        self.create_run(library, tmp_path)
+        self.create_run(library, tmp_path, image_mirrors={"quay.io/": "mirror.local/"})
+        self.create_run(library, tmp_path, image_mirrors={"quay.io/": "mirror.local/"})
+        assert library.compile_pipeline_mock.call_count == 2
+        assert pipeline_cache.stats() == {"hits": 1, "misses": 2, "cache_dir": pipeline_cache.cache_dir}
+
+    def test_unreadable_entry_is_a_miss(self, pipeline_cache):
+        key = pipeline_cache.key(__file__, "fn")
+        pipeline_cache.put(key, [{"root": {}}])
+        assert pipeline_cache.get(key) == [{"root": {}}]
+        with open(f"{pipeline_cache.cache_dir}/{key}.json", "w") as file:
+            file.write("{truncated")
+        assert pipeline_cache.get(key) is None
+
+
+class FakeRunsClient:
+    """Creates runs after delay seconds, the ones with an index in failing raise"""
+
+    def __init__(self, delay=0.02, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def create_run_from_pipeline_package(self, pipeline_file, arguments, run_name, experiment_id):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        index = int(run_name.rsplit("-", 1)[1])
+        if index in self.failing:
+            raise RuntimeError("(500) Internal Server Error")
+        return types.SimpleNamespace(run_id=f"run-{index}")
+
+
+class TestSubmitRunsConcurrently:
+    def test_summary(self):
+        library = DataSciencePipelinesKfp()
+        library.client = FakeRunsClient(failing={3, 7})
+        summary = library.submit_runs_concurrently("pipeline.yaml", count=12, concurrency=4, experiment_id="exp")
+        assert summary["submitted"] == 10
+        assert summary["failed"] == 2
+        assert summary["errors"] == [
+            "scale-test-3: (500) Internal Server Error",
+            "scale-test-7: (500) Internal Server Error",
+        ]
+        assert sorted(summary["run_ids"]) == sorted(f"run-{i}" for i in range(12) if i not in (3, 7))
+        latency = summary["latency"]
+        assert 0.02 <= latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+        assert summary["throughput"] == pytest.approx(10 / summary["elapsed"])
+        assert library.client.max_in_flight == 4
+
+    def test_arrival_rate(self):
+        library = DataSciencePipelinesKfp()
+        library.client = FakeRunsClient(delay=0)
+        summary = library.submit_runs_concurrently(
+            "pipeline.yaml", count=6, concurrency=6, arrival_rate=20, experiment_id="e"
+        )
+        # 6 submissions started at 20 per second take at least 5 intervals
+        assert summary["elapsed"] >= 5 / 20
+        assert summary["latency"]["mean"] is not None
+
+    def test_all_failed(self):
+        library = DataSciencePipelinesKfp()
+        library.client = FakeRunsClient(delay=0, failing=range(3))
+        summary = library.submit_runs_concurrently("pipeline.yaml", count=3, experiment_id="exp")
+        assert summary["submitted"] == 0
+        assert summary["latency"] == {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+
+
+class FakeDspApi:
+    """Logs in with tokens valid for expires_in seconds, as fetch_token does"""
+
+    logins = 0
+
+    def __init__(self, sleep_time=1, expires_in=3600):
+        self.expires_in = expires_in
+        self.route = None
+        self.sa_token = None
+        self.token_expires_at = None
+
+    def get_route_host(self, project, route_name):
+        return f"{route_name}-{project}.apps"
+
+    def is_dsp_ready(self):
+        return True
+
+    def get_cert(self):
+        return None
+
+    def fetch_token(self, user, pwd):
+        FakeDspApi.logins += 1
+        self.sa_token = f"token-{FakeDspApi.logins}"
+        self.token_expires_at = time.time() + self.expires_in
+
+    def login_and_wait_dsp_route(self, user, pwd, project, route_name):
+        self.route = self.get_route_host(project, route_name)
+        self.fetch_token(user, pwd)
+
+
+class TestClientRegistry:
+    @pytest.fixture(autouse=True)
+    def fake_cluster(self):
+        FakeDspApi.logins = 0
+        with (
+            unittest.mock.patch.object(dsp_kfp, "KFP_CLIENT_REGISTRY", dsp_kfp.KfpClientRegistry(refresh_margin=300)),
+            unittest.mock.patch.object(dsp_kfp, "DataSciencePipelinesAPI", FakeDspApi),
+            unittest.mock.patch.object(dsp_kfp, "Client", types.SimpleNamespace),
+        ):
+            yield
+
+    def test_client_is_shared(self):
+        first, _ = DataSciencePipelinesKfp().get_client("user", "pwd", "project")
+        second, _ = DataSciencePipelinesKfp().get_client("user", "pwd", "project")
+        assert second is first
+        assert FakeDspApi.logins == 1
+
+    def test_token_refreshed_before_expiry(self):
+        library, other = DataSciencePipelinesKfp(), DataSciencePipelinesKfp()
+        client, api = library.get_client("user", "pwd", "project")
+        other.get_client("user", "pwd", "project")
+        assert client.existing_token == "token-1"
+        # expires_in not reached yet, but within the refresh margin
+        api.token_expires_at = time.time() + 200
+        client, _ = library.get_client("user", "pwd", "project")
+        assert client.existing_token == "token-2"
+        # the other instance picks up the refreshed client instead of refreshing again
+        client, _ = other.get_client("user", "pwd", "project")
+        assert client.existing_token == "token-2"
+        assert FakeDspApi.logins == 2
+
+    def test_force_reset_logs_in_again(self):
+        library, other = DataSciencePipelinesKfp(), DataSciencePipelinesKfp()
+        library.setup_client("user", "pwd", "project")
+        other.setup_client("user", "pwd", "project", force_reset=True)
+        assert FakeDspApi.logins == 2
+        assert other.client.existing_token == "token-2"
+        assert DataSciencePipelinesKfp().get_client("user", "pwd", "project")[0] is other.client
+
+
+DOCUMENTS = [{"pipelineInfo": {"name": "nap"}}, {"platforms": {"kubernetes": {}}}]
+
+
+class TestSubmitPipelineSpec:
+    @pytest.fixture
+    def library(self):
+        library = DataSciencePipelinesKfp()
+        library.client = unittest.mock.Mock(spec=["create_experiment", "create_run_from_pipeline_package"])
+        library.client.create_experiment.return_value.experiment_id = "experiment-id"
+        library.client.create_run_from_pipeline_package.return_value.run_id = "run-id"
+        return library
+
+    def test_default_experiment_from_environment(self, library, monkeypatch):
+        monkeypatch.setenv("KF_PIPELINES_DEFAULT_EXPERIMENT_NAME", "smoke")
+        library.submit_pipeline_spec(DOCUMENTS, {}, "nap")
+        library.client.create_experiment.assert_called_once_with(name="smoke")
+
+    def test_falls_back_to_pipeline_package_without_run_api(self, library):
+        submitted = []
+
+        def create_run(path, **kwargs):
+            with open(path) as package:
+                submitted.append(list(dsp_kfp.yaml.safe_load_all(package)))
+            return types.SimpleNamespace(run_id="run-id")
+
+        library.client.create_run_from_pipeline_package.side_effect = create_run
+        assert library.submit_pipeline_spec(DOCUMENTS, {"naptime_secs": 1}, "nap", "experiment-id") == "run-id"
+        assert submitted == [DOCUMENTS]
+        kwargs = library.client.create_run_from_pipeline_package.call_args.kwargs
+        assert kwargs["arguments"] == {"naptime_secs": 1}
+        assert kwargs["experiment_id"] == "experiment-id"
+        library.client.create_experiment.assert_not_called()
+
+    def test_run_named_after_the_pipeline(self, library):
+        library.submit_pipeline_spec(DOCUMENTS, {}, experiment_id="experiment-id")
+        assert library.client.create_run_from_pipeline_package.call_args.kwargs["run_name"].startswith("nap ")
+
+    def test_private_run_api_only_with_known_kfp_releases(self, library):
+        library.client._run_api = unittest.mock.Mock(spec=["run_service_create_run"])
+        library.client._run_api.run_service_create_run.return_value = types.SimpleNamespace(
+            run_id="private-run-id", display_name="nap"
+        )
+        with unittest.mock.patch.object(dsp_kfp.importlib.metadata, "version", return_value="2.13.0"):
+            assert library.submit_pipeline_spec(DOCUMENTS, {}, experiment_id="experiment-id") == "private-run-id"
+        body = library.client._run_api.run_service_create_run.call_args.kwargs["body"]
+        assert body.display_name.startswith("nap ")
+        with unittest.mock.patch.object(dsp_kfp.importlib.metadata, "version", return_value="2.14.0"):
+            assert library.submit_pipeline_spec(DOCUMENTS, {}, experiment_id="experiment-id") == "run-id"
+        assert library.client._run_api.run_service_create_run.call_count == 1
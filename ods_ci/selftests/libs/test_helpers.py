@@ -0,0 +1,274 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+import requests
+from Helpers import (
+    INFERENCE_HEADER_CONTENT_LENGTH,
+    Helpers,
+    build_kserve_v2_binary_request,
+    build_random_inference_payloads,
+    compare_inference_results,
+    kserve_v2_json_to_binary_request,
+    parse_inference_payload,
+    parse_kserve_v2_binary_response,
+    run_inference_load,
+)
+
+
+@pytest.fixture
+def helpers():
+    return Helpers()
+
+
+class TestInferenceComparison:
+    def test_equal_within_threshold_in_both_directions(self, helpers):
+        expected = json.dumps({"model_name": "mnist__isvc-1234abcd", "outputs": [{"data": [0.5, 1.0, 2.0]}]})
+        received = json.dumps({"model_name": "mnist__isvc-5678efgh", "outputs": [{"data": [0.500001, 0.999999, 2.0]}]})
+        assert helpers.inference_comparison(expected, received, threshold=0.00001) == (True, [])
+
+    def test_reports_numbers_above_threshold(self, helpers):
+        expected = "{'outputs': [{'data': [[1.0, 2.0], [3.0, 4.0]], 'name': 'out'}]}"
+        received = "{'outputs': [{'data': [[1.0, 2.5], [3.0, 3.0]], 'name': 'out'}]}"
+        result, failures = helpers.inference_comparison(expected, received, threshold=0.1)
+        assert result is False
+        assert failures == [[2.0, 2.5, "-0.5"], [4.0, 3.0, "1.0"]]
+
+    def test_report_stats(self):
+        report = compare_inference_results({"data": [1.0, 2.0, 3.0, 4.0]}, {"data": [1.0, 2.2, 3.0, 5.0]}, 0.5)
+        assert report["compared"] == 4
+        assert report["mismatches"] == 1
+        assert report["max_abs_diff"] == pytest.approx(1.0)
+        assert report["mean_abs_diff"] == pytest.approx(0.3)
+
+    def test_strings_shapes_and_model_names(self):
+        report = compare_inference_results(
+            {"model_name": "mnist__isvc-1", "labels": ["cat", "dog"], "data": [1, 2, 3]},
+            {"model_name": "fashion__isvc-1", "labels": ["cat", "cow"], "data": [1, 2]},
+        )
+        assert report["failures"] == [
+            ["mnist__isvc-1", "fashion__isvc-1"],
+            ["dog", "cow"],
+            ["shape (3,)", "shape (2,)"],
+        ]
+
+    def test_numeric_strings_are_not_compared_as_numbers(self):
+        assert compare_inference_results(["1.5"], ["1.50"])["mismatches"] == 1
+
+    def test_exception_is_reported(self, helpers):
+        result, failures = helpers.inference_comparison("{'a': 1}", "not a payload")
+        assert result is False
+        assert failures[0] == ["exception thrown during comparison"]
+
+    def test_large_tensor_comparison(self, helpers, record_property):
+        rng = random.Random(42)
+        data = [[rng.random() for _ in range(1000)] for _ in range(1000)]
+        expected = json.dumps({"outputs": [{"data": data}]})
+        received = json.dumps({"outputs": [{"data": [[value + 1e-7 for value in row] for row in data]}]})
+        start = time.perf_counter()
+        report = compare_inference_results(parse_inference_payload(expected), parse_inference_payload(received))
+        elapsed = time.perf_counter() - start
+        assert report["compared"] == 1_000_000
+        assert report["mismatches"] == 0
+        print(f"inference_comparison_1m_values_seconds: {elapsed:.2f}")
+        record_property("inference_comparison_1m_values_seconds", round(elapsed, 2))
+
+
+class _InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):  # noqa: N802
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        request = json.loads(body)
+        status = 200 if request["inputs"][0]["shape"] == [1, 3, 16, 16] else 400
+        payload = b'{"outputs": []}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def inference_endpoint():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _InferenceHandler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield f"http://{host}:{port}/v2/models/test/infer"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+SHAPE = {"B": 1, "C": 3, "H": 16, "W": 16}
+
+
+class TestInferenceLoad:
+    def test_payloads_are_generated_once(self):
+        payloads = build_random_inference_payloads(shape=SHAPE, count=2)
+        assert len(payloads) == 2
+        request = json.loads(payloads[0])
+        assert request["inputs"][0]["shape"] == [1, 3, 16, 16]
+        assert len(request["inputs"][0]["data"]) == 3 * 16 * 16
+        assert all(0 <= value < 255 for value in request["inputs"][0]["data"])
+
+    def test_load_test_by_request_count(self, helpers, inference_endpoint, record_property):
+        result = helpers.run_inference_load_test(inference_endpoint, shape=SHAPE, concurrency=4, no_requests=200)
+        assert result["requests"] == 200
+        assert result["status_codes"] == {200: 200}
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"] <= result["latency_ms"]["max"]
+        print(f"inference_load_requests_per_second: {result['throughput']:.2f}")
+        record_property("inference_load_requests_per_second", round(result["throughput"], 2))
+
+    def test_load_test_by_duration_and_rate(self, inference_endpoint):
+        payloads = build_random_inference_payloads(shape=SHAPE)
+        result = run_inference_load(inference_endpoint, payloads, concurrency=4, duration=1, rps=20)
+        assert 18 <= result["requests"] <= 21
+        assert result["duration"] >= 0.9
+
+    def test_status_codes_and_errors_are_counted(self, inference_endpoint):
+        payloads = build_random_inference_payloads(shape={"B": 1, "C": 1, "H": 2, "W": 2})
+        result = run_inference_load(inference_endpoint, payloads, concurrency=2, requests_count=5)
+        assert result["status_codes"] == {400: 5}
+        result = run_inference_load("http://127.0.0.1:1/infer", payloads, concurrency=2, requests_count=3)
+        assert result["status_codes"] == {"ConnectionError": 3}
+
+    def test_send_random_inference_request(self, helpers, inference_endpoint):
+        with unittest.mock.patch("Helpers.run_inference_load", wraps=run_inference_load) as load:
+            status, text = helpers.send_random_inference_request(inference_endpoint, shape=SHAPE, no_requests=3)
+        assert status == 200
+        assert json.loads(text) == {"outputs": []}
+        payloads = load.call_args.args[1]
+        assert len(set(payloads)) == 3
+
+    def test_send_random_inference_request_raises_connection_errors(self, helpers):
+        with pytest.raises(requests.ConnectionError):
+            helpers.send_random_inference_request("http://127.0.0.1:1/infer", shape=SHAPE, no_requests=2)
+
+
+class _BinaryEchoHandler(_InferenceHandler):
+    """Answers with the binary inputs as binary outputs named output<N>"""
+
+    def do_POST(self):  # noqa: N802
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        header_length = int(self.headers[INFERENCE_HEADER_CONTENT_LENGTH])
+        request = json.loads(body[:header_length])
+        outputs = [
+            {
+                "name": f"output{i}",
+                "shape": tensor["shape"],
+                "datatype": tensor["datatype"],
+                "parameters": {"binary_data_size": tensor["parameters"]["binary_data_size"]},
+            }
+            for i, tensor in enumerate(request["inputs"])
+        ]
+        json_header = json.dumps({"model_name": request["model_name"], "outputs": outputs}).encode()
+        payload = json_header + body[header_length:]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header(INFERENCE_HEADER_CONTENT_LENGTH, str(len(json_header)))
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def binary_echo_endpoint():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _BinaryEchoHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield f"http://{host}:{port}/v2/models/test/infer"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestKServeV2BinaryTensors:
+    def test_request_layout(self):
+        image = np.arange(12, dtype=np.float32).reshape(1, 3, 4)
+        body, headers = build_kserve_v2_binary_request(
+            [{"name": "image", "datatype": "FP32", "data": image}], outputs=["scores"], model_name="test"
+        )
+        header_length = int(headers[INFERENCE_HEADER_CONTENT_LENGTH])
+        header = json.loads(body[:header_length])
+        assert header["inputs"] == [
+            {"name": "image", "shape": [1, 3, 4], "datatype": "FP32", "parameters": {"binary_data_size": 48}}
+        ]
+        assert header["outputs"] == [{"name": "scores", "parameters": {"binary_data": True}}]
+        assert body[header_length:] == image.astype("<f4").tobytes()
+
+    def test_parse_binary_and_json_outputs(self):
+        json_header = json.dumps(
+            {
+                "outputs": [
+                    {"name": "a", "shape": [2, 2], "datatype": "INT64", "parameters": {"binary_data_size": 32}},
+                    {"name": "b", "shape": [2], "datatype": "BYTES", "parameters": {"binary_data_size": 11}},
+                    {"name": "c", "shape": [2], "datatype": "FP32", "data": [0.5, 1.5]},
+                ]
+            }
+        ).encode()
+        body = json_header + np.array([[1, 2], [3, 4]], dtype="<i8").tobytes() + b"\x03\x00\x00\x00cat\x00\x00\x00\x00"
+        _, tensors = parse_kserve_v2_binary_response(body, len(json_header))
+        assert tensors["a"].tolist() == [[1, 2], [3, 4]]
+        assert tensors["b"].tolist() == [b"cat", b""]
+        assert tensors["c"].tolist() == [0.5, 1.5]
+
+    def test_round_trip_of_mnist_input(self, helpers, binary_echo_endpoint, record_property):
+        input_file = os.path.join(os.path.dirname(__file__), "..", "..", "tests", "Resources", "Files")
+        input_file = os.path.join(input_file, "modelmesh-mnist-input.json")
+        with open(input_file) as file:
+            json_request = file.read()
+        body, _ = kserve_v2_json_to_binary_request(json_request)
+        print(f"json request: {len(json_request)} bytes, binary request: {len(body)} bytes")
+        record_property("mnist_binary_request_size_ratio", round(len(body) / len(json_request), 3))
+
+        status, header, tensors = helpers.send_kserve_v2_binary_inference_request(binary_echo_endpoint, input_file)
+        assert status == 200
+        assert header["model_name"] == "example-onnx-mnist"
+        assert tensors["output0"].shape == (1, 1, 28, 28)
+        expected_input = json.loads(json_request)["inputs"][0]
+        expected = {"outputs": [{**expected_input, "name": "output0"}]}
+        assert helpers.kserve_v2_binary_inference_comparison(expected, tensors) == (True, [])
+
+        mismatching = {"outputs": [{**expected_input, "name": "output0", "data": [1.0] * 784}]}
+        result, failures = helpers.kserve_v2_binary_inference_comparison(mismatching, tensors, threshold=0.1)
+        assert result is False
+        assert len(failures) > 0
+
+    def test_binary_comparison_with_invalid_expected_response(self, helpers):
+        tensors = {"output0": np.zeros(4, dtype=np.float32)}
+        result, failures = helpers.kserve_v2_binary_inference_comparison('{"no_outputs": []}', tensors)
+        assert result is False
+        assert failures[0] == ["invalid expected response"]
+
+
+class TestVllmMetrics:
+    def test_returns_the_exposed_lines(self, helpers):
+        text = (
+            "# TYPE vllm:e2e_request_latency_seconds histogram\n"
+            'vllm:e2e_request_latency_seconds_bucket{le="0.5",model_name="granite"} 2.0\n'
+            'vllm:e2e_request_latency_seconds_bucket{le="+Inf",model_name="granite"} 3.0\n'
+            "# TYPE vllm:num_requests_running gauge\n"
+            'vllm:num_requests_running{model_name="granite"} 1\n'
+            "process_cpu_seconds_total 12.5\n"
+        )
+        with unittest.mock.patch("Helpers.requests.get", return_value=unittest.mock.Mock(text=text)):
+            metrics = helpers.get_vllm_metrics_and_values("https://vllm/metrics")
+        assert metrics == [
+            ['vllm:e2e_request_latency_seconds_bucket{le="0.5",model_name="granite"}', "2.0"],
+            ['vllm:num_requests_running{model_name="granite"}', "1"],
+        ]
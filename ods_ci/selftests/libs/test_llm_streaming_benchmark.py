@@ -0,0 +1,46 @@
+import pytest
+from LLMStreamingBenchmark import LLMStreamingBenchmark, iter_sse_events
+
+from ods_ci.selftests.libs.openai_stub_server import OpenAIStubServer
+
+TTFT = 0.05
+ITL = 0.01
+
+
+@pytest.fixture
+def stub_server():
+    with OpenAIStubServer(tokens=10, ttft=TTFT, itl=ITL) as server:
+        yield server
+
+
+class TestServerSentEvents:
+    def test_events_split_across_chunks(self):
+        stream = b'data: {"text": "a"}\n\n: keep-alive comment\n\ndata: {"text":\ndata: "b"}\r\n\r\ndata: [DONE]\n\n'
+        chunks = [stream[i : i + 3] for i in range(0, len(stream), 3)]
+        assert list(iter_sse_events(chunks)) == ['{"text": "a"}', '{"text":\n"b"}', "[DONE]"]
+
+
+class TestLLMStreamingBenchmark:
+    @pytest.mark.parametrize("chat", [False, True])
+    def test_benchmark_measures_streaming_latencies(self, stub_server, chat, record_property):
+        summary = LLMStreamingBenchmark().run_openai_streaming_benchmark(
+            stub_server.url, "granite", ["hello", "world"], concurrency=4, no_requests=8, max_tokens=6, chat=chat
+        )
+        assert stub_server.requests == 8
+        assert summary["requests"] == 8
+        assert summary["failed_requests"] == 0
+        assert summary["output_tokens"] == 8 * 6
+        assert TTFT <= summary["ttft_p50"] < TTFT + 0.04
+        assert ITL <= summary["inter_token_latency_p50"] < ITL + 0.02
+        assert summary["e2e_latency_p95"] >= TTFT + 5 * ITL
+        # 4 concurrent requests of about TTFT + 5 * ITL seconds each
+        assert summary["generation_tokens_per_second"] > 4 * 6 / (TTFT + 5 * ITL) / 2
+        print(f"streaming_benchmark_tokens_per_second: {summary['generation_tokens_per_second']:.2f}")
+        record_property("streaming_benchmark_tokens_per_second", round(summary["generation_tokens_per_second"], 2))
+
+    def test_failed_requests_are_counted(self, stub_server):
+        summary = LLMStreamingBenchmark().run_openai_streaming_benchmark(
+            f"{stub_server.url}/wrong", "granite", "hello", concurrency=2, no_requests=3
+        )
+        assert summary["failed_requests"] == 3
+        assert summary["ttft_p95"] is None
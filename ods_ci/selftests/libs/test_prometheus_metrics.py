@@ -0,0 +1,123 @@
+import math
+import string
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PrometheusMetrics import MetricsSampler, PrometheusMetrics, histogram_quantile, parse_prometheus_text
+
+EXPOSITION = string.Template("""\
+# HELP vllm:generation_tokens_total Number of generation tokens processed.
+# TYPE vllm:generation_tokens_total counter
+vllm:generation_tokens_total{model_name="granite"} $tokens
+# HELP vllm:time_to_first_token_seconds Histogram of time to first token in seconds.
+# TYPE vllm:time_to_first_token_seconds histogram
+vllm:time_to_first_token_seconds_bucket{le="0.1",model_name="granite"} $fast
+vllm:time_to_first_token_seconds_bucket{le="0.5",model_name="granite"} $requests
+vllm:time_to_first_token_seconds_bucket{le="+Inf",model_name="granite"} $requests
+vllm:time_to_first_token_seconds_count{model_name="granite"} $requests
+vllm:time_to_first_token_seconds_sum{model_name="granite"} $ttft_sum
+# HELP vllm:num_requests_running Number of requests currently running.
+# TYPE vllm:num_requests_running gauge
+vllm:num_requests_running{model_name="granite"} $running
+# HELP rpc_duration_seconds A summary of the RPC duration in seconds.
+# TYPE rpc_duration_seconds summary
+rpc_duration_seconds{quantile="0.5",path="/v1/\\"completions\\""} 0.05
+rpc_duration_seconds_sum{path="/v1/\\"completions\\""} 1.5
+rpc_duration_seconds_count{path="/v1/\\"completions\\""} 30
+untyped_metric 7 1700000000000
+""")
+
+
+def exposition(tokens=0, fast=0, requests=0, ttft_sum=0.0, running=0):
+    return EXPOSITION.substitute(tokens=tokens, fast=fast, requests=requests, ttft_sum=ttft_sum, running=running)
+
+
+class TestExpositionParser:
+    def test_families_histograms_and_summaries(self):
+        families = {family.name: family for family in parse_prometheus_text(exposition(tokens=5, requests=2))}
+        assert list(families) == [
+            "vllm:generation_tokens_total",
+            "vllm:time_to_first_token_seconds",
+            "vllm:num_requests_running",
+            "rpc_duration_seconds",
+            "untyped_metric",
+        ]
+        histogram = families["vllm:time_to_first_token_seconds"]
+        assert histogram.type == "histogram"
+        assert histogram.help == "Histogram of time to first token in seconds."
+        assert [sample.labels.get("le") for sample in histogram.samples] == ["0.1", "0.5", "+Inf", None, None]
+        summary = families["rpc_duration_seconds"]
+        assert summary.samples[0].labels == {"quantile": "0.5", "path": '/v1/"completions"'}
+        assert len(summary.samples) == 3
+        assert families["untyped_metric"].samples[0].timestamp == 1700000000
+
+    def test_unparsable_lines_are_skipped(self, capsys):
+        text = 'vllm:num_requests_running{model_name="granite"} 1\nvllm:broken{model_name="granite" 2\nvllm:no_value\n'
+        samples = [sample for family in parse_prometheus_text(text) for sample in family.samples]
+        assert [sample.name for sample in samples] == ["vllm:num_requests_running"]
+        assert "vllm:no_value" in capsys.readouterr().out
+
+    def test_histogram_quantile(self):
+        assert histogram_quantile(0.95, {0.1: 0, 0.5: 0, math.inf: 0}) is None
+        assert histogram_quantile(0.5, {0.1: 50, 0.5: 100, math.inf: 100}) == pytest.approx(0.1)
+        assert histogram_quantile(0.75, {0.1: 50, 0.5: 100, math.inf: 100}) == pytest.approx(0.3)
+        assert histogram_quantile(0.99, {0.1: 50, 0.5: 90, math.inf: 100}) == 0.5
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    text = exposition()
+
+    def do_GET(self):  # noqa: N802
+        payload = type(self).text.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def metrics_endpoint():
+    handler = type("MetricsHandler", (_MetricsHandler,), {"text": exposition()})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield handler, f"http://{host}:{port}/metrics"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestMetricsSampler:
+    def test_rates_and_quantiles_over_the_window(self, metrics_endpoint):
+        handler, url = metrics_endpoint
+        handler.text = exposition(tokens=1000, fast=10, requests=10, ttft_sum=0.5, running=1)
+        sampler = MetricsSampler(url, interval=0.05)
+        sampler.scrape()
+        handler.text = exposition(tokens=3000, fast=20, requests=110, ttft_sum=30.5, running=4)
+        sampler.scrape()
+        seconds = sampler.snapshots[-1][0] - sampler.snapshots[0][0]
+        assert sampler.rate("vllm:generation_tokens_total") == pytest.approx(2000 / seconds)
+        assert sampler.rate("vllm:generation_tokens_total", {"model_name": "other"}) is None
+        # 10 of the 100 requests of the window were below 0.1s, the 90 others between 0.1s and 0.5s
+        assert sampler.quantile("vllm:time_to_first_token_seconds", 0.5) == pytest.approx(0.1 + 0.4 * 40 / 90)
+        assert sampler.mean("vllm:time_to_first_token_seconds") == pytest.approx(0.3)
+        assert sampler.gauge("vllm:num_requests_running") == {"min": 1, "max": 4, "mean": 2.5, "last": 4}
+
+    def test_sampler_keywords_and_slos(self, metrics_endpoint):
+        handler, url = metrics_endpoint
+        library = PrometheusMetrics()
+        library.start_metrics_sampler(url, interval=0.05, name="test")
+        handler.text = exposition(tokens=500, fast=5, requests=5, ttft_sum=0.2, running=2)
+        summary = library.stop_metrics_sampler("test", labels={"model_name": "granite"})
+        assert summary["scrapes"] >= 2
+        assert summary["scrape_errors"] == 0
+        assert summary["generation_tokens_per_second"] > 0
+        assert summary["ttft_p95"] == pytest.approx(0.095)
+        assert summary["running_requests_max"] == 2
+        library.performance_slos_should_be_met(summary, ttft_p95=0.1, min_generation_tokens_per_second=1)
+        with pytest.raises(AssertionError, match="ttft_p95 = 0.095 > 0.05, queue_time_p95 is not available"):
+            library.performance_slos_should_be_met(summary, ttft_p95=0.05, queue_time_p95=1)
@@ -0,0 +1,136 @@
+import json
+import time
+import unittest.mock
+
+import pytest
+import ResourceInventory as inventory
+from KubernetesRestClient import KubernetesRestError
+from ResourceInventory import ResourceInventory, build_index, diff_indexes, take_snapshot
+
+
+def deployment(name, namespace="redhat-ods-applications", replicas=1):
+    return {"metadata": {"name": name, "namespace": namespace}, "spec": {"replicas": replicas}}
+
+
+class FakeClient:
+    """Serves the LIST calls from a dict path -> items and records them"""
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = []
+
+    def list(self, path):
+        self.calls.append(path)
+        return {"items": self.items.get(path, [])}
+
+
+class TestResourceInventory:
+    def test_generated_suffixes_are_normalized(self):
+        index = build_index(
+            [
+                ("Pod", deployment("rhods-dashboard-7d9f8c6b5-x2k9p")),
+                ("Pod", deployment("rhods-dashboard-7d9f8c6b5-h7d2q")),
+                ("Deployment", deployment("rhods-dashboard")),
+            ]
+        )
+        assert sorted(index) == [
+            "Deployment/redhat-ods-applications/rhods-dashboard",
+            "Pod/redhat-ods-applications/rhods-dashboard",
+        ]
+        assert index["Pod/redhat-ods-applications/rhods-dashboard"][0] == 2
+
+    def test_diff(self):
+        before = build_index(
+            [("Deployment", deployment("a")), ("Deployment", deployment("b")), ("Pod", deployment("c"))]
+        )
+        after = build_index(
+            [("Deployment", deployment("a")), ("Deployment", deployment("b", replicas=2)), ("Pod", deployment("d"))]
+        )
+        assert diff_indexes(before, after) == {
+            "added": ["Pod/redhat-ods-applications/d"],
+            "removed": ["Pod/redhat-ods-applications/c"],
+            "changed": ["Deployment/redhat-ods-applications/b"],
+        }
+
+    def test_snapshot_lists_each_kind_once(self):
+        client = FakeClient({"/apis/apps/v1/deployments": [deployment("a")], "/api/v1/pods": [deployment("a-x2k9p")]})
+        kinds = {"Deployment": ("/apis/apps/v1", "deployments", True), "Pod": ("/api/v1", "pods", True)}
+        snapshot = take_snapshot(client, kinds)
+        assert sorted(client.calls) == ["/api/v1/pods", "/apis/apps/v1/deployments"]
+        assert snapshot["resources"] == 2
+        assert snapshot["errors"] == {}
+
+        client = FakeClient({})
+        kinds["CRD"] = ("/apis/apiextensions.k8s.io/v1", "customresourcedefinitions", False)
+        take_snapshot(client, kinds, namespaces=["ns1", "ns2"])
+        assert sorted(client.calls) == [
+            "/api/v1/namespaces/ns1/pods",
+            "/api/v1/namespaces/ns2/pods",
+            "/apis/apiextensions.k8s.io/v1/customresourcedefinitions",
+            "/apis/apps/v1/namespaces/ns1/deployments",
+            "/apis/apps/v1/namespaces/ns2/deployments",
+        ]
+
+    def test_kinds_without_spec_are_hashed_by_their_content(self):
+        def config_map(data):
+            return {"metadata": {"name": "odh-config", "namespace": "redhat-ods-applications"}, "data": data}
+
+        def role_binding(role):
+            binding = deployment("odh-binding")
+            del binding["spec"]
+            return {**binding, "roleRef": {"kind": "Role", "name": role}, "subjects": []}
+
+        before = build_index([("ConfigMap", config_map({"a": "1"})), ("RoleBinding", role_binding("view"))])
+        after = build_index([("ConfigMap", config_map({"a": "2"})), ("RoleBinding", role_binding("edit"))])
+        assert diff_indexes(before, after)["changed"] == [
+            "ConfigMap/redhat-ods-applications/odh-config",
+            "RoleBinding/redhat-ods-applications/odh-binding",
+        ]
+        # explicit fields apply to all the kinds
+        before = build_index([("ConfigMap", config_map({"a": "1"}))], ("spec",))
+        after = build_index([("ConfigMap", config_map({"a": "2"}))], ("spec",))
+        assert diff_indexes(before, after)["changed"] == []
+
+    def test_snapshots_comparison_keywords(self, tmp_path):
+        library = ResourceInventory()
+        before = {"index": build_index([("Deployment", deployment("a")), ("Pod", deployment("a-x2k9p"))])}
+        after = {"index": build_index([("Deployment", deployment("a")), ("Pod", deployment("a-b7d2q"))])}
+        before_file = tmp_path / "before.json"
+        before_file.write_text(json.dumps(before))
+        library.resource_inventory_snapshots_should_be_equal(str(before_file), after)
+
+        after["index"]["Route/redhat-ods-applications/new-route"] = [1, ""]
+        with pytest.raises(AssertionError, match="new-route"):
+            library.resource_inventory_snapshots_should_be_equal(before, after)
+        library.resource_inventory_snapshots_should_be_equal(before, after, ignore=["^Route/"])
+
+    def test_snapshot_keyword_accepts_single_kind_and_field(self):
+        client = FakeClient({"/apis/apps/v1/deployments": [deployment("a")]})
+        with unittest.mock.patch.object(inventory.KubernetesRestClient, "from_kubeconfig", return_value=client):
+            snapshot = ResourceInventory().take_resource_inventory_snapshot(kinds="Deployment", fields="metadata")
+        assert client.calls == ["/apis/apps/v1/deployments"]
+        assert snapshot["kinds"] == ["Deployment"]
+        assert snapshot["fields"] == ["metadata"]
+
+    def test_oc_fallbacks_are_reported(self):
+        client = unittest.mock.Mock()
+        client.list.side_effect = KubernetesRestError("connection refused")
+        kinds = {"Deployment": ("/apis/apps/v1", "deployments", True)}
+        with unittest.mock.patch.object(inventory, "_oc_list", return_value=[deployment("a")]):
+            snapshot = take_snapshot(client, kinds, namespaces=["ns1"])
+        assert snapshot["resources"] == 1
+        assert snapshot["errors"] == {}
+        assert snapshot["fallbacks"] == {"Deployment/ns1": "connection refused"}
+
+    def test_diff_of_large_inventories(self, record_property):
+        resources = [("Pod", deployment(f"workload-{i}-x2k9p", namespace=f"ns-{i % 50}")) for i in range(20000)]
+        start = time.perf_counter()
+        before = build_index(resources)
+        after = build_index(resources[:-100] + [("Pod", deployment("extra-workload"))])
+        diff = diff_indexes(before, after)
+        elapsed = time.perf_counter() - start
+        assert len(diff["removed"]) == 100
+        assert diff["added"] == ["Pod/redhat-ods-applications/extra-workload"]
+        print(f"inventory_index_and_diff_40k_resources_seconds: {elapsed:.2f}")
+        record_property("inventory_index_and_diff_40k_resources_seconds", round(elapsed, 2))
+        assert elapsed < 5
@@ -0,0 +1,17 @@
+from Statistics import percentile, percentiles
+
+
+class TestPercentiles:
+    def test_nearest_rank(self):
+        values = [float(value) for value in range(100, 0, -1)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile(values, 100) == 100.0
+        assert percentile([7.0], 1) == 7.0
+
+    def test_empty(self):
+        assert percentile([], 50) is None
+        assert percentiles([], (50, 99)) == {"p50": None, "p99": None}
+
+    def test_percentiles_keys(self):
+        assert percentiles(range(1, 11)) == {"p50": 5, "p90": 9, "p95": 10, "p99": 10}
@@ -0,0 +1,117 @@
+import json
+import unittest
+import unittest.mock
+
+from ods_ci.utils.scripts.ocm import ocm
+
+DESCRIBE = {"id": "2ans0g24", "name": "mods-sa-mastr4", "state": "ready", "version": {"raw_id": "4.15.3"}}
+ADDONS = {"items": [{"id": "managed-odh", "state": "ready"}]}
+
+
+class FakeOcm:
+    """Answers the ocm commands used by OpenshiftClusterManager and records them"""
+
+    def __init__(self):
+        self.commands = []
+
+    def __call__(self, cmd, print_stdout=True, return_rc=False, timeout=50, cacheable=False):
+        self.commands.append(cmd)
+        if cmd.startswith("ocm list versions"):
+            return "4.14.9\n4.15.1\n4.15.3\n4.16.0\n"
+        if cmd.startswith("ocm list clusters"):
+            return "2ans0g24\n"
+        if cmd.startswith("ocm describe cluster"):
+            return json.dumps(DESCRIBE)
+        if cmd.startswith("ocm get /api/clusters_mgmt/v1/clusters/2ans0g24/addons"):
+            return json.dumps(ADDONS)
+        return "{}"
+
+    def count(self, prefix):
+        return sum(cmd.startswith(prefix) for cmd in self.commands)
+
+
+class TestClusterMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.fake_ocm = FakeOcm()
+        for name, value in (("CLUSTER_METADATA_CACHE", ocm.ClusterMetadataCache()), ("execute_command", self.fake_ocm)):
+            patcher = unittest.mock.patch.object(ocm, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def client(self, cluster_name="mods-sa-mastr4"):
+        client = ocm.OpenshiftClusterManager()
+        client.cluster_name = cluster_name
+        return client
+
+    def test_instances_share_cluster_id_and_description(self):
+        for _ in range(3):
+            client = self.client()
+            self.assertEqual(client.get_osd_cluster_state(), "ready")
+            self.assertEqual(client.get_osd_cluster_version(), "4.15.3")
+            self.assertEqual(client.ocm_describe(jq_filter="--json | jq -r '.missing'"), "null\n")
+        self.assertEqual(self.fake_ocm.count("ocm list clusters"), 1)
+        self.assertEqual(self.fake_ocm.count("ocm describe cluster"), 1)
+
+    def test_description_expires(self):
+        ocm.CLUSTER_METADATA_CACHE.ttl = 0
+        self.client().get_cluster_field("name")
+        self.client().get_cluster_field("name")
+        self.assertEqual(self.fake_ocm.count("ocm describe cluster"), 2)
+        self.assertEqual(self.fake_ocm.count("ocm list clusters"), 2)
+
+    def test_field_filters_print_like_jq(self):
+        client = self.client()
+        self.assertEqual(client.ocm_describe(jq_filter="--json | jq -r '.state'"), "ready\n")
+        self.assertEqual(client.ocm_describe(jq_filter="--json | jq -r '.version'"), '{\n  "raw_id": "4.15.3"\n}\n')
+        with unittest.mock.patch.dict(DESCRIBE, {"hibernating": False}):
+            ocm.CLUSTER_METADATA_CACHE.invalidate()
+            self.assertEqual(client.ocm_describe(jq_filter="--json | jq -r '.hibernating'"), "false\n")
+
+    def test_create_forgets_the_cluster_id(self):
+        self.client().get_osd_cluster_id()
+        client = self.client()
+        with (
+            unittest.mock.patch.object(client, "_render_template"),
+            unittest.mock.patch.object(client, "hide_values_in_file"),
+        ):
+            client.cloud_provider = "aws"
+            client.openshift_version = "4.15.3"
+            client.osd_cluster_create()
+        self.client().get_osd_cluster_id()
+        self.assertEqual(self.fake_ocm.count("ocm list clusters"), 2)
+
+    def test_create_picks_the_latest_version_of_the_minor(self):
+        client = self.client()
+        with (
+            unittest.mock.patch.object(client, "_render_template"),
+            unittest.mock.patch.object(client, "hide_values_in_file"),
+        ):
+            client.cloud_provider = "aws"
+            client.openshift_version = "4.15-latest"
+            client.osd_cluster_create()
+        self.assertEqual(client.openshift_version, "4.15.3")
+        self.assertIn("ocm list versions", self.fake_ocm.commands)
+
+    def test_addon_state_is_invalidated_by_mutations(self):
+        client = self.client()
+        self.assertTrue(client.is_addon_installed("managed-odh"))
+        self.assertEqual(client.get_addon_state("managed-api-service"), "not installed")
+        self.assertEqual(self.fake_ocm.count("ocm get"), 1)
+
+        client.uninstall_addon("managed-odh", exit_on_failure=False)
+        ADDONS["items"] = []
+        self.addCleanup(ADDONS.__setitem__, "items", [{"id": "managed-odh", "state": "ready"}])
+        self.assertFalse(self.client().is_addon_installed("managed-odh"))
+        self.assertEqual(self.fake_ocm.count("ocm get"), 2)
+
+    def test_hibernate_invalidates_description(self):
+        client = self.client()
+        client.get_osd_cluster_state()
+        with unittest.mock.patch.object(client, "wait_for_osd_cluster_to_get_hibernated"):
+            client.hibernate_cluster()
+        client.get_osd_cluster_state()
+        self.assertEqual(self.fake_ocm.count("ocm describe cluster"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import unittest.mock
+
+from ods_ci.utils.scripts import util
+from ods_ci.utils.scripts.command_cache import CommandCache, parse_command
+from ods_ci.utils.scripts.testconfig import generateTestConfigFile
+
+
+class TestParseCommand(unittest.TestCase):
+    def test_kinds_and_namespaces(self):
+        parsed = parse_command("oc get deployment.apps/dashboard pod/dashboard-x2k9p --namespace=odh")
+        assert (parsed.verb, parsed.kinds, parsed.namespace) == ("get", ["deployments", "pods"], "odh")
+        assert parse_command("kubectl get sc -A").namespace == "*"
+        assert parse_command("oc whoami --show-server").verb == "whoami"
+        assert parse_command("oc apply -f manifest.yaml -n odh").kinds is None
+        assert parse_command("oc delete ns odh").kinds is None
+
+    def test_other_commands(self):
+        assert parse_command("echo oc get pods") is None
+        assert parse_command("oc get secret x -o json | jq .data") is None
+        assert parse_command(["oc", "get", "pods"]) is None
+
+
+class TestCommandCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = CommandCache(enabled=True, clock=lambda: self.now)
+        self.runs = []
+
+    def run_command(self, cmd, rc=0):
+        def fetch():
+            self.runs.append(cmd)
+            return rc, f"output {len(self.runs)}"
+
+        return self.cache.call(cmd, fetch)
+
+    def test_read_only_commands_are_cached_for_their_ttl(self):
+        assert self.run_command("oc get storageclass") == "output 1"
+        assert self.run_command("oc get storageclass") == "output 1"
+        self.now += 31
+        assert self.run_command("oc get storageclass") == "output 2"
+        self.run_command("oc cluster-info")
+        self.now += 300
+        self.run_command("oc cluster-info")
+        assert self.runs == ["oc get storageclass", "oc get storageclass", "oc cluster-info"]
+        assert self.cache.stats()["hits"] == 2
+
+    def test_failed_and_watch_commands_are_not_cached(self):
+        self.run_command("ocm describe cluster x", rc=1)
+        self.run_command("ocm describe cluster x", rc=1)
+        self.run_command("oc get pods -w")
+        self.run_command("oc get pods -w")
+        assert len(self.runs) == 4
+
+    def test_mutations_invalidate_the_same_kind_and_namespace(self):
+        reads = ["oc get pods -n odh", "oc get pods -n other", "oc get cm -n odh", "oc get pods -A", "oc whoami"]
+        for cmd in reads:
+            self.run_command(cmd)
+        self.run_command("oc delete pod dashboard-x2k9p -n odh")
+        for cmd in reads:
+            self.run_command(cmd)
+        assert self.runs[len(reads) + 1 :] == ["oc get pods -n odh", "oc get pods -A"]
+        self.run_command("oc apply -f manifest.yaml")
+        self.run_command("ocm list versions")
+        self.run_command("oc whoami")
+        self.run_command("ocm list versions")
+        assert self.runs[-2:] == ["ocm list versions", "oc whoami"]
+
+    def test_mutations_invalidate_once_they_returned(self):
+        def delete():
+            # read by another thread while the pod is being deleted
+            self.run_command("oc get pods")
+            return 0, ""
+
+        self.cache.call("oc delete pod dashboard-x2k9p", delete)
+        self.run_command("oc get pods")
+        assert self.runs == ["oc get pods", "oc get pods"]
+        assert self.cache.stats() == {"hits": 0, "misses": 2, "hit_ratio": 0.0, "invalidations": 1, "entries": 1}
+
+    def test_composed_and_session_commands(self):
+        self.run_command("oc get pods")
+        self.run_command("oc get secret token -o json | jq -r .data.token")
+        self.run_command("oc get pods")
+        assert self.runs.count("oc get pods") == 1
+        self.run_command("oc get pods -o name | xargs -n1 oc delete")
+        self.run_command("oc get pods")
+        self.run_command("oc login -u ldap-admin1 -p pass https://api.cluster:6443")
+        self.run_command("oc get pods")
+        assert self.runs.count("oc get pods") == 3
+
+    def test_uncacheable_calls_read_fresh_output_and_still_invalidate(self):
+        assert self.run_command("oc get pods") == "output 1"
+        assert self.cache.call("oc get pods", lambda: (0, "fresh"), cacheable=False) == "fresh"
+        assert self.run_command("oc get pods") == "output 1"
+        self.cache.call("oc delete pod dashboard-x2k9p", lambda: (0, ""), cacheable=False)
+        assert self.run_command("oc get pods") == "output 2"
+
+    def test_disabled(self):
+        self.cache.disable()
+        self.run_command("oc get pods")
+        self.run_command("oc get pods")
+        assert len(self.runs) == 2
+        assert self.cache.stats()["hits"] == 0
+
+
+class TestExecuteCommandCache(unittest.TestCase):
+    def test_execute_command_uses_the_cache(self):
+        result = util.CommandResult("oc get sc", 0, "gp3-csi\n", 0.1)
+        cache = CommandCache(enabled=True)
+        with (
+            unittest.mock.patch.object(util, "COMMAND_CACHE", cache),
+            unittest.mock.patch.object(util, "run_command", return_value=result) as run_command,
+        ):
+            assert util.execute_command("oc get sc", cacheable=True) == "gp3-csi\n"
+            assert util.execute_command("oc get sc", return_rc=True, cacheable=True) == (0, "gp3-csi\n")
+            outputs = [result.output for result in util.execute_commands(["oc get sc", "oc get sc"], cacheable=True)]
+            assert outputs == ["gp3-csi\n"] * 2
+        assert run_command.call_count == 1
+
+    def test_read_once_lookups_are_served_from_the_cache(self):
+        result = util.CommandResult("oc get route prometheus", 0, "prometheus.apps.cluster\n", 0.1)
+        with (
+            unittest.mock.patch.object(util, "COMMAND_CACHE", CommandCache(enabled=True)),
+            unittest.mock.patch.object(util, "run_command", return_value=result) as run_command,
+        ):
+            for _ in range(2):
+                url = generateTestConfigFile.get_prometheus_url("redhat-ods-monitoring")
+                assert url == "https://prometheus.apps.cluster"
+            assert util.COMMAND_CACHE.stats()["hits"] == 1
+        assert run_command.call_count == 1
+
+    def test_polling_loop_sees_updated_output(self):
+        phases = iter(["Pending\n", "Pending\n", "Running\n"])
+
+        def run_command(cmd, **kwargs):
+            return util.CommandResult(cmd, 0, next(phases), 0.1)
+
+        with (
+            unittest.mock.patch.object(util, "COMMAND_CACHE", CommandCache(enabled=True)),
+            unittest.mock.patch.object(util, "run_command", side_effect=run_command),
+        ):
+            polls = 0
+            while util.execute_command("oc get pod dashboard -o jsonpath={.status.phase}") != "Running\n":
+                polls += 1
+                assert polls < 5, "the polling loop got a cached output"
+        assert polls == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+
+from ods_ci.utils.scripts import login_broker, util
+from ods_ci.utils.scripts.login_broker import LoginSessionBroker, backoff_delays
+
+SERVER = "https://api.cluster.example.com:6443"
+
+
+class FakeCluster:
+    """Logs in by writing the kubeconfig, after failures failed attempts"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.logins = []
+        self.lock = threading.Lock()
+
+    def login(self, kubeconfig):
+        with self.lock:
+            self.logins.append(kubeconfig)
+            if len(self.logins) <= self.failures:
+                return False
+        with open(kubeconfig, "w") as file:
+            file.write("token")
+        return True
+
+    @staticmethod
+    def validate(kubeconfig):
+        with open(kubeconfig) as file:
+            return file.read() == "token"
+
+
+class TestBackoff(unittest.TestCase):
+    def test_delays_grow_up_to_the_maximum_within_the_timeout(self):
+        assert list(backoff_delays(timeout=200, initial=5, maximum=40, jitter=False)) == [5, 10, 20, 40, 40, 40, 40]
+        delays = list(backoff_delays(timeout=600))
+        assert sum(delays) <= 600
+        assert all(delay <= 60 for delay in delays)
+
+
+class TestLoginSessionBroker(unittest.TestCase):
+    def setUp(self):
+        sessions_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(sessions_dir.cleanup)
+        self.broker = LoginSessionBroker(os.path.join(sessions_dir.name, "sessions"))
+        self.cluster = FakeCluster()
+        patcher = unittest.mock.patch.object(login_broker.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def attach(self, identity="ldap-admin1", **kwargs):
+        return self.broker.attach(SERVER, identity, self.cluster.login, self.cluster.validate, export=False, **kwargs)
+
+    def test_one_login_per_identity(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            kubeconfigs = list(pool.map(lambda i: self.attach(f"ldap-user{i % 2}"), range(16)))
+        assert len(set(kubeconfigs)) == 2
+        assert sorted(self.cluster.logins) == sorted(set(kubeconfigs))
+        assert oct(os.stat(kubeconfigs[0]).st_mode & 0o777) == "0o600"
+
+    def test_invalid_session_logs_in_again(self):
+        kubeconfig = self.attach()
+        with open(kubeconfig, "w") as file:
+            file.write("expired")
+        assert self.attach() == kubeconfig
+        assert len(self.cluster.logins) == 2
+
+    def test_retries_with_backoff(self):
+        self.cluster.failures = 3
+        assert self.attach(timeout=600)
+        delays = [call.args[0] for call in self.sleep.call_args_list]
+        assert len(delays) == 3
+        assert delays[2] > delays[0]
+
+    def test_gives_up_after_the_timeout(self):
+        self.cluster.failures = 1000
+        assert self.attach(timeout=30) is False
+        assert sum(call.args[0] for call in self.sleep.call_args_list) <= 30
+
+    def test_without_sessions_dir(self):
+        broker = LoginSessionBroker()
+        logins = []
+        assert broker.attach(SERVER, "ldap-admin1", lambda kubeconfig: logins.append(kubeconfig) or True, None) is None
+        assert logins == [None]
+
+
+class TestOcLogin(unittest.TestCase):
+    def test_oc_login_shares_the_session(self):
+        sessions_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(sessions_dir.cleanup)
+        commands = []
+
+        def execute_command(cmd, **kwargs):
+            commands.append(cmd)
+            kubeconfig = cmd.rsplit("--kubeconfig=", 1)[1]
+            with open(kubeconfig, "w") as file:
+                file.write("token")
+            return "Login successful.\n"
+
+        with (
+            unittest.mock.patch.object(util, "LOGIN_BROKER", LoginSessionBroker(sessions_dir.name)),
+            unittest.mock.patch.object(util, "execute_command", execute_command),
+            unittest.mock.patch.object(util, "_valid_kubeconfig", FakeCluster.validate),
+            unittest.mock.patch.dict(os.environ),
+        ):
+            for _ in range(3):
+                util.oc_login(SERVER, "ldap-admin1", "secret")
+            assert os.environ["KUBECONFIG"].startswith(sessions_dir.name)
+        assert len(commands) == 1
+        assert commands[0].startswith(f"oc login -u ldap-admin1 -p secret {SERVER}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import base64
+import json
+import threading
+import unittest
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ods_ci.utils.scripts import oidc, util
+
+
+def id_token(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"e30.{payload}.sig"
+
+
+class FakeIssuer:
+    """Answers the token requests of the session, the id tokens expire expires_in seconds after now"""
+
+    def __init__(self, service, expires_in=300, refresh_token="r1"):
+        self.service = service
+        self.expires_in = expires_in
+        self.refresh_token = refresh_token
+        self.grants = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, data, **kwargs):
+        with self.lock:
+            self.grants.append(data["grant_type"])
+        response = requests.Response()
+        response.status_code = 401 if data.get("password") == "wrong" else 200
+        body = {"id_token": id_token(self.service.clock() + self.expires_in), "access_token": "a"}
+        if self.refresh_token:
+            body["refresh_token"] = self.refresh_token
+        response._content = json.dumps(body).encode()
+        return response
+
+
+class TestOidcTokenService(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_700_000_000.0
+        self.service = oidc.OidcTokenService(leeway=30, clock=lambda: self.now)
+        self.issuer = FakeIssuer(self.service)
+        patcher = unittest.mock.patch.object(self.service.session, "post", self.issuer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, username="ldap-user1", password="secret", scope="openid"):
+        return self.service.get_tokens("https://keycloak/realms/test", username, password, scope=scope)
+
+    def test_tokens_are_cached_until_exp(self):
+        first = self.get()
+        self.now += 200
+        assert self.get() == first
+        self.get(username="ldap-user2")
+        self.get(scope="openid offline_access")
+        assert self.issuer.grants == ["password"] * 3
+        # within the leeway of the exp claim the refresh token is used
+        self.now += 80
+        assert self.get()["id_token"] != first["id_token"]
+        assert self.issuer.grants == ["password"] * 3 + ["refresh_token"]
+        assert self.service.stats() == {"hits": 1, "misses": 3, "refreshes": 1, "entries": 3}
+
+    def test_password_grant_without_refresh_token(self):
+        self.issuer.refresh_token = None
+        self.get()
+        self.now += 1000
+        self.get()
+        assert self.issuer.grants == ["password", "password"]
+
+    def test_changed_password_is_not_served_from_the_cache(self):
+        self.get()
+        with self.assertRaises(requests.HTTPError):
+            self.get(password="wrong")
+        assert self.issuer.grants == ["password", "password"]
+
+    def test_concurrent_callers_share_one_grant(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = list(pool.map(lambda _: self.get()["id_token"], range(32)))
+        assert len(set(tokens)) == 1
+        assert self.issuer.grants == ["password"]
+
+    def test_concurrent_users_and_invalidations(self):
+        def get_and_invalidate(i):
+            self.get(username=f"ldap-user{i}")
+            self.service.invalidate(username=f"ldap-user{i - 1}")
+            return self.service.stats()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(get_and_invalidate, range(1, 65)))
+        assert self.service.stats()["misses"] == 64
+        # the user of the last call is never invalidated
+        self.get(username="ldap-user64")
+        assert self.service.stats()["hits"] == 1
+        self.service.invalidate()
+        assert self.service.stats()["entries"] == 0
+
+    def test_get_oidc_tokens_uses_the_shared_cache(self):
+        with unittest.mock.patch.object(util, "OIDC_TOKENS", self.service):
+            tokens = util.get_oidc_tokens("ldap-user1", "secret", "https://keycloak/realms/test")
+            assert util.get_oidc_tokens("ldap-user1", "secret", "https://keycloak/realms/test") == tokens
+        assert tokens["refresh_token"] == "r1"
+        assert self.issuer.grants == ["password"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ import io
 import logging
 import subprocess
 import sys
+import time
 import unittest
 import unittest.mock
 
@@ -103,3 +104,45 @@ class TestExecuteCommand(unittest.TestCase):
             util.execute_command(f"""{python} -c 'print(("a" * 40 + "\\n")*1_000_000, end="")'""", print_stdout=False)
             == ("a" * 40 + "\n") * 1_000_000
         )
+
+    def test_timeout_without_return_rc(self):
+        start = time.perf_counter()
+        # the sleep is a child of the shell, it must be killed too for stdout to be closed
+        assert util.execute_command("echo started; sleep 10; echo done", timeout=0.5) == "started\n"
+        assert time.perf_counter() - start < 5
+
+    def test_timeout_with_return_rc(self):
+        assert util.execute_command("echo started; sleep 10", return_rc=True, timeout=0.5) == (None, "started\n")
+
+    def test_return_rc(self):
+        assert util.execute_command("echo out; exit 3", return_rc=True) == (3, "out\n")
+
+
+class TestExecuteCommands(unittest.TestCase):
+    def test_results_in_order(self):
+        results = util.execute_commands(["sleep 0.2; echo a", "echo b; exit 2", "echo c >&2"])
+        assert [(result.rc, result.output) for result in results] == [(0, "a\n"), (2, "b\n"), (0, "c\n")]
+        assert results[0].duration >= 0.2
+        assert results[1].cmd == "echo b; exit 2"
+
+    def test_commands_overlap(self):
+        start = time.perf_counter()
+        results = util.execute_commands(["sleep 0.5"] * 8, max_workers=8)
+        assert time.perf_counter() - start < 0.5 * 4
+        assert all(result.rc == 0 for result in results)
+
+    def test_bounded_parallelism(self):
+        start = time.perf_counter()
+        util.execute_commands(["sleep 0.2"] * 4, max_workers=2)
+        assert time.perf_counter() - start >= 0.4
+
+    def test_timeout_and_truncated_output(self):
+        python = sys.executable
+        slow, chatty = util.execute_commands(
+            ["sleep 10", f"""{python} -c 'print("a\\n"*5000, end="")'"""], timeout=2, max_output_lines=10
+        )
+        assert slow.rc is None
+        assert slow.timed_out
+        assert chatty.rc == 0
+        assert chatty.truncated
+        assert chatty.output == "a\n" * 10
@@ -0,0 +1,314 @@
+import atexit
+import os
+import re
+import shlex
+import threading
+import time
+
+from ods_ci.utils.scripts.logger import log
+
+# (tool, verb) -> seconds the output of the read-only commands is reused
+DEFAULT_TTLS = {
+    ("oc", "get"): 30,
+    ("oc", "describe"): 30,
+    ("oc", "whoami"): 300,
+    ("oc", "cluster-info"): 600,
+    ("oc", "version"): 600,
+    ("oc", "api-resources"): 600,
+    ("oc", "api-versions"): 600,
+    ("ocm", "get"): 30,
+    ("ocm", "describe"): 30,
+    ("ocm", "list"): 60,
+    ("ocm", "whoami"): 300,
+    ("ocm", "version"): 600,
+}
+
+# oc verbs after which nothing cached can be trusted, e.g. another user or cluster
+SESSION_VERBS = {"login", "logout", "config", "project"}
+
+# oc verbs followed by the kinds they read or change, the kinds changed by the other verbs are not known
+KIND_VERBS = {"get", "describe", "delete", "patch", "label", "annotate", "scale", "edit", "create", "replace"}
+
+# kinds whose changes affect the resources of other kinds
+CONTAINER_KINDS = {"namespaces", "projects", "customresourcedefinitions"}
+
+# flags of oc/ocm taking a value as the next argument
+VALUE_FLAGS = {
+    "-n",
+    "--namespace",
+    "-o",
+    "--output",
+    "-l",
+    "--selector",
+    "--field-selector",
+    "--context",
+    "--cluster",
+    "--kubeconfig",
+    "--server",
+    "-s",
+    "--token",
+    "-f",
+    "--filename",
+    "-p",
+    "--patch",
+    "--type",
+    "--as",
+    "-c",
+    "--container",
+    "--template",
+    "--sort-by",
+    "-u",
+    "--username",
+    "--password",
+    "--parameter",
+}
+
+# options that make a read-only command never return, or return something else on each call
+UNCACHEABLE_FLAGS = {"-w", "--watch", "--watch-only", "-f", "--follow"}
+
+SHORT_NAMES = {
+    "po": "pods",
+    "svc": "services",
+    "deploy": "deployments",
+    "cm": "configmaps",
+    "ns": "namespaces",
+    "sa": "serviceaccounts",
+    "sc": "storageclasses",
+    "pvc": "persistentvolumeclaims",
+    "pv": "persistentvolumes",
+    "no": "nodes",
+    "ds": "daemonsets",
+    "sts": "statefulsets",
+    "rs": "replicasets",
+    "ep": "endpoints",
+    "crd": "customresourcedefinitions",
+    "csv": "clusterserviceversions",
+    "sub": "subscriptions",
+    "ip": "installplans",
+    "og": "operatorgroups",
+    "isvc": "inferenceservices",
+}
+
+# a command line with one of these is composed by the shell, it is not cached
+SHELL_METACHARACTERS = set("|;&<>`$()\n")
+
+
+class ParsedCommand:
+    """
+    The oc/ocm invocation of a command line: tool, verb, kinds and namespace ("*" for all the namespaces,
+    None for the current one). kinds is None when they can not be known, e.g. oc apply -f
+    """
+
+    def __init__(self, tool, verb, kinds, namespace, flags):
+        self.tool = tool
+        self.verb = verb
+        self.kinds = kinds
+        self.namespace = namespace
+        self.flags = flags
+
+
+def normalize_kind(kind):
+    """
+    Returns the plural lower case resource name of a kind, without its API group
+
+    >>> [normalize_kind(kind) for kind in ("StorageClass", "sc", "deployment.apps", "pods")]
+    ['storageclasses', 'storageclasses', 'deployments', 'pods']
+    """
+    kind = kind.lower().split(".", 1)[0]
+    kind = SHORT_NAMES.get(kind, kind)
+    if kind == "all":
+        return kind
+    if kind.endswith("s"):
+        return f"{kind}es" if kind.endswith("ss") else kind
+    if kind.endswith("y") and kind[-2:-1] not in ("a", "e", "o", "u"):
+        return f"{kind[:-1]}ies"
+    return f"{kind}s"
+
+
+def parse_command(cmd):
+    """
+    Parses a simple oc/ocm/kubectl command line, returns None for other commands and for the ones composed
+    by the shell (pipes, redirections, several commands...)
+
+    >>> parsed = parse_command("oc get pods,svc -n redhat-ods-applications -o json")
+    >>> parsed.tool, parsed.verb, parsed.kinds, parsed.namespace
+    ('oc', 'get', ['pods', 'services'], 'redhat-ods-applications')
+    """
+    if not isinstance(cmd, str) or SHELL_METACHARACTERS & set(cmd):
+        return None
+    try:
+        args = shlex.split(cmd)
+    except ValueError:
+        return None
+    if not args or args[0] not in ("oc", "kubectl", "ocm"):
+        return None
+    tool = "ocm" if args[0] == "ocm" else "oc"
+    positional, flags, namespace = [], set(), None
+    args = iter(args[1:])
+    for arg in args:
+        if arg.startswith("-"):
+            name, has_value, value = arg.partition("=")
+            flags.add(name)
+            if name in VALUE_FLAGS and not has_value:
+                value = next(args, "")
+            if name in ("-n", "--namespace"):
+                namespace = value
+            elif name in ("-A", "--all-namespaces") and value.lower() != "false":
+                namespace = "*"
+        else:
+            positional.append(arg)
+    if not positional:
+        return None
+    verb = positional[0]
+    kinds = None
+    no_kinds = flags & {"-f", "--filename", "-k", "--kustomize"}
+    if tool == "oc" and verb in KIND_VERBS and len(positional) > 1 and not no_kinds:
+        if "/" in positional[1]:
+            # oc get pod/name deployment/name
+            kinds = [normalize_kind(arg.split("/", 1)[0]) for arg in positional[1:] if "/" in arg]
+        else:
+            kinds = [normalize_kind(kind) for kind in positional[1].split(",") if kind]
+    if kinds is not None and (CONTAINER_KINDS | {"all"}) & set(kinds):
+        kinds = None
+    return ParsedCommand(tool, verb, kinds, namespace, flags)
+
+
+def composed_command_verbs(cmd):
+    """
+    Returns the (tool, verb) of the oc/ocm commands of a command line composed by the shell
+
+    >>> composed_command_verbs("oc get secret token -o json | jq -r .data && oc delete pod -l app=x")
+    [('oc', 'get'), ('oc', 'delete')]
+    """
+    verbs = []
+    for segment in re.split(r"[|;&\n()`]|\$\(", cmd):
+        words = segment.split()
+        # the tool may be run by another command, e.g. xargs oc delete
+        start = next((i for i, word in enumerate(words) if word in ("oc", "kubectl", "ocm")), None)
+        if start is not None:
+            positional = [word for word in words[start + 1 :] if not word.startswith("-")]
+            verbs.append(("ocm" if words[start] == "ocm" else "oc", positional[0] if positional else ""))
+    return verbs
+
+
+def _overlaps(entry, mutation):
+    if entry.tool != mutation.tool:
+        return False
+    if mutation.tool == "ocm" or mutation.kinds is None:
+        return True
+    if entry.kinds is None:
+        # oc get all, but not oc whoami, cluster-info...
+        return entry.verb in KIND_VERBS
+    if not set(entry.kinds) & set(mutation.kinds):
+        return False
+    return (
+        None in (entry.namespace, mutation.namespace)
+        or "*" in (entry.namespace, mutation.namespace)
+        or (entry.namespace == mutation.namespace)
+    )
+
+
+class CommandCache:
+    """
+    Opt-in memoization of the output of read-only oc/ocm commands (get, list, describe, whoami...), each
+    (tool, verb) with its own TTL. Only the call sites that read something once (e.g. oc whoami, the route of a
+    service) pass cacheable=True, polling loops must see every change and never read from the cache. Running a
+    mutating command (apply, patch, delete, create...) through the cache drops the cached outputs of the same kind
+    and namespace, or all of them when they can not be told, once the command returned.
+    Commands run by other means (e.g. Robot Run Process) do not invalidate anything, hence the short TTLs.
+
+    Enabled with the ODS_CI_COMMAND_CACHE=true environment variable or with enable(). The hit/miss
+    statistics are logged when the process exits
+    """
+
+    def __init__(self, enabled=False, ttls=None, clock=time.monotonic):
+        self.enabled = enabled
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def enable(self, ttls=None):
+        self.ttls.update(ttls or {})
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def ttl(self, parsed):
+        """Returns the TTL of a parsed command, None when it is not a cacheable read-only command"""
+        if parsed is None or parsed.flags & UNCACHEABLE_FLAGS:
+            return None
+        return self.ttls.get((parsed.tool, parsed.verb))
+
+    def invalidate(self, mutation=None):
+        """Drops the cached outputs overlapping the parsed mutating command, or all of them"""
+        with self._lock:
+            stale = [cmd for cmd, entry in self._entries.items() if mutation is None or _overlaps(entry[0], mutation)]
+            for cmd in stale:
+                del self._entries[cmd]
+            self.invalidations += len(stale)
+
+    def call(self, cmd, fetch, cacheable=True):
+        """
+        Returns the value of fetch() for the command line cmd, from the cache when it is a cacheable read-only
+        command run within its TTL. fetch must return (rc, value), only the values with rc 0 are cached.
+        Mutating commands invalidate the cache whether cacheable or not
+        """
+        if not self.enabled:
+            return fetch()[1]
+        parsed = parse_command(cmd)
+        ttl = self.ttl(parsed)
+        if ttl is None:
+            try:
+                return fetch()[1]
+            finally:
+                # after the command returned, the outputs cached while it was running are stale too
+                if parsed is not None:
+                    self.invalidate(None if parsed.tool == "oc" and parsed.verb in SESSION_VERBS else parsed)
+                elif isinstance(cmd, str) and any(verb not in self.ttls for verb in composed_command_verbs(cmd)):
+                    # composed by the shell, what it changes can not be told
+                    self.invalidate()
+        if not cacheable:
+            return fetch()[1]
+        with self._lock:
+            entry = self._entries.get(cmd)
+            if entry is not None and self.clock() < entry[1]:
+                self.hits += 1
+                log.info(f"Output of '{cmd}' served from the command cache")
+                return entry[2]
+            self.misses += 1
+        rc, value = fetch()
+        if rc == 0:
+            with self._lock:
+                self._entries[cmd] = (parsed, self.clock() + ttl, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            hits, misses, invalidations, entries = self.hits, self.misses, self.invalidations, len(self._entries)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else None,
+            "invalidations": invalidations,
+            "entries": entries,
+        }
+
+
+COMMAND_CACHE = CommandCache(enabled=os.environ.get("ODS_CI_COMMAND_CACHE", "").lower() in ("1", "true", "yes"))
+
+
+@atexit.register
+def _log_command_cache_stats():
+    if COMMAND_CACHE.hits or COMMAND_CACHE.misses:
+        log.info(f"Command cache: {COMMAND_CACHE.stats()}")
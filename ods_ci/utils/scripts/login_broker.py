@@ -0,0 +1,103 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import random
+import threading
+import time
+
+from ods_ci.utils.scripts.logger import log
+
+
+def backoff_delays(timeout=600, initial=2.0, factor=2.0, maximum=60.0, jitter=True):
+    """
+    Yields the delays between the attempts of an operation retried for at most timeout seconds (the sum of
+    the delays), growing exponentially from initial up to maximum. With jitter each delay is drawn between
+    half and all of its value, so that parallel workers do not retry in lockstep
+
+    >>> list(backoff_delays(timeout=30, jitter=False))
+    [2.0, 4.0, 8.0, 16.0]
+    """
+    delay, waited = float(initial), 0.0
+    while True:
+        next_delay = random.uniform(delay / 2, delay) if jitter else delay
+        if waited + next_delay > timeout:
+            return
+        yield next_delay
+        waited += next_delay
+        delay = min(delay * factor, maximum)
+
+
+def session_key(server, identity):
+    """Returns the name of the session of the identity on the cluster, same as in run_robot_test.sh"""
+    return hashlib.sha256(f"{server}\n{identity}".encode()).hexdigest()[:16]
+
+
+class LoginSessionBroker:
+    """
+    Shares one oc login per (cluster, identity) between the threads and processes (e.g. parallel test
+    shards) of a machine. Each identity gets its own kubeconfig in sessions_dir, so concurrent logins of
+    different users never write the same file. The first worker logs in while holding a file lock on the
+    session, the next ones attach to its kubeconfig as long as it is still valid.
+
+    Without sessions_dir (ODS_CI_KUBE_SESSIONS_DIR environment variable) every attach logs in again into
+    the default kubeconfig, as oc login does
+    """
+
+    def __init__(self, sessions_dir=None):
+        self.sessions_dir = sessions_dir
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def kubeconfig_path(self, server, identity):
+        if not self.sessions_dir:
+            return None
+        return os.path.join(self.sessions_dir, f"{session_key(server, identity)}.kubeconfig")
+
+    @contextlib.contextmanager
+    def _session_lock(self, kubeconfig):
+        if kubeconfig is None:
+            yield
+            return
+        with self._lock:
+            lock = self._locks.setdefault(kubeconfig, threading.Lock())
+        os.makedirs(os.path.dirname(kubeconfig), exist_ok=True)
+        with lock, open(f"{kubeconfig}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def attach(self, server, identity, login, validate, timeout=600, export=True):
+        """
+        Returns the kubeconfig of the session of identity on the server (None for the default kubeconfig),
+        logging in with login(kubeconfig) unless validate(kubeconfig) tells the existing session is valid.
+        Failed logins are retried with exponential backoff for up to timeout seconds, then False is returned.
+        With export the kubeconfig is set as KUBECONFIG of the process, for the oc commands run afterwards
+        """
+        kubeconfig = self.kubeconfig_path(server, identity)
+        with self._session_lock(kubeconfig):
+            if kubeconfig is not None and os.path.exists(kubeconfig) and validate(kubeconfig):
+                log.info(f"Reusing the login session of {identity} on {server}: {kubeconfig}")
+            elif not self._login(login, kubeconfig, timeout):
+                return False
+        if export and kubeconfig is not None:
+            os.environ["KUBECONFIG"] = kubeconfig
+        return kubeconfig
+
+    def _login(self, login, kubeconfig, timeout):
+        delays = backoff_delays(timeout)
+        while True:
+            if login(kubeconfig):
+                if kubeconfig is not None:
+                    os.chmod(kubeconfig, 0o600)
+                return True
+            delay = next(delays, None)
+            if delay is None:
+                return False
+            log.info(f"Login failed, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+LOGIN_BROKER = LoginSessionBroker(os.environ.get("ODS_CI_KUBE_SESSIONS_DIR") or None)
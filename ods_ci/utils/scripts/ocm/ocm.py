@@ -6,7 +6,9 @@ import io
 import json
 import os
 import re
+import shlex
 import sys
+import threading
 import time
 from contextlib import redirect_stderr, redirect_stdout
 
@@ -14,10 +16,79 @@ import jinja2
 import yaml
 
 from ods_ci.utils.scripts.logger import log
-from ods_ci.utils.scripts.util import compare_dicts, execute_command, read_data_from_json, write_data_in_json
+from ods_ci.utils.scripts.util import (
+    compare_dicts,
+    execute_command,
+    execute_commands,
+    read_data_from_json,
+    write_data_in_json,
+)
 
 dir_path = os.path.dirname(os.path.abspath(__file__))
 
+
+class ClusterMetadataCache:
+    """
+    Process-wide cache of the OCM cluster IDs (by cluster name, id or external id) and of the cluster
+    metadata ("describe" JSON and addon installations, by cluster ID) shared by all the
+    OpenshiftClusterManager instances. Entries expire after ttl seconds and are invalidated
+    by the operations that create, modify or delete the cluster
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._cluster_ids = {}
+        self._metadata = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_cluster_id(self, cluster_name, resolve):
+        """Returns the cluster ID of cluster_name, calling resolve() when it is not known or expired"""
+        with self._lock:
+            entry = self._cluster_ids.get(cluster_name)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+        cluster_id = resolve()
+        if cluster_id is not None:
+            with self._lock:
+                self._cluster_ids[cluster_name] = (time.monotonic(), cluster_id)
+        return cluster_id
+
+    def get(self, cluster_id, kind, fetch):
+        """Returns the cached metadata kind ("describe", "addons") of the cluster, calling fetch() when expired"""
+        key = (cluster_id, kind)
+        with self._lock:
+            entry = self._metadata.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = fetch()
+        if value is not None:
+            with self._lock:
+                self._metadata[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, cluster_id=None, cluster_name=None):
+        """Forgets the metadata of cluster_id (all clusters when None), and the ID of cluster_name if given"""
+        with self._lock:
+            if cluster_name is not None:
+                self._cluster_ids.pop(cluster_name, None)
+            for key in list(self._metadata):
+                if cluster_id is None or key[0] == cluster_id:
+                    del self._metadata[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._metadata)}
+
+
+CLUSTER_METADATA_CACHE = ClusterMetadataCache()
+
+# ocm_describe() filters that project one field of the JSON, served from CLUSTER_METADATA_CACHE
+JQ_FIELD_FILTER = re.compile(r"^--json \| jq -r '((?:\.\w+)+)'$")
+
 """
 Class for Openshift Cluster Manager
 """
@@ -113,6 +184,13 @@ class OpenshiftClusterManager:
         """Describes cluster and returns cluster info"""
 
         cluster_id = self.get_osd_cluster_id()
+        field = JQ_FIELD_FILTER.match(jq_filter)
+        if field is not None:
+            value = self.get_cluster_field(field.group(1).lstrip("."))
+            if value is None and self.ocm_describe_json() is None:
+                return None
+            # same output as jq -r: strings unquoted, everything else as JSON
+            return f"{value if isinstance(value, str) else json.dumps(value, indent=2)}\n"
         cmd = f"ocm describe cluster {cluster_id}"
         if jq_filter:
             cmd += f" {jq_filter}"
@@ -122,6 +200,34 @@ class OpenshiftClusterManager:
             return None
         return ret
 
+    def ocm_describe_json(self):
+        """Returns the cluster description as a dict (cached, see CLUSTER_METADATA_CACHE), None on failure"""
+        cluster_id = self.get_osd_cluster_id()
+
+        def fetch():
+            ret = execute_command(f"ocm describe cluster {cluster_id} --json", print_stdout=False)
+            try:
+                return json.loads(ret)
+            except (TypeError, ValueError):
+                log.info(f"ocm describe for cluster {self.cluster_name} with id: {cluster_id} failed")
+                return None
+
+        return CLUSTER_METADATA_CACHE.get(cluster_id, "describe", fetch)
+
+    def get_cluster_field(self, path):
+        """Returns the field of the cluster description at the dotted path (e.g. "version.raw_id"), or None"""
+        value = self.ocm_describe_json()
+        for key in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def invalidate_cluster_metadata(self):
+        """Forgets the cached metadata of the cluster, to be called after modifying it"""
+        if self.cluster_id:
+            CLUSTER_METADATA_CACHE.invalidate(self.cluster_id)
+
     def is_osd_cluster_exists(self):
         """Checks if cluster exists"""
         ret = self.ocm_describe()
@@ -162,10 +268,13 @@ class OpenshiftClusterManager:
                 if self.channel_group == "candidate":
                     chan_grp = "--channel-group {}".format(self.channel_group)
 
-                version_cmd = f'ocm list versions {chan_grp} | grep -w "{re.escape(version)}*"'
-                versions = execute_command(version_cmd)
+                # filtered here rather than with grep -w so that the listing is read from the command cache
+                versions = execute_command(f"ocm list versions {chan_grp}".strip(), cacheable=True) or ""
+                versions = [
+                    ver for ver in versions.split("\n") if re.search(rf"(?<!\w){re.escape(version)}*(?!\w)", ver)
+                ]
                 if versions:
-                    version = [ver for ver in versions.split("\n") if ver][-1]
+                    version = versions[-1]
                 else:
                     log.error(f"No supported versions found for {version} in OCM")
                     sys.exit(1)
@@ -218,6 +327,8 @@ class OpenshiftClusterManager:
         cmd = "ocm --v={} post /api/clusters_mgmt/v1/clusters --body={}".format(self.ocm_verbose_level, output_file)
         ret = execute_command(cmd)
         self.hide_values_in_file(output_file, values_to_hide)
+        # a cluster of the same name may have been deleted and its ID cached
+        CLUSTER_METADATA_CACHE.invalidate(cluster_name=self.cluster_name)
         if ret is None:
             log.error(f"Failed to create osd cluster {self.cluster_name}")
             sys.exit(1)
@@ -231,16 +342,19 @@ class OpenshiftClusterManager:
         # "external_id": "feb5a50a-b9ce-40ad-99a7-69159f0ca957", --- ID of the cluster itself (we provide in self.cluster_name)
 
         if not self.cluster_id:
-            cmd = "ocm list clusters -p search=\"name = '{}' or id = '{}' or external_id = '{}'\" --columns id --no-headers".format(
-                self.cluster_name, self.cluster_name, self.cluster_name
-            )
-            cluster_id = execute_command(cmd)
-            if cluster_id in [None, ""]:
-                log.error(f"Unable to retrieve cluster ID for cluster name {self.cluster_name}. EXITING")
-                sys.exit(1)
-            self.cluster_id = cluster_id.strip("\n")
+            self.cluster_id = CLUSTER_METADATA_CACHE.get_cluster_id(self.cluster_name, self._resolve_osd_cluster_id)
         return self.cluster_id
 
+    def _resolve_osd_cluster_id(self):
+        cmd = "ocm list clusters -p search=\"name = '{}' or id = '{}' or external_id = '{}'\" --columns id --no-headers".format(
+            self.cluster_name, self.cluster_name, self.cluster_name
+        )
+        cluster_id = execute_command(cmd)
+        if cluster_id in [None, ""]:
+            log.error(f"Unable to retrieve cluster ID for cluster name {self.cluster_name}. EXITING")
+            sys.exit(1)
+        return cluster_id.strip("\n")
+
     def get_osd_cluster_state(self):
         """Gets osd cluster state"""
 
@@ -375,16 +489,20 @@ class OpenshiftClusterManager:
         """Gets given addon's state"""
 
         cluster_id = self.get_osd_cluster_id()
-        cmd = f"ocm list addons --cluster {cluster_id} --columns id,state | grep {addon_name} "
-        ret = execute_command(cmd)
-        if ret is None:
+
+        def fetch():
+            # the addon installations of the cluster, as listed by "ocm list addons"
+            ret = execute_command(f"ocm get /api/clusters_mgmt/v1/clusters/{cluster_id}/addons", print_stdout=False)
+            try:
+                return {addon["id"]: addon.get("state", "") for addon in json.loads(ret).get("items", [])}
+            except (TypeError, ValueError, KeyError):
+                return None
+
+        addons = CLUSTER_METADATA_CACHE.get(cluster_id, "addons", fetch)
+        if addons is None:
             log.info(f"Failed to get {addon_name} addon state for cluster {self.cluster_name}")
             return None
-        match = re.search(addon_name + r"\s*(.*)", ret)
-        if match is None:
-            log.info("regex failed in get_addon_state")
-            return None
-        return match.group(1).strip()
+        return addons.get(addon_name, "not installed")
 
     def check_if_machine_pool_exists(self):
         """Checks if given machine pool name already exists in cluster"""
@@ -410,6 +528,7 @@ class OpenshiftClusterManager:
                 self.pool_name,
             )
             ret = execute_command(cmd)
+            self.invalidate_cluster_metadata()
             if ret is None:
                 log.error(f"Failed to add machine pool {self.cluster_name}")
                 sys.exit(1)
@@ -484,6 +603,7 @@ class OpenshiftClusterManager:
                 f"/api/clusters_mgmt/v1/clusters/{cluster_id}/addons/{addon_name}"
             )
             ret = execute_command(cmd)
+            self.invalidate_cluster_metadata()
             if ret is None:
                 log.info(f"Failed to uninstall {addon_name} addon on cluster {self.cluster_name}")
                 if exit_on_failure:
@@ -555,6 +675,7 @@ class OpenshiftClusterManager:
             self.ocm_verbose_level, cluster_id, output_file
         )
         ret = execute_command(cmd)
+        self.invalidate_cluster_metadata()
         if len(fields_to_hide) > 0:
             ret = self.hide_values_in_op_json(fields_to_hide, ret)
         failure_flag = False
@@ -803,19 +924,19 @@ class OpenshiftClusterManager:
         if ret is None:
             log.info(f"Failed to delete identity provider of type {self.idp_name}")
 
+    def _add_user_to_group_cmd(self, user, group):
+        if group in ("rhods-admins", "rhods-users", "rhods-noaccess"):
+            return f"oc adm groups add-users {group} {user}"
+        cluster_id = self.get_osd_cluster_id()
+        return f"ocm --v={self.ocm_verbose_level} create user {user} --cluster {cluster_id} --group={group}"
+
     def add_user_to_group(self, user="", group="cluster-admins"):
         """Adds user to given group"""
 
         if user == "":
             user = self.htpasswd_cluster_admin
 
-        if group in ("rhods-admins", "rhods-users", "rhods-noaccess"):
-            cmd = f"oc adm groups add-users {group} {user}"
-        else:
-            cluster_id = self.get_osd_cluster_id()
-            cmd = f"ocm --v={self.ocm_verbose_level} create user {user} --cluster {cluster_id} --group={group}"
-
-        ret = execute_command(cmd)
+        ret = execute_command(self._add_user_to_group_cmd(user, group))
         if ret is None:
             log.info(f"Failed to add user {user} to group {group}")
 
@@ -841,27 +962,31 @@ class OpenshiftClusterManager:
     def add_users_to_rhods_group(self):
         """Add users to rhods group"""
 
-        self.create_group("rhods-admins")
-        # Adds user ldap-admin1..ldap-adminN
-        for i in range(1, int(self.num_users_to_create_per_group) + 1):
-            self.add_user_to_group(user="ldap-admin" + str(i), group="rhods-admins")
-            self.add_user_to_group(user="ldap-admin" + str(i), group="dedicated-admins")
-
-        self.create_group("rhods-users")
-        # Adds user ldap-user1..ldap-userN
-        for i in range(1, int(self.num_users_to_create_per_group) + 1):
-            self.add_user_to_group(user="ldap-user" + str(i), group="rhods-users")
-
-        # Adds special users
-        # "(", ")", "|", "<", ">" not working in OSD
-        # "+" and ";" disabled for now
-        for char in [".", "^", "$", "*", "?", "[", "]", "{", "}", "@"]:
-            self.add_user_to_group(user="ldap-special" + char, group="rhods-users")
-
-        self.create_group("rhods-noaccess")
-        # Adds user ldap-noaccess1..ldap-noaccessN
-        for i in range(1, int(self.num_users_to_create_per_group) + 1):
-            self.add_user_to_group(user="ldap-noaccess" + str(i), group="rhods-noaccess")
+        users = range(1, int(self.num_users_to_create_per_group) + 1)
+        groups = {
+            # Adds user ldap-admin1..ldap-adminN
+            "rhods-admins": [f"ldap-admin{i}" for i in users],
+            # Adds user ldap-user1..ldap-userN and special users
+            # "(", ")", "|", "<", ">" not working in OSD
+            # "+" and ";" disabled for now
+            "rhods-users": [f"ldap-user{i}" for i in users]
+            + [f"ldap-special{char}" for char in [".", "^", "$", "*", "?", "[", "]", "{", "}", "@"]],
+            # Adds user ldap-noaccess1..ldap-noaccessN
+            "rhods-noaccess": [f"ldap-noaccess{i}" for i in users],
+        }
+        # the groups are independent, the users of a group are added by one command to update the group once
+        cmds = [f"oc adm groups new {group}" for group in groups]
+        for result in execute_commands(cmds):
+            if result.rc != 0:
+                log.info(f"Failed to run '{result.cmd}': {result.output}")
+        cmds = [
+            f"oc adm groups add-users {group} {' '.join(shlex.quote(user) for user in group_users)}"
+            for group, group_users in groups.items()
+        ]
+        cmds += [self._add_user_to_group_cmd(user, "dedicated-admins") for user in groups["rhods-admins"]]
+        for result in execute_commands(cmds):
+            if result.rc != 0:
+                log.info(f"Failed to run '{result.cmd}': {result.output}")
 
         # Logging users/groups details after adding
         # given user to group
@@ -929,6 +1054,7 @@ class OpenshiftClusterManager:
         cluster_id = self.get_osd_cluster_id()
         cmd = f"ocm --v={self.ocm_verbose_level} delete cluster {cluster_id}"
         ret = execute_command(cmd)
+        CLUSTER_METADATA_CACHE.invalidate(cluster_id, self.cluster_name)
         if ret is None:
             log.error(f"Failed to delete osd cluster '{self.cluster_name}' with id: {cluster_id}")
             sys.exit(1)
@@ -958,6 +1084,7 @@ class OpenshiftClusterManager:
         cluster_id = self.get_osd_cluster_id()
         cmd = f"ocm --v={self.ocm_verbose_level} hibernate cluster {cluster_id}"
         ret = execute_command(cmd)
+        self.invalidate_cluster_metadata()
         if ret is None:
             log.error(f"Failed to hibernate osd cluster {self.cluster_name}")
             sys.exit(1)
@@ -989,6 +1116,7 @@ class OpenshiftClusterManager:
         cluster_id = self.get_osd_cluster_id()
         cmd = f"ocm --v={self.ocm_verbose_level} resume cluster {cluster_id}"
         ret = execute_command(cmd)
+        self.invalidate_cluster_metadata()
         if ret is None:
             log.error(f"Failed to resume osd cluster {self.cluster_name}")
             sys.exit(1)
@@ -1025,6 +1153,7 @@ class OpenshiftClusterManager:
             self.ocm_verbose_level, cluster_id, addon_name, output_file
         )
         ret = execute_command(cmd)
+        self.invalidate_cluster_metadata()
         if ret is None:
             log.error(f"Failed to update email address to {addon_name} addon on cluster {self.cluster_name}")
             if exit_on_failure:
@@ -1162,6 +1291,7 @@ class OpenshiftClusterManager:
         )
         log.info(run_change_channel_cmd)
         ret = execute_command(run_change_channel_cmd)
+        self.invalidate_cluster_metadata()
         if ret is None:
             log.info("Failed to update the channel to {}".format(self.cluster_name))
         return ret
@@ -1192,6 +1322,7 @@ class OpenshiftClusterManager:
             )
         )
         ret = execute_command(schedule_cluster_upgrade)
+        self.invalidate_cluster_metadata()
         if ret is None:
             log.info("Failed  to Update the Upgrade Policy")
         return ret
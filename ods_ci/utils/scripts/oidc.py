@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+
+import requests
+
+from ods_ci.utils.scripts.logger import log
+
+
+def jwt_claims(token):
+    """
+    Returns the claims of a JWT without verifying its signature, or {} when the token can not be decoded
+
+    >>> jwt_claims("e30." + base64.urlsafe_b64encode(b'{"exp": 1700000000}').decode().rstrip("=") + ".sig")
+    {'exp': 1700000000}
+    """
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (AttributeError, IndexError, ValueError):
+        return {}
+
+
+class OidcTokenService:
+    """
+    Password grant tokens of OIDC issuers, shared by all the callers of the process.
+
+    Tokens are cached by (issuer, username, client_id, scope) until the exp claim of the id token, minus
+    leeway seconds. Expired tokens are renewed with their refresh token when there is one, with the password
+    grant otherwise. The requests go through one pooled session, and concurrent callers of the same key
+    wait for a single grant
+    """
+
+    def __init__(self, leeway=30, clock=time.time):
+        self.leeway = leeway
+        self.clock = clock
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/x-www-form-urlencoded"})
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _expires_at(self, tokens, now):
+        exp = jwt_claims(tokens.get("id_token")).get("exp")
+        if exp is None:
+            exp = now + float(tokens.get("expires_in") or 0)
+        refresh_expires_in = tokens.get("refresh_expires_in")
+        # 0 means the refresh token does not expire (e.g. offline tokens of keycloak)
+        refresh_exp = now + float(refresh_expires_in) if refresh_expires_in else None
+        return float(exp), refresh_exp
+
+    def _grant(self, url, data, verify, timeout):
+        response = self.session.post(url, data=data, allow_redirects=True, timeout=timeout, verify=verify)
+        response.raise_for_status()
+        tokens = response.json()
+        if "id_token" not in tokens:
+            raise ValueError(f"No id_token in response: {tokens}")
+        return tokens
+
+    def get_tokens(
+        self,
+        issuer,
+        username,
+        password,
+        token_endpoint="",
+        client_id="oc-cli",
+        client_secret="",
+        scope="openid",
+        verify=True,
+        timeout=30,
+    ):
+        """
+        Returns the token response (id_token, refresh_token...) of the user, from the cache when its id token
+        is still valid. Raises requests.RequestException or ValueError when no token can be obtained
+        """
+        url = token_endpoint or f"{issuer}/protocol/openid-connect/token"
+        key = (issuer, username, client_id, scope)
+        # a changed password or client secret must not be served the tokens of the previous one
+        secret = hashlib.sha256(f"{password}\0{client_secret}".encode()).hexdigest()
+        with self._key_lock(key):
+            now = self.clock()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry["secret"] == secret:
+                if now < entry["expires_at"] - self.leeway:
+                    self._count("hits")
+                    return dict(entry["tokens"])
+                refresh_token = entry["tokens"].get("refresh_token")
+                if refresh_token and (entry["refresh_expires_at"] is None or now < entry["refresh_expires_at"]):
+                    data = {"grant_type": "refresh_token", "refresh_token": refresh_token, "client_id": client_id}
+                    if client_secret:
+                        data["client_secret"] = client_secret
+                    try:
+                        tokens = self._grant(url, data, verify, timeout)
+                        tokens.setdefault("refresh_token", refresh_token)
+                        self._count("refreshes")
+                        return self._store(key, secret, tokens, now)
+                    except (requests.RequestException, ValueError) as e:
+                        log.info(f"Refreshing the OIDC tokens of {username} failed, using the password grant: {e}")
+            self._count("misses")
+            data = {
+                "username": username,
+                "password": password,
+                "grant_type": "password",
+                "client_id": client_id,
+                "scope": scope,
+            }
+            if client_secret:
+                data["client_secret"] = client_secret
+            tokens = self._grant(url, data, verify, timeout)
+            return self._store(key, secret, tokens, now)
+
+    def _store(self, key, secret, tokens, now):
+        expires_at, refresh_expires_at = self._expires_at(tokens, now)
+        with self._lock:
+            self._entries[key] = {
+                "secret": secret,
+                "tokens": tokens,
+                "expires_at": expires_at,
+                "refresh_expires_at": refresh_expires_at,
+            }
+        return dict(tokens)
+
+    def invalidate(self, issuer=None, username=None):
+        """Drops the cached tokens of the user at the issuer, None matching any issuer/user"""
+        with self._lock:
+            for key in list(self._entries):
+                if issuer in (None, key[0]) and username in (None, key[1]):
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "entries": len(self._entries),
+            }
+
+
+OIDC_TOKENS = OidcTokenService()
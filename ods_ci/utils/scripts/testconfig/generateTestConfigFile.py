@@ -172,7 +172,7 @@ def get_prometheus_url(project):
     """
     host_jsonpath = "{.spec.host}"
     cmd = "oc get route prometheus -n {} -o jsonpath='{}'".format(project, host_jsonpath)
-    prometheus_url = execute_command(cmd)
+    prometheus_url = execute_command(cmd, cacheable=True)
     return "https://" + prometheus_url.strip("\n")
 
 
@@ -1,15 +1,25 @@
+import collections
+import contextlib
 import json
 import os
 import re
 import shutil
+import signal
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 
 import jinja2
+import requests
 import yaml
 
+from ods_ci.utils.scripts.command_cache import COMMAND_CACHE
 from ods_ci.utils.scripts.logger import log
+from ods_ci.utils.scripts.login_broker import LOGIN_BROKER
+from ods_ci.utils.scripts.oidc import OIDC_TOKENS
 
 
 def clone_config_repo(**kwargs):
@@ -54,26 +64,38 @@ def read_yaml(filename):
         return None
 
 
-def execute_command(
+class CommandResult(NamedTuple):
+    cmd: str
+    # None when the command timed out or could not be started
+    rc: int | None
+    # None when the command could not be started
+    output: str | None
+    duration: float
+    # True when only the last max_output_lines lines of the output were kept
+    truncated: bool = False
+    timed_out: bool = False
+
+
+def run_command(
     cmd: str,
+    timeout: float | None = None,
     print_stdout: bool = True,
-    return_rc: bool = False,
-    timeout: int = 50,
-):
+    max_output_lines: int | None = None,
+) -> CommandResult:
     """
-    Executes command on the local node and streams output.
+    Runs the command on the local node, streams its output and returns a CommandResult.
 
     Args:
         cmd: command to run
+        timeout: max seconds the command may run, it is killed (with its children) after that. None for no limit.
         print_stdout: whether to print output lines
-        return_rc: if True, return (rc, output). Otherwise return output only.
-        timeout: max seconds to wait for process when return_rc=True.
+        max_output_lines: keep only the last max_output_lines lines of the output. None for all of them.
 
-    Returns:
-        - output (str)                      when return_rc=False  (default)
-        - rc (int|None), output (str|None)  when return_rc=True
+    >>> result = run_command("seq 3; exit 3", print_stdout=False, max_output_lines=2)
+    >>> result.rc, result.output.splitlines(), result.truncated
+    (3, ['2', '3'], True)
     """
-    log.info(f"CMD: {cmd}")
+    start = time.perf_counter()
     try:
         with subprocess.Popen(
             cmd,
@@ -83,30 +105,114 @@ def execute_command(
             universal_newlines=True,
             encoding="utf-8",
             errors="replace",
+            # a new process group, so that a timeout also kills the children of the shell that hold stdout open
+            start_new_session=timeout is not None,
         ) as p:
-            output = []
-            for line in p.stdout:
-                output.append(line)
-                if print_stdout:
-                    print(">:", line.expandtabs(tabsize=8), end="")
-                    sys.stdout.flush()
-
-            if return_rc:
-                try:
-                    rc = p.wait(timeout=timeout)
-                except subprocess.TimeoutExpired:
-                    log.error(f"Command timed out after {timeout} seconds, killing process")
-                    p.kill()
-                    return None, "".join(output)
-                return rc, "".join(output)
-
-        return "".join(output)
-
+            timed_out = threading.Event()
+            timer = None
+            if timeout is not None:
+
+                def kill():
+                    if p.poll() is None:
+                        timed_out.set()
+                        with contextlib.suppress(ProcessLookupError):
+                            os.killpg(p.pid, signal.SIGKILL)
+
+                timer = threading.Timer(timeout, kill)
+                timer.daemon = True
+                timer.start()
+            output = collections.deque(maxlen=max_output_lines)
+            lines = 0
+            try:
+                for line in p.stdout:
+                    output.append(line)
+                    lines += 1
+                    if print_stdout:
+                        print(">:", line.expandtabs(tabsize=8), end="")
+                        sys.stdout.flush()
+                rc = p.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+        if timed_out.is_set():
+            log.error(f"Command timed out after {timeout} seconds, killed process")
+            rc = None
+        return CommandResult(
+            cmd, rc, "".join(output), time.perf_counter() - start, lines > len(output), timed_out.is_set()
+        )
     except Exception as e:
         log.exception(f"Starting subprocess '{cmd}' failed", exc_info=e)
-        if return_rc:
-            return None, None
-        return None
+        return CommandResult(cmd, None, None, time.perf_counter() - start)
+
+
+def _run_cached_command(cmd, cacheable=False, **kwargs) -> CommandResult:
+    """run_command through the command cache, which only keeps the complete outputs of the successful commands"""
+
+    def fetch():
+        result = run_command(cmd, **kwargs)
+        return (None if result.truncated else result.rc), result
+
+    return COMMAND_CACHE.call(cmd, fetch, cacheable)
+
+
+def execute_command(
+    cmd: str,
+    print_stdout: bool = True,
+    return_rc: bool = False,
+    timeout: int | None = None,
+    cacheable: bool = False,
+):
+    """
+    Executes command on the local node and streams output.
+
+    Args:
+        cmd: command to run
+        print_stdout: whether to print output lines
+        return_rc: if True, return (rc, output). Otherwise return output only.
+        timeout: max seconds the command may run before it is killed. Defaults to 50 seconds when return_rc=True,
+            no limit otherwise.
+        cacheable: whether the output of a read-only oc/ocm command may be served from COMMAND_CACHE,
+            never for commands polled until something changes.
+
+    Returns:
+        - output (str)                      when return_rc=False  (default)
+        - rc (int|None), output (str|None)  when return_rc=True
+    """
+    log.info(f"CMD: {cmd}")
+    if timeout is None and return_rc:
+        timeout = 50
+    result = _run_cached_command(cmd, cacheable, timeout=timeout, print_stdout=print_stdout)
+    if return_rc:
+        return result.rc, result.output
+    return result.output
+
+
+def execute_commands(
+    cmds,
+    max_workers: int = 8,
+    timeout: float | None = None,
+    print_stdout: bool = False,
+    max_output_lines: int | None = 1000,
+    cacheable: bool = False,
+) -> list[CommandResult]:
+    """
+    Runs independent commands with at most max_workers of them at the same time and returns their
+    CommandResult, in the order of cmds. The timeout, max_output_lines and cacheable apply to each command
+    """
+    cmds = list(cmds)
+    if not cmds:
+        return []
+
+    def run(cmd):
+        log.info(f"CMD: {cmd}")
+        result = _run_cached_command(
+            cmd, cacheable, timeout=timeout, print_stdout=print_stdout, max_output_lines=max_output_lines
+        )
+        log.info(f"rc={result.rc} in {result.duration:.2f}s: {cmd}")
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(cmds)))) as pool:
+        return list(pool.map(run, cmds))
 
 
 def oc_login(ocp_api_url="", username="", password="", kubeconfig_path="", timeout=600):
@@ -114,7 +220,8 @@ def oc_login(ocp_api_url="", username="", password="", kubeconfig_path="", timeo
     Login to test cluster using oc cli command:
     - If kubeconfig_path is set (path to a kubeconfig file), do NOT use username/password.
       Instead, rely on that kubeconfig and just validate access with `oc whoami`.
-    - Otherwise, login with expected username/password credentials.
+    - Otherwise, login with expected username/password credentials. With ODS_CI_KUBE_SESSIONS_DIR set,
+      the login session is shared with the other workers using the same user, see login_broker.
     """
     if kubeconfig_path:
         os.environ["KUBECONFIG"] = kubeconfig_path
@@ -132,7 +239,8 @@ def oc_login(ocp_api_url="", username="", password="", kubeconfig_path="", timeo
             log.error("kubeconfig is invalid or missing contexts")
             sys.exit(1)
 
-        rc, out = execute_command("oc whoami", return_rc=True) or (None, None)
+        # oc config above dropped the outputs cached for another kubeconfig
+        rc, out = execute_command("oc whoami", return_rc=True, cacheable=True) or (None, None)
         if rc == 0 and out and out.strip():
             print(f"Kubeconfig context valid, current user={out.strip()}")
             return
@@ -144,22 +252,27 @@ def oc_login(ocp_api_url="", username="", password="", kubeconfig_path="", timeo
         log.error("Missing API URL / IDP credentials for cluster login")
         sys.exit(1)
 
-    cmd = f"oc login -u {username} -p {password} {ocp_api_url} --insecure-skip-tls-verify=true"
-    count = 0
-    chk_flag = 0
-    while count <= timeout:
+    def login(kubeconfig):
+        cmd = f"oc login -u {username} -p {password} {ocp_api_url} --insecure-skip-tls-verify=true"
+        if kubeconfig:
+            cmd += f" --kubeconfig={kubeconfig}"
         out = execute_command(cmd)
         if (out is not None) and ("Login successful" in out):
             print("Logged into cluster successfully")
-            chk_flag = 1
-            break
-        time.sleep(5)
-        count += 5
-    if not chk_flag:
+            return True
+        return False
+
+    if not LOGIN_BROKER.attach(ocp_api_url, username, login, _valid_kubeconfig, timeout=timeout):
         log.error("Failed to login to cluster")
         sys.exit(1)
 
 
+def _valid_kubeconfig(kubeconfig):
+    # not through the command cache, an expired session must not look valid
+    result = run_command(f"oc whoami --kubeconfig={kubeconfig}", timeout=50, print_stdout=False)
+    return result.rc == 0 and bool(result.output.strip())
+
+
 def oc_login_oidc(
     ocp_api_url,
     username,
@@ -174,46 +287,45 @@ def oc_login_oidc(
     """
     Login to test cluster using oidc
     """
-    setup_cmd = f"""
-        oc config set-cluster test-cluster \
-            --server={ocp_api_url} \
-            --insecure-skip-tls-verify=true && \
-        oc config set-context main \
-            --cluster=test-cluster \
-            --user={username} && \
-        oc config use-context main
-    """
-    execute_command(setup_cmd)
-    tokens = get_oidc_tokens(
-        username,
-        password,
-        issuer_url,
-        token_endpoint=token_endpoint,
-        client_id=client_id,
-        client_secret=client_secret,
-        scope=scope,
-    )
-    count = 0
-    chk_flag = 0
-    while count <= timeout:
+
+    def login(kubeconfig):
+        kubeconfig_arg = f" --kubeconfig={kubeconfig}" if kubeconfig else ""
+        setup_cmd = f"""
+            oc config set-cluster test-cluster{kubeconfig_arg} \
+                --server={ocp_api_url} \
+                --insecure-skip-tls-verify=true && \
+            oc config set-context main{kubeconfig_arg} \
+                --cluster=test-cluster \
+                --user={username} && \
+            oc config use-context main{kubeconfig_arg}
+        """
+        execute_command(setup_cmd)
+        tokens = get_oidc_tokens(
+            username,
+            password,
+            issuer_url,
+            token_endpoint=token_endpoint,
+            client_id=client_id,
+            client_secret=client_secret,
+            scope=scope,
+        )
         cmd = f"""
-            oc config set-credentials "{username}"  \
+            oc config set-credentials "{username}"{kubeconfig_arg}  \
                     --auth-provider=oidc  \
                     --auth-provider-arg=idp-issuer-url={issuer_url} \
                     --auth-provider-arg=client-id={client_id}  \
                     --auth-provider-arg=client-secret="{client_secret}"  \
                     --auth-provider-arg=refresh-token={tokens["refresh_token"]} \
                     --auth-provider-arg=id-token={tokens["id_token"]}
-            oc auth whoami
+            oc auth whoami{kubeconfig_arg}
         """
         out = execute_command(cmd)
         if out is not None and ("Username" in out or username in out):
             print(f"Logged into cluster successfully as: {out.strip()}")
-            chk_flag = 1
-            break
-        time.sleep(5)
-        count += 5
-    if not chk_flag:
+            return True
+        return False
+
+    if not LOGIN_BROKER.attach(ocp_api_url, username, login, _valid_kubeconfig, timeout=timeout):
         print("Failed to login to cluster")
         sys.exit(1)
 
@@ -222,30 +334,29 @@ def get_oidc_tokens(
     username, password, issuer_url, token_endpoint="", client_id="oc-cli", client_secret="", scope="openid", timeout=60
 ):
     """
-    Get id and refresh token from OIDC issuer
-    """
-    effective_token_endpoint = token_endpoint or f"{issuer_url}/protocol/openid-connect/token"
-    cmd = f"""
-        curl -s -L -X POST "{effective_token_endpoint}" \
-            -H "Content-Type: application/x-www-form-urlencoded" -d "username={username}" \
-            -d "password={password}" -d "grant_type=password" -d "client_id={client_id}" \
-            -d "client_secret={client_secret}" -d "scope={scope}"
+    Get id and refresh token from OIDC issuer, served from the process-wide token cache while they are valid
     """
     count = 0
     chk_flag = 0
     while count <= timeout:
-        out = execute_command(cmd)
         try:
-            tokens = json.loads(out)
-            if "id_token" in tokens:
-                if "refresh_token" not in tokens:
-                    print("Warning: no refresh_token in response (add offline_access to scope to get one)")
-                    tokens["refresh_token"] = ""
-                print("Logged into OIDC issuer correctly")
-                chk_flag = 1
-                return tokens
-        except Exception:
-            print("Failed to parse tokens, retrying")
+            tokens = OIDC_TOKENS.get_tokens(
+                issuer_url,
+                username,
+                password,
+                token_endpoint=token_endpoint,
+                client_id=client_id,
+                client_secret=client_secret,
+                scope=scope,
+            )
+            if not tokens.get("refresh_token"):
+                print("Warning: no refresh_token in response (add offline_access to scope to get one)")
+                tokens["refresh_token"] = ""
+            print("Logged into OIDC issuer correctly")
+            chk_flag = 1
+            return tokens
+        except (requests.RequestException, ValueError) as e:
+            print(f"Failed to obtain tokens, retrying: {e}")
         time.sleep(5)
         count += 5
     if not chk_flag: